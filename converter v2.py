@@ -1,33 +1,28 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
+import multiprocessing
 import os
+import sys
 import threading
-import pythoncom
+
+from converter_core import engine, registry
+from converter_core.cache import ConversionCache
+from converter_core.manifest import MANIFEST_NAME
+from converter_core.preflight import check_batch
+from converter_core.scheduler import JobScheduler, QueueFullError
 
 # Required libraries:
 # pip install customtkinter pdf2docx docx2pdf pypiwin32 Pillow pillow-heif imgkit
 # The 'pillow-heif' library is required for HEIC support.
-# 'imgkit' and the 'wkhtmltoimage' tool are required for HTML to PNG conversion.
+# HTML to PNG needs either Playwright (pip install playwright && playwright install chromium)
+# or the 'wkhtmltoimage' tool.
 # https://wkhtmltopdf.org/downloads.html for wkhtmltoimage tool.
-# Check for HEIC support
-try:
-    import pyheif
-    pyheif.register_heif_opener()
-    HEIC_SUPPORT = True
-except ImportError:
-    HEIC_SUPPORT = False
-
-# Check for HTML support
-try:
-    import imgkit
-    HTML_SUPPORT = True
-except ImportError:
-    HTML_SUPPORT = False
+# The conversion libraries themselves are loaded by converter_core on first use, and
+# the cards are built from converter_core.registry, whose capability checks only run
+# when a card is clicked.
 
-# Conversion libraries
-from pdf2docx import Converter
-from docx2pdf import convert
-from PIL import Image
+# Image size limits offered in the UI (longest side in pixels)
+MAX_SIZE_CHOICES = {"Original": None, "4096 px": 4096, "2048 px": 2048, "1024 px": 1024, "512 px": 512}
 
 # Main application class
 class FileConverterApp(ctk.CTk):
@@ -44,6 +39,10 @@ class FileConverterApp(ctk.CTk):
         ctk.set_default_color_theme("blue")
 
         self.conversion_buttons = []
+        self.job_rows = {}
+        self.office_backend = None # opened on the first Word to PDF job, kept warm until the app closes
+        self.scheduler = JobScheduler(listener=self._on_job_update)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.setup_ui()
 
     def setup_ui(self):
@@ -58,50 +57,30 @@ class FileConverterApp(ctk.CTk):
         self.scrollable_frame.grid_columnconfigure((0, 1), weight=1)
 
         # --- Add Conversion Cards ---
-        self._create_conversion_card(
-            parent=self.scrollable_frame, row=0, column=0, icon="📄 → 📝",
-            title="PDF to Word", description="Convert multiple .pdf files to .docx format.",
-            command=self.start_pdf_to_word_conversion
-        )
-        self._create_conversion_card(
-            parent=self.scrollable_frame, row=0, column=1, icon="📝 → 📄",
-            title="Word to PDF", description="Convert multiple .docx files to .pdf format.",
-            command=self.start_word_to_pdf_conversion
-        )
-        self._create_image_card(row=1, column=0, icon="🖼️ → JPG", title="PNG to JPG", 
-                                in_format="PNG", out_format="JPG", save_kwargs={'format': 'JPEG', 'quality': 95}, convert_mode='RGB')
-        self._create_image_card(row=1, column=1, icon="JPG → 🖼️", title="JPG to PNG",
-                                in_format="JPG", out_format="PNG", save_kwargs={'format': 'PNG'})
-        self._create_image_card(row=2, column=0, icon="🖼️ → WEBP", title="Image to WEBP",
-                                in_format="PNG/JPG", out_format="WEBP", save_kwargs={'format': 'WEBP', 'quality': 85})
-        self._create_image_card(row=2, column=1, icon="WEBP → 🖼️", title="WEBP to PNG",
-                                in_format="WEBP", out_format="PNG", save_kwargs={'format': 'PNG'})
-        self._create_image_card(row=3, column=0, icon="🖼️ → ICO", title="Image to ICO",
-                                in_format="PNG/JPG", out_format="ICO", save_kwargs={'format': 'ICO', 'sizes': [(16,16), (32,32), (48,48), (64,64)]})
-        self._create_image_card(row=3, column=1, icon="🎨 → 🔳", title="Image to Grayscale",
-                                in_format="Image", out_format="PNG", save_kwargs={'format': 'PNG'}, convert_mode='L')
-        self._create_image_card(row=4, column=0, icon="🍏 → 🖼️", title="HEIC to JPG",
-                                in_format="HEIC", out_format="JPG", save_kwargs={'format': 'JPEG', 'quality': 95}, convert_mode='RGB', requires_heic=True)
-        self._create_image_card(row=4, column=1, icon="🖼️ → BMP", title="Image to BMP",
-                                in_format="PNG/JPG", out_format="BMP", save_kwargs={'format': 'BMP'})
-        
-        # HTML to PNG card
-        html_command = self.start_html_to_png_conversion
-        if not HTML_SUPPORT:
-            html_command = self.show_html_error
-
-        self._create_conversion_card(
-            parent=self.scrollable_frame, row=5, column=0, icon="🌐 → 🖼️",
-            title="HTML to PNG", description="Convert multiple .html files to .png images.",
-            command=html_command
-        )
-
-        # Status label and progress bar
+        for index, conversion in enumerate(registry.conversions()):
+            self._create_conversion_card(
+                parent=self.scrollable_frame, row=index // 2, column=index % 2, icon=conversion.icon,
+                title=conversion.title, description=conversion.description,
+                command=lambda conversion=conversion: self.start_conversion(conversion)
+            )
+
+        # Status label and job list
         self.status_label = ctk.CTkLabel(self, text="Please select an operation.", font=ctk.CTkFont(size=12))
         self.status_label.pack(pady=(5, 5))
         
-        self.progress_bar = ctk.CTkProgressBar(self, mode='determinate')
-        self.progress_bar.set(0)
+        # Options shared by all conversions
+        self.options_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.options_frame.pack(pady=(0, 5))
+        self.use_cache = ctk.BooleanVar(value=True)
+        self.cache_checkbox = ctk.CTkCheckBox(self.options_frame, text="Reuse earlier results (conversion cache)", variable=self.use_cache)
+        self.cache_checkbox.pack(side="left", padx=10)
+        ctk.CTkLabel(self.options_frame, text="Max image size:").pack(side="left", padx=(10, 5))
+        self.max_size_menu = ctk.CTkOptionMenu(self.options_frame, values=list(MAX_SIZE_CHOICES), width=110)
+        self.max_size_menu.pack(side="left")
+
+        self.jobs_frame = ctk.CTkScrollableFrame(self, label_text="Jobs", height=140)
+        self.jobs_frame.pack(pady=(0, 10), padx=20, fill="x")
+        self.jobs_frame.grid_columnconfigure(1, weight=1)
 
     def _create_conversion_card(self, parent, row, column, icon, title, description, command):
         """Creates general-purpose conversion cards."""
@@ -116,187 +95,161 @@ class FileConverterApp(ctk.CTk):
         button.pack(pady=(15, 5), padx=20, fill="x")
         self.conversion_buttons.append(button)
 
-    def _create_image_card(self, row, column, icon, title, in_format, out_format, save_kwargs, convert_mode=None, requires_heic=False):
-        """Creates special cards for image conversion."""
-        filetypes = {
-            "PNG": [("PNG Images", "*.png")],
-            "JPG": [("JPEG Images", "*.jpg *.jpeg")],
-            "WEBP": [("WEBP Images", "*.webp")],
-            "HEIC": [("HEIC Images", "*.heic *.heif")],
-            "PNG/JPG": [("Image Files", "*.png *.jpg *.jpeg")],
-            "Image": [("Image Files", "*.png *.jpg *.jpeg *.bmp")],
-        }
-        
-        command = lambda: self.start_image_conversion(
-            title_open=f"Select {in_format} Files", filetypes_open=filetypes.get(in_format),
-            out_format=out_format, save_kwargs=save_kwargs, convert_mode=convert_mode
-        )
-
-        if requires_heic and not HEIC_SUPPORT:
-            command = self.show_heic_error
-
-        self._create_conversion_card(
-            parent=self.scrollable_frame, row=row, column=column, icon=icon, title=title,
-            description=f"Convert multiple .{in_format.lower()} files to .{out_format.lower()} format.",
-            command=command
-        )
-            
     # --- UI Update Methods ---
     def update_status(self, message, color="white"):
         self.after(0, lambda: self.status_label.configure(text=message, text_color=color))
 
-    def update_progress(self, value):
-        self.after(0, lambda: self.progress_bar.set(value))
-
-    def lock_buttons(self, locked=True):
-        state = "disabled" if locked else "normal"
-        self.after(0, lambda: [btn.configure(state=state) for btn in self.conversion_buttons])
-
-    def show_progress_bar(self):
-        self.after(0, lambda: self.progress_bar.pack(pady=(0, 10), padx=20, fill="x"))
-
-    def hide_progress_bar(self):
-        self.after(0, lambda: self.progress_bar.pack_forget())
-
-    def show_heic_error(self):
-        messagebox.showerror("Missing Library", "The 'pillow-heif' library is required for this feature.\n\nTo install, run: pip install pillow-heif")
-    
-    def show_html_error(self):
-        messagebox.showerror(
-            "Missing Dependency", 
-            "Additional setup is required for HTML conversion:\n\n"
-            "1. Install the Python library:\n"
-            "   pip install imgkit\n\n"
-            "2. Download and install the wkhtmltoimage tool and add it to your system's PATH.\n"
-            "   (You can download it from its official website)"
-        )
+    def _on_job_update(self, job):
+        """Called by the scheduler from its own threads; hands the update to the UI thread."""
+        self.after(0, lambda: self._render_job(job))
+        if job.finished:
+            self.after(0, lambda: self._show_job_summary(job))
+
+    def _render_job(self, job):
+        row = self.job_rows.get(job.id)
+        if row is None:
+            row = self._create_job_row(job)
+        row['progress'].set(job.fraction)
+        row['status'].configure(text=f"{job.done}/{job.total} {job.status}")
+        row['pause'].configure(text="Resume" if job.status == "paused" else "Pause",
+                               state="disabled" if job.finished else "normal")
+        row['cancel'].configure(state="disabled" if job.finished else "normal")
+        if job.status == "running" and job.last_result:
+            self.status_label.configure(text=f"{job.title}: {os.path.basename(job.last_result.input_path)}", text_color="yellow")
+
+    def _create_job_row(self, job):
+        index = len(self.job_rows)
+        row = {
+            'title': ctk.CTkLabel(self.jobs_frame, text=f"#{job.id} {job.title}", anchor="w"),
+            'progress': ctk.CTkProgressBar(self.jobs_frame, mode='determinate'),
+            'status': ctk.CTkLabel(self.jobs_frame, text="", width=110),
+            'pause': ctk.CTkButton(self.jobs_frame, text="Pause", width=70, command=lambda: self._toggle_pause(job)),
+            'cancel': ctk.CTkButton(self.jobs_frame, text="Cancel", width=70, command=job.cancel),
+        }
+        for column, key in enumerate(('title', 'progress', 'status', 'pause', 'cancel')):
+            row[key].grid(row=index, column=column, padx=5, pady=3, sticky="ew")
+        self.job_rows[job.id] = row
+        return row
+
+    def _toggle_pause(self, job):
+        if job.status == "paused":
+            job.resume()
+        else:
+            job.pause()
+
+    def on_close(self):
+        self.scheduler.shutdown()
+        if self.office_backend:
+            self.office_backend.close()
+        self.destroy()
 
     # --- Batch Process Initiator ---
-    def _initiate_batch_process(self, worker_function, file_types, title, **kwargs):
-        """Manages file selection, folder selection, and thread initiation."""
+    def _initiate_batch_process(self, kind, batch_function, file_types, title, job_title, **kwargs):
+        """Manages file selection, folder selection, and queues the batch as a job."""
         input_paths = filedialog.askopenfilenames(title=title, filetypes=file_types)
         if not input_paths: return
 
         output_dir = filedialog.askdirectory(title="Select Output Folder for Converted Files")
         if not output_dir: return
 
-        all_args = {'input_paths': input_paths, 'output_dir': output_dir, **kwargs}
-        threading.Thread(target=worker_function, kwargs=all_args, daemon=True).start()
-
-    # --- Conversion Initiators ---
-    def start_pdf_to_word_conversion(self):
-        self._initiate_batch_process(self.convert_documents, [("PDF Files", "*.pdf")], "Select PDF Files to Convert", out_ext=".docx")
-    
-    def start_word_to_pdf_conversion(self):
-        self._initiate_batch_process(self.convert_documents, [("Word Documents", "*.docx *.doc")], "Select Word Files to Convert", out_ext=".pdf")
+        # Check formats, headers and output names before anything is decoded. The check stats and reads
+        # every input, which can take a while on big folders or network shares, so it runs off the UI thread.
+        self.update_status(f"Checking {len(input_paths)} files...", "yellow")
 
-    def start_image_conversion(self, **kwargs):
-        title = kwargs.pop('title_open')
-        filetypes = kwargs.pop('filetypes_open')
-        self._initiate_batch_process(self.convert_images, filetypes, title, **kwargs)
-
-    def start_html_to_png_conversion(self):
-        self._initiate_batch_process(self.convert_html_to_png, [("HTML Files", "*.html *.htm")], "Select HTML Files to Convert", out_ext=".png")
-
-    # --- Conversion Logic ---
-    def convert_images(self, input_paths, output_dir, out_format, save_kwargs, convert_mode=None):
-        """Converts multiple images."""
-        self.lock_buttons(True)
-        self.show_progress_bar()
-        self.update_progress(0)
-        success_count = 0
-        total_files = len(input_paths)
-
-        for i, path in enumerate(input_paths):
-            self.update_status(f"Converting: {i+1}/{total_files} - {os.path.basename(path)}", "yellow")
-            base_name = os.path.splitext(os.path.basename(path))[0]
-            output_path = os.path.join(output_dir, f"{base_name}.{out_format.lower()}")
-            try:
-                with Image.open(path) as img:
-                    if convert_mode and img.mode != convert_mode:
-                        img = img.convert(convert_mode)
-                    img.save(output_path, **save_kwargs)
-                success_count += 1
-            except Exception as e:
-                print(f"Error ({path}): {e}")
-            self.update_progress((i + 1) / total_files)
-
-        self.hide_progress_bar()
-        self.lock_buttons(False)
-        self.update_status(f"Process complete: {success_count}/{total_files} files converted successfully.", "lightgreen")
-        messagebox.showinfo("Process Complete", f"{success_count}/{total_files} files were converted successfully.")
-
-    def convert_documents(self, input_paths, output_dir, out_ext):
-        """Converts multiple PDF or Word documents."""
-        self.lock_buttons(True)
-        self.show_progress_bar()
-        self.update_progress(0)
-        success_count = 0
-        total_files = len(input_paths)
-        is_to_pdf = (out_ext == ".pdf")
-
-        for i, path in enumerate(input_paths):
-            self.update_status(f"Converting: {i+1}/{total_files} - {os.path.basename(path)}", "yellow")
-            base_name = os.path.splitext(os.path.basename(path))[0]
-            output_path = os.path.join(output_dir, f"{base_name}{out_ext}")
-            
+        def preflight():
             try:
-                if is_to_pdf:
-                    pythoncom.CoInitialize()
-                    convert(path, output_path)
-                    pythoncom.CoUninitialize()
-                else: # PDF to Word
-                    cv = Converter(path)
-                    cv.convert(output_path, start=0, end=None)
-                    cv.close()
-                
-                if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                    success_count += 1
+                report = check_batch(batch_function, list(input_paths), output_dir, kwargs)
             except Exception as e:
-                print(f"Error ({path}): {e}")
-                if is_to_pdf:
-                    pythoncom.CoUninitialize()
-            
-            self.update_progress((i + 1) / total_files)
-
-        self.hide_progress_bar()
-        self.lock_buttons(False)
-        self.update_status(f"Process complete: {success_count}/{total_files} files converted successfully.", "lightgreen")
-        messagebox.showinfo("Process Complete", f"{success_count}/{total_files} files were converted successfully.")
-
-    def convert_html_to_png(self, input_paths, output_dir, out_ext=".png"):
-        """Converts multiple HTML files to PNG images."""
-        self.lock_buttons(True)
-        self.show_progress_bar()
-        self.update_progress(0)
-        success_count = 0
-        total_files = len(input_paths)
-
-        for i, path in enumerate(input_paths):
-            self.update_status(f"Converting: {i+1}/{total_files} - {os.path.basename(path)}", "yellow")
-            base_name = os.path.splitext(os.path.basename(path))[0]
-            output_path = os.path.join(output_dir, f"{base_name}{out_ext}")
-            
+                message = f"{type(e).__name__}: {e}"
+                self.after(0, lambda: messagebox.showerror("Pre-flight Check", message))
+                return
+            self.after(0, lambda: self._queue_checked_batch(kind, batch_function, job_title, output_dir, report, kwargs))
+
+        threading.Thread(target=preflight, name="preflight", daemon=True).start()
+
+    def _queue_checked_batch(self, kind, batch_function, job_title, output_dir, report, kwargs):
+        """Runs on the UI thread once the pre-flight check is done: confirms with the user and queues the job."""
+        self.update_status(f"{len(report.files)} file(s) ready, {len(report.rejected)} skipped.")
+        if not report.files:
+            messagebox.showerror("Nothing to Convert", report.summary_text(max_lines=15))
+            return
+        if report.rejected or report.warnings:
+            if not messagebox.askokcancel("Pre-flight Check", report.summary_text(max_lines=15) + "\n\nConvert the remaining files?"):
+                return
+
+        all_args = {'input_paths': report.paths, 'output_dir': output_dir, **kwargs}
+        if batch_function in (engine.convert_images, engine.convert_documents):
+            all_args['cache'] = ConversionCache() if self.use_cache.get() else None
+        if batch_function in (engine.convert_images, engine.convert_images_multi):
+            all_args['max_size'] = MAX_SIZE_CHOICES[self.max_size_menu.get()]
+        if batch_function is not engine.convert_html_files:
+            # Rerunning a job into the same folder only converts what changed
+            all_args['manifest_path'] = os.path.join(output_dir, MANIFEST_NAME)
+        try:
+            self.scheduler.submit(kind, batch_function, all_args, title=job_title)
+        except QueueFullError as e:
+            messagebox.showerror("Queue Full", str(e))
+
+    # --- Conversion Initiator ---
+    def start_conversion(self, conversion):
+        """Starts a registry conversion, or explains which library or tool it is missing."""
+        hint = registry.missing(conversion)
+        if hint:
+            messagebox.showerror("Missing Dependency", hint)
+            return
+        options = dict(conversion.options, workers=conversion.worker_count())
+        if conversion.page_progress:
+            options['page_progress'] = self._page_progress
+        job_title = conversion.title
+        if options.get('out_ext') == ".pdf":
+            backend = self._office_backend(options['workers'])
+            if backend is None:
+                return
+            options['office_backend'] = backend
+            if backend.notice:
+                job_title += " (slow: one LibreOffice start per file)"
+        self._initiate_batch_process(conversion.kind, conversion.load(), conversion.filetypes(),
+                                     f"Select {conversion.file_label} to Convert", job_title, **options)
+
+    def _office_backend(self, workers):
+        """The app's Word to PDF backend, opened once so its office processes stay warm between jobs."""
+        if self.office_backend is None:
+            from converter_core.office import open_backend
             try:
-                imgkit.from_file(path, output_path, options={'enable-local-file-access': None})
-                success_count += 1
-            except OSError as e:
-                if "No wkhtmltoimage executable found" in str(e):
-                    self.after(0, lambda: messagebox.showerror("Error", "wkhtmltoimage tool not found. Please ensure it is installed and in your system's PATH."))
-                    break # End the loop if there is an error
-                else:
-                    print(f"Error ({path}): {e}")
-            except Exception as e:
-                print(f"Error ({path}): {e}")
-
-            self.update_progress((i + 1) / total_files)
-
-        self.hide_progress_bar()
-        self.lock_buttons(False)
-        self.update_status(f"Process complete: {success_count}/{total_files} files converted successfully.", "lightgreen")
-        if success_count > 0 or total_files == 0:
-            messagebox.showinfo("Process Complete", f"{success_count}/{total_files} files were converted successfully.")
+                self.office_backend = open_backend("auto", workers)
+            except engine.MissingDependencyError as e:
+                messagebox.showerror("Missing Dependency", str(e))
+                return None
+            if self.office_backend.notice:
+                print(f"Note: {self.office_backend.notice}", file=sys.stderr)
+        return self.office_backend
+
+    # --- Job Results ---
+    def _page_progress(self, path, done, total):
+        self.update_status(f"Converting: {os.path.basename(path)} - page {done}/{total}", "yellow")
+
+    def _show_job_summary(self, job):
+        batch = job.batch
+        if job.status == "cancelled":
+            self.status_label.configure(text=f"{job.title}: cancelled.", text_color="orange")
+            return
+        if job.error:
+            self.status_label.configure(text=f"{job.title}: failed.", text_color="red")
+            messagebox.showerror("Error", job.error)
+            return
+
+        self.status_label.configure(text=f"Process complete: {batch.summary_text()}", text_color="lightgreen")
+        message = f"{batch.success_count}/{batch.total} files were converted successfully."
+        if batch.up_to_date_count:
+            message += f"\n\n{batch.up_to_date_count} files were already up to date and were skipped."
+        target_seconds = batch.target_seconds()
+        if target_seconds:
+            message += "\n\nTime per format: " + ", ".join(f"{name.upper()} {seconds:.1f}s" for name, seconds in target_seconds.items())
+        if batch.cache_hits or batch.cache_misses:
+            message += f"\n\nCache: {batch.cache_hits} reused, {batch.cache_misses} newly converted."
+        messagebox.showinfo(f"{job.title} Complete", message)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # image batches use worker processes, also in the .exe build
     app = FileConverterApp()
     app.mainloop()
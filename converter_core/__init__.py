@@ -0,0 +1,24 @@
+"""Headless conversion core used by the desktop app and by scripts."""
+
+from .engine import (
+    ENGINE_VERSION,
+    IMAGE_TARGETS,
+    BatchControl,
+    BatchResult,
+    FileResult,
+    MissingDependencyError,
+    convert_document,
+    convert_documents,
+    convert_html,
+    convert_html_files,
+    convert_image,
+    convert_image_multi,
+    convert_images,
+    convert_images_multi,
+    default_workers,
+    heic_supported,
+    html_supported,
+    output_path_for,
+    run_batch,
+)
+from .streams import BufferTooSmall, convert_image_data, convert_pdf_data
@@ -0,0 +1,354 @@
+import fnmatch
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import engine
+
+# Benchmark suite for every conversion the app offers.
+# A synthetic corpus is generated locally (images of several formats and
+# sizes, multi-page PDFs, Word documents, HTML pages), then each scenario
+# runs in a fresh process so its peak RSS and CPU time are its own. Results
+# are written as JSON and can be compared against a stored baseline, with
+# slowdowns beyond a threshold reported as regressions. Scenarios whose
+# libraries or tools are missing are recorded as skipped, so the suite runs
+# headless on Linux with whatever is installed. The pixel_ops_* scenarios
+# time converter_core.pixelops pipelines against the same steps done as a
+# chain of plain Pillow calls, one call per step.
+
+SCALES = {
+    # name: (images per format and size, image sizes, PDF page counts, HTML pages)
+    "small": (2, [(320, 240), (1280, 720)], [2, 10], 4),
+    "medium": (6, [(320, 240), (1920, 1080), (4000, 3000)], [5, 40], 12),
+    "large": (20, [(640, 480), (1920, 1080), (6000, 4000)], [10, 150], 40),
+}
+IMAGE_SOURCE_FORMATS = {"png": "PNG", "jpg": "JPEG", "webp": "WEBP", "bmp": "BMP"}
+DEFAULT_THRESHOLD = 0.15
+PIXEL_PIPELINES = {
+    "flatten_gray": "flatten,gray",
+    "flatten_gray_gamma_levels": "flatten,gray,gamma=2.2,levels=16:235",
+    "flatten_gamma_swap_invert": "flatten=#204060,gamma=1.8,swap=bgr,invert",
+}
+PIXEL_REPEAT = 5
+
+
+# --- Corpus ---
+def generate_corpus(root, scale="small", seed=1234):
+    """Writes a deterministic synthetic corpus under `root`; returns {kind: [paths]}."""
+    per_size, sizes, page_counts, html_pages = SCALES[scale]
+    rng = random.Random(seed)
+    corpus = {'images': {}, 'pdf': [], 'docx': [], 'html': []}
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    if Image is not None:
+        image_dir = os.path.join(root, "images")
+        os.makedirs(image_dir, exist_ok=True)
+        for ext, pil_format in IMAGE_SOURCE_FORMATS.items():
+            paths = corpus['images'].setdefault(ext, [])
+            for width, height in sizes:
+                for i in range(per_size):
+                    path = os.path.join(image_dir, f"{ext}_{width}x{height}_{i}.{ext}")
+                    _synthetic_image(Image, (width, height), rng).save(path, format=pil_format)
+                    paths.append(path)
+
+    pdf_dir = os.path.join(root, "pdf")
+    os.makedirs(pdf_dir, exist_ok=True)
+    for pages in page_counts:
+        path = os.path.join(pdf_dir, f"doc_{pages}p.pdf")
+        if _write_pdf(path, pages, rng, Image):
+            corpus['pdf'].append(path)
+
+    docx_dir = os.path.join(root, "docx")
+    os.makedirs(docx_dir, exist_ok=True)
+    for pages in page_counts:
+        path = os.path.join(docx_dir, f"doc_{pages}p.docx")
+        if _write_docx(path, pages, rng):
+            corpus['docx'].append(path)
+
+    html_dir = os.path.join(root, "html")
+    os.makedirs(html_dir, exist_ok=True)
+    for i in range(html_pages):
+        path = os.path.join(html_dir, f"report_{i}.html")
+        _write_html(path, rng)
+        corpus['html'].append(path)
+    return corpus
+
+def _synthetic_image(Image, size, rng):
+    """Gradient plus noise and a few shapes: compresses like a photo, not like a flat fill."""
+    from PIL import ImageDraw
+    width, height = size
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    img = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(1, width // 3 + 2), y0 + rng.randrange(1, height // 3 + 2)
+        draw.ellipse([x0, y0, x1, y1], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return img
+
+def _paragraphs(rng, count):
+    words = ["conversion", "throughput", "latency", "document", "page", "image", "quality", "archive",
+             "report", "budget", "invoice", "contract", "summary", "section", "total", "value"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randrange(20, 60))).capitalize() + "." for _ in range(count)]
+
+def _write_pdf(path, pages, rng, Image):
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    if fitz is not None:
+        doc = fitz.open()
+        for page_number in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Page {page_number + 1}", fontsize=18)
+            page.insert_textbox(fitz.Rect(72, 100, 523, 770), "\n\n".join(_paragraphs(rng, 6)), fontsize=10)
+        doc.save(path)
+        doc.close()
+        return True
+    if Image is not None:
+        # Image-only PDF: still exercises pdf2docx, just without a text layer.
+        frames = [_synthetic_image(Image, (1240, 1754), rng) for _ in range(pages)]
+        frames[0].save(path, format="PDF", save_all=True, append_images=frames[1:], resolution=150)
+        return True
+    return False
+
+def _write_docx(path, pages, rng):
+    try:
+        import docx
+    except ImportError:
+        return False
+    document = docx.Document()
+    for page_number in range(pages):
+        document.add_heading(f"Section {page_number + 1}", level=1)
+        for paragraph in _paragraphs(rng, 5):
+            document.add_paragraph(paragraph)
+        document.add_page_break()
+    document.save(path)
+    return True
+
+def _write_html(path, rng):
+    rows = "\n".join(f"<tr><td>{i}</td><td>{rng.randrange(10000)}</td><td>{p}</td></tr>"
+                     for i, p in enumerate(_paragraphs(rng, 25)))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html><html><head><meta charset='utf-8'><style>"
+                "body{font-family:sans-serif;width:1024px} td{border:1px solid #ccc;padding:4px}"
+                f"</style></head><body><h1>Report</h1><table>{rows}</table></body></html>")
+
+
+# --- Scenarios ---
+def build_scenarios(corpus, workers):
+    """Returns {name: (batch function name, inputs, kwargs)} for every conversion the app offers."""
+    images = corpus['images']
+    any_image = [p for paths in images.values() for p in paths]
+    scenarios = {
+        "png_to_jpg": ("convert_images", images.get("png", []), {**engine.IMAGE_TARGETS["jpg"], 'workers': workers}),
+        "jpg_to_png": ("convert_images", images.get("jpg", []), {**engine.IMAGE_TARGETS["png"], 'workers': workers}),
+        "image_to_webp": ("convert_images", images.get("png", []) + images.get("jpg", []),
+                          {**engine.IMAGE_TARGETS["webp"], 'workers': workers}),
+        "webp_to_png": ("convert_images", images.get("webp", []), {**engine.IMAGE_TARGETS["png"], 'workers': workers}),
+        "image_to_ico": ("convert_images", images.get("png", []) + images.get("jpg", []),
+                         {**engine.IMAGE_TARGETS["ico"], 'workers': workers}),
+        "image_to_grayscale": ("convert_images", any_image, {**engine.IMAGE_TARGETS["grayscale"], 'workers': workers}),
+        "image_to_bmp": ("convert_images", images.get("png", []) + images.get("jpg", []),
+                         {**engine.IMAGE_TARGETS["bmp"], 'workers': workers}),
+        "image_to_bmp_serial": ("convert_images", images.get("jpg", []), {**engine.IMAGE_TARGETS["bmp"], 'workers': 1}),
+        "image_multi_target": ("convert_images_multi", images.get("png", []) + images.get("jpg", []),
+                               {'targets': ["jpg", "webp", "ico", "grayscale"], 'workers': workers}),
+        "pdf_to_docx": ("convert_documents", corpus['pdf'], {'out_ext': ".docx"}),
+        "pdf_to_docx_chunked": ("convert_documents", corpus['pdf'], {'out_ext': ".docx", 'pages_per_chunk': 10, 'workers': workers}),
+        "docx_to_pdf": ("convert_documents", corpus['docx'], {'out_ext': ".pdf"}),
+        "html_to_png": ("convert_html_files", corpus['html'], {'out_ext': ".png"}),
+    }
+    return scenarios
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def _usage():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    scale = 1 if sys.platform == "darwin" else 1024 # ru_maxrss is in KiB on Linux, bytes on macOS
+    return {
+        'cpu_seconds': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'peak_rss_bytes': max(own.ru_maxrss, children.ru_maxrss) * scale,
+    }
+
+def run_scenario(function_name, inputs, kwargs):
+    """Runs one scenario in the current process and measures it; meant to run in a fresh process."""
+    output_dir = tempfile.mkdtemp(prefix="converter-bench-")
+    try:
+        before = _usage()
+        start = time.perf_counter()
+        batch = getattr(engine, function_name)(inputs, output_dir, **kwargs)
+        wall = time.perf_counter() - start
+        after = _usage()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    if batch.aborted:
+        return {'skipped': batch.aborted}
+    latencies = [r.seconds for r in batch.results if r.ok]
+    input_bytes = sum(os.path.getsize(p) for p in inputs)
+    stats = {
+        'files': batch.total,
+        'succeeded': batch.success_count,
+        'wall_seconds': round(wall, 4),
+        'files_per_second': round(batch.success_count / wall, 3) if wall else None,
+        'mb_per_second': round(input_bytes / 1024 ** 2 / wall, 3) if wall else None,
+        'p50_seconds': _percentile(latencies, 0.50),
+        'p95_seconds': _percentile(latencies, 0.95),
+        'mean_seconds': statistics.fmean(latencies) if latencies else None,
+    }
+    if before and after:
+        cpu = after['cpu_seconds'] - before['cpu_seconds']
+        stats['cpu_seconds'] = round(cpu, 3)
+        stats['cpu_utilization'] = round(cpu / (wall * (os.cpu_count() or 1)), 3) if wall else None
+        stats['peak_rss_bytes'] = after['peak_rss_bytes']
+    return stats
+
+def _pillow_chain(img, ops):
+    """Runs pixel operations the plain way: one Pillow call, and one new image, per step."""
+    from . import imaging, pixelops
+    np = engine._require("numpy", "numpy") # only to evaluate the tone curves into tables
+    for op in ops:
+        if isinstance(op, pixelops.Flatten):
+            if imaging.has_alpha(img):
+                mode = "L" if img.mode in ("L", "LA") else "RGB"
+                background = op.background if mode == "RGB" else round(pixelops._background(op.background, 1)[0])
+                img = imaging.to_mode(img, mode, background)
+        elif isinstance(op, pixelops.Grayscale):
+            img = img.convert("L", (*op.weights, 0)) if img.mode == "RGB" else img
+        elif isinstance(op, pixelops.ChannelMix):
+            img = img.convert("RGB", tuple(v for row in op.matrix(3) for v in row))
+        else:
+            table = np.rint(np.clip(op.curve(np, np.arange(256, dtype=np.float64)), 0, 255)).astype(int).tolist()
+            img = img.point([v for band in img.getbands() for v in (list(range(256)) if band == "A" else table)])
+    return img
+
+def run_pixel_scenario(spec, size, repeat=PIXEL_REPEAT):
+    """Times a pixelops pipeline against the same steps as a Pillow chain on an RGBA image of `size`."""
+    from PIL import Image, ImageChops
+    from . import pixelops
+    ops = pixelops.parse_ops(spec)
+    img = _synthetic_image(Image, size, random.Random(7)).convert("RGBA")
+    img.putalpha(Image.linear_gradient("L").resize(size))
+    timings = {}
+    for name, run in (("fused", lambda: pixelops.apply(img, ops)), ("pillow", lambda: _pillow_chain(img, ops))):
+        outputs = [run()] # warm-up, also kept for the comparison
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+        timings[name] = (seconds, outputs[0])
+    fused, pillow = timings['fused'], timings['pillow']
+    difference = ImageChops.difference(fused[1].convert(pillow[1].mode), pillow[1]).getextrema()
+    megapixels = size[0] * size[1] / 1e6
+    return {
+        'files': repeat,
+        'succeeded': repeat,
+        'image_size': list(size),
+        'files_per_second': round(1 / statistics.fmean(fused[0]), 3),
+        'p50_seconds': _percentile(fused[0], 0.50),
+        'p95_seconds': _percentile(fused[0], 0.95),
+        'megapixels_per_second': round(megapixels / statistics.fmean(fused[0]), 2),
+        'pillow_chain_files_per_second': round(1 / statistics.fmean(pillow[0]), 3),
+        'speedup_vs_pillow_chain': round(statistics.fmean(pillow[0]) / statistics.fmean(fused[0]), 2),
+        'max_difference': max(high for _, high in difference) if isinstance(difference[0], tuple) else difference[1],
+    }
+
+def run_suite(scale="small", workers=None, only=None, corpus_dir=None, progress=None):
+    """Generates a corpus, runs every scenario in its own process and returns the results document."""
+    workers = workers or engine.default_workers()
+    own_corpus = corpus_dir is None
+    corpus_dir = corpus_dir or tempfile.mkdtemp(prefix="converter-corpus-")
+    try:
+        corpus = generate_corpus(corpus_dir, scale)
+        results = {}
+        context = multiprocessing.get_context("spawn")
+        jobs = [(name, run_scenario, (function_name, inputs, kwargs), bool(inputs))
+                for name, (function_name, inputs, kwargs) in build_scenarios(corpus, workers).items()]
+        largest = max(SCALES[scale][1], key=lambda size: size[0] * size[1])
+        jobs += [(f"pixel_ops_{name}", run_pixel_scenario, (spec, largest), bool(corpus['images']))
+                 for name, spec in PIXEL_PIPELINES.items()]
+        for name, function, args, has_inputs in jobs:
+            if only and not any(fnmatch.fnmatch(name, pattern) for pattern in only):
+                continue
+            if not has_inputs:
+                results[name] = {'skipped': "no inputs could be generated (missing library)"}
+            else:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    try:
+                        results[name] = pool.submit(function, *args).result()
+                    except Exception as e:
+                        results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+            if progress:
+                progress(name, results[name])
+    finally:
+        if own_corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'engine_version': engine.ENGINE_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workers': workers,
+            'scale': scale,
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'scenarios': results,
+    }
+
+
+# --- Baselines ---
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Lists scenarios that got slower than `baseline` by more than `threshold` (0.15 = 15%)."""
+    regressions = []
+    for name, stats in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base or 'skipped' in stats or 'skipped' in base:
+            continue
+        checks = [
+            ("files_per_second", stats.get('files_per_second'), base.get('files_per_second'), False),
+            ("p95_seconds", stats.get('p95_seconds'), base.get('p95_seconds'), True),
+            ("peak_rss_bytes", stats.get('peak_rss_bytes'), base.get('peak_rss_bytes'), True),
+        ]
+        for metric, value, base_value, higher_is_worse in checks:
+            if not value or not base_value:
+                continue
+            change = (value - base_value) / base_value
+            if (change > threshold) if higher_is_worse else (change < -threshold):
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': base_value,
+                                    'current': value, 'change': round(change, 3)})
+    return regressions
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
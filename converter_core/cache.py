@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Content-addressed cache of conversion outputs.
+# Entries are keyed on the SHA-256 of the input bytes plus the conversion
+# parameters and the engine version, so renamed or copied inputs still hit
+# and any change to the settings misses. The modification time of an entry
+# is bumped on every hit and the oldest entries are evicted first once the
+# cache grows past its size cap.
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    """Per-user cache folder, overridable with the CONVERTER_CACHE_DIR environment variable."""
+    if os.environ.get("CONVERTER_CACHE_DIR"):
+        return os.environ["CONVERTER_CACHE_DIR"]
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "converter", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "converter")
+
+
+class ConversionCache:
+    """On-disk cache of converted files with a size cap and LRU eviction.
+
+    Instances only hold a folder and settings, so they can be passed to
+    worker processes. With `link=True` hits are hard-linked into place
+    instead of copied.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES, link=False):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.link = link
+
+    def key_for(self, path, params):
+        """Hashes the input file's content together with the conversion parameters."""
+        from .engine import ENGINE_VERSION
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        digest.update(json.dumps([ENGINE_VERSION, params], sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """Places the cached output for `key` at `output_path`; returns False on a miss."""
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            return False
+        self.prepare_output(output_path)
+        try:
+            if self.link:
+                try:
+                    os.link(entry, output_path)
+                except OSError:
+                    shutil.copyfile(entry, output_path)
+            else:
+                shutil.copyfile(entry, output_path)
+            os.utime(entry)
+        except FileNotFoundError: # evicted by another process in the meantime
+            return False
+        return True
+
+    def store(self, key, output_path):
+        """Copies a freshly converted output into the cache."""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(output_path, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def prepare_output(self, output_path):
+        """Unlinks an output that is hard-linked to an entry, so writing it cannot corrupt the cache."""
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Returns (mtime, size, path) for every entry."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, stat.st_size, entry.path))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def trim(self):
+        """Evicts least recently used entries until the cache fits in `max_bytes`; returns the count evicted."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
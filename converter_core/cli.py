@@ -0,0 +1,530 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+
+from . import engine, office, preflight, render, trace, tuning
+from .cache import DEFAULT_MAX_BYTES, ConversionCache, default_cache_dir
+from .manifest import MANIFEST_NAME
+from .pdf import PAGES_PER_CHUNK
+from .planning import DOCUMENT_TARGETS, all_targets, plan_batches
+
+# Command-line front end for the conversion engine.
+# Only the engine is imported here, never the GUI, so the CLI starts fast
+# and runs on machines without a display.
+
+
+def expand_inputs(patterns, recursive=False):
+    """Turns files, directories and glob patterns into a sorted list of unique files."""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for root, _, files in os.walk(pattern):
+                    found.extend(os.path.join(root, name) for name in files)
+            else:
+                found.extend(os.path.join(pattern, name) for name in os.listdir(pattern))
+        elif glob.has_magic(pattern):
+            found.extend(glob.glob(pattern, recursive=recursive))
+        else:
+            found.append(pattern)
+    seen = set()
+    unique = []
+    for path in found:
+        key = os.path.abspath(path)
+        if os.path.isfile(path) and key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return sorted(unique)
+
+def parse_option(text):
+    """Parses a KEY=VALUE save option, turning numbers and booleans into Python values."""
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return key, lowered == "true"
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+def parse_targets(text):
+    """Parses --to: one target, or several comma-separated image targets."""
+    targets = [t.strip().lower() for t in text.split(",") if t.strip()]
+    known = all_targets()
+    for target in targets:
+        if target not in known:
+            raise argparse.ArgumentTypeError(f"unknown target {target!r} (choose from {', '.join(known)})")
+    if len(targets) > 1 and any(t in DOCUMENT_TARGETS for t in targets):
+        raise argparse.ArgumentTypeError("only image targets can be combined")
+    if not targets:
+        raise argparse.ArgumentTypeError("no target given")
+    return targets
+
+def parse_crop(text):
+    """Parses --crop X,Y,WIDTH,HEIGHT."""
+    try:
+        x, y, width, height = (int(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected X,Y,WIDTH,HEIGHT, got {text!r}")
+    return (x, y, width, height)
+
+def parse_size(text):
+    """Parses a byte count such as 250000, 250K or 1.5M."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    number, unit = (text[:-1], units[text[-1].upper()]) if text[-1:].upper() in units else (text, 1)
+    try:
+        size = int(float(number) * unit)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a size such as 250000, 250K or 1.5M, got {text!r}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError("the size must be positive")
+    return size
+
+def parse_pixel_ops(text):
+    from .pixelops import parse_ops
+    try:
+        return parse_ops(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_rule(text):
+    from .watch import WatchRule
+    pattern, sep, target = text.partition("=")
+    if not sep or not pattern or not target:
+        raise argparse.ArgumentTypeError("rules look like PATTERN=TARGET, e.g. *.heic=jpg")
+    return WatchRule(pattern.strip(), target.strip().lower())
+
+
+# --- Commands ---
+def cmd_convert(args):
+    paths = expand_inputs(args.inputs, args.recursive)
+    batches, skipped = plan_batches(paths, args.to)
+    for path in skipped:
+        print(f"Skipped ({path}): not a valid input for --to {','.join(args.to)}", file=sys.stderr)
+    if not batches:
+        print("No input files matched.", file=sys.stderr)
+        return 2
+    tune = _tuning_goal(args)
+    if tune and (len(args.to) > 1 or args.to[0] in DOCUMENT_TARGETS or args.quality is not None):
+        print("Error: --max-bytes, --min-ssim and --min-psnr need a single image target and no --quality.", file=sys.stderr)
+        return 2
+    if args.pixel_ops and (len(args.to) > 1 or args.to[0] in DOCUMENT_TARGETS):
+        print("Error: --pixel-ops needs a single image target.", file=sys.stderr)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    manifest_path = None if args.no_manifest else (args.manifest or os.path.join(args.output_dir, MANIFEST_NAME))
+    cache = None if args.no_cache else ConversionCache(args.cache_dir, args.cache_size * 1024 ** 2)
+    summary = {'target': ",".join(args.to), 'output_dir': args.output_dir, 'total': 0, 'succeeded': 0,
+               'failed': 0, 'skipped': skipped, 'aborted': None, 'up_to_date': 0, 'cache_hits': 0, 'cache_misses': 0,
+               'rejected': [], 'seconds': 0.0, 'target_seconds': {}, 'files': []}
+    office_backend = None
+    if args.to == ["pdf"]:
+        try:
+            office_backend = office.open_backend(args.office_backend, args.workers, args.office_max_jobs, args.office_timeout)
+        except engine.MissingDependencyError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        if office_backend.notice:
+            print(f"Note: {office_backend.notice}", file=sys.stderr)
+    start = time.perf_counter()
+    results = []
+    try:
+        with trace.profiled(args.profile):
+            for batch_function, inputs, kwargs in batches:
+                if not args.no_preflight:
+                    inputs = _preflight(args, batch_function, inputs, kwargs, summary)
+                    if not inputs:
+                        continue
+                if batch_function is engine.convert_documents:
+                    kwargs['office_backend'] = office_backend
+                results.extend(_run_planned(args, batch_function, inputs, kwargs, cache, manifest_path, summary))
+    finally:
+        if office_backend:
+            office_backend.close()
+    summary['seconds'] = round(time.perf_counter() - start, 4)
+    summary['stages'] = trace.summarize(results)
+
+    _write_summary(summary, args.summary)
+    return 0 if summary['failed'] == 0 and not summary['rejected'] and not summary['aborted'] else 1
+
+def _preflight(args, batch_function, inputs, kwargs, summary):
+    """Drops invalid inputs and ones whose output would collide; returns the rest, largest first."""
+    report = preflight.check_batch(batch_function, inputs, args.output_dir, kwargs)
+    for info in report.rejected:
+        print(f"Rejected ({info.path}): {info.error}", file=sys.stderr)
+        summary['rejected'].append({'input_path': info.path, 'kind': info.kind, 'error': info.error})
+    if not args.quiet:
+        for info in report.warnings:
+            print(f"Warning ({info.path}): {info.warning}", file=sys.stderr)
+    return report.paths
+
+def _run_planned(args, batch_function, inputs, kwargs, cache, manifest_path, summary):
+    """Runs one planned batch with the command-line options and adds it to `summary`; returns its results."""
+    if batch_function in (engine.convert_images, engine.convert_documents):
+        kwargs['cache'] = cache
+    if batch_function is not engine.convert_html_files:
+        kwargs['manifest_path'] = manifest_path
+    if batch_function is engine.convert_images:
+        kwargs['save_kwargs'] = {**kwargs['save_kwargs'], **_save_overrides(args)}
+        kwargs['frames'] = args.frames
+        kwargs['pixel_ops'] = args.pixel_ops
+        kwargs['tune'] = _tuning_goal(args)
+        if kwargs['tune'] and not args.no_cache:
+            kwargs['tune_cache'] = tuning.ParameterCache(os.path.join(args.cache_dir or default_cache_dir(), "tuning.json"))
+        kwargs['workers'] = args.workers
+        kwargs['max_size'] = args.max_size
+        kwargs['memory_limit'] = args.memory_limit and args.memory_limit * 1024 ** 2
+    elif batch_function is engine.convert_images_multi:
+        kwargs['workers'] = args.workers
+        kwargs['max_size'] = args.max_size
+        kwargs['memory_limit'] = args.memory_limit and args.memory_limit * 1024 ** 2
+    elif batch_function is engine.convert_documents:
+        kwargs['workers'] = args.workers
+    elif batch_function is engine.convert_html_files:
+        kwargs['workers'] = args.workers
+        kwargs['renderer'] = args.html_renderer
+        kwargs['render_options'] = render.RenderOptions(args.page_width, args.page_height, args.zoom, args.crop,
+                                                        args.page_timeout)
+    if batch_function is engine.convert_documents and args.to == ["docx"]:
+        kwargs['pages_per_chunk'] = args.pages_per_chunk or None
+        kwargs['page_progress'] = _page_progress_printer(args)
+    kwargs['trace_path'] = args.trace
+    batch = batch_function(inputs, args.output_dir, progress=_progress_printer(args), **kwargs)
+    summary['total'] += batch.total
+    summary['succeeded'] += batch.success_count
+    summary['failed'] += batch.total - batch.success_count
+    summary['aborted'] = summary['aborted'] or batch.aborted
+    summary['up_to_date'] += batch.up_to_date_count
+    summary['cache_hits'] += batch.cache_hits
+    summary['cache_misses'] += batch.cache_misses
+    summary['files'].extend(r.to_dict() for r in batch.results)
+    for name, seconds in batch.target_seconds().items():
+        summary['target_seconds'][name] = round(summary['target_seconds'].get(name, 0.0) + seconds, 4)
+    return batch.results
+
+def _save_overrides(args):
+    overrides = dict(args.option or [])
+    if args.quality is not None:
+        overrides['quality'] = args.quality
+    return overrides
+
+def _tuning_goal(args):
+    if args.max_bytes is None and args.min_ssim is None and args.min_psnr is None:
+        return None
+    return tuning.TuningGoal(args.max_bytes, args.min_ssim, args.min_psnr)
+
+def _progress_printer(args):
+    if args.quiet:
+        return None
+    def progress(done, total, result):
+        status = "ok" if result.ok else "FAILED"
+        print(f"[{done}/{total}] {status} {result.input_path} ({result.seconds:.2f}s)", file=sys.stderr)
+    return progress
+
+def _page_progress_printer(args):
+    if args.quiet:
+        return None
+    def page_progress(path, done, total):
+        print(f"    {path}: page {done}/{total}", file=sys.stderr)
+    return page_progress
+
+def _write_summary(summary, path):
+    text = json.dumps(summary, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def cmd_bench(args):
+    from . import bench
+
+    def progress(name, stats):
+        if 'skipped' in stats:
+            print(f"{name}: skipped ({stats['skipped'].splitlines()[0]})", file=sys.stderr)
+        else:
+            print(f"{name}: {stats['files_per_second']} files/s, p95 {stats['p95_seconds']:.3f}s", file=sys.stderr)
+
+    results = bench.run_suite(args.scale, args.workers, args.only, args.corpus_dir, progress)
+    status = 0
+    if args.baseline:
+        regressions = bench.compare(results, bench.load(args.baseline), args.threshold)
+        results['regressions'] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['scenario']} {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.0%})",
+                  file=sys.stderr)
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        bench.save(results, args.save_baseline)
+    _write_summary(results, args.out)
+    return status
+
+def cmd_serve(args):
+    from . import server
+    server.serve(args.host, args.port, args.unix_socket, args.quiet, workers=args.workers, max_pending=args.max_pending,
+                 batch_window=args.batch_window_ms / 1000, batch_max=args.batch_max, html_renderer=args.html_renderer,
+                 office_backend=args.office_backend)
+    return 0
+
+def cmd_watch(args):
+    from . import watch
+    if args.config:
+        folders = watch.load_config(args.config)
+    elif args.folder and args.rule and args.output_dir:
+        folders = [watch.WatchFolder(args.folder, args.output_dir, args.rule, args.recursive)]
+    else:
+        print("Give a FOLDER with -o and at least one --rule, or a --config file.", file=sys.stderr)
+        return 2
+    known = all_targets()
+    for folder in folders:
+        for rule in folder.rules:
+            if rule.target not in known:
+                print(f"Unknown target in rule {rule.pattern}={rule.target}", file=sys.stderr)
+                return 2
+    log = (lambda message: None) if args.quiet else (lambda message: print(message, file=sys.stderr, flush=True))
+    watcher = watch.FolderWatcher(folders, workers=args.workers, settle=args.settle, poll_interval=args.poll_interval,
+                                  force_polling=args.polling, max_batch=args.max_batch, after=args.after, log=log)
+    if args.metrics_port:
+        watch.serve_metrics(watcher, args.metrics_host, args.metrics_port)
+    if args.stats_interval:
+        watch.print_stats_every(watcher, args.stats_interval)
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(watcher.stats.snapshot(), indent=2))
+    return 0
+
+def cmd_coordinator(args):
+    from . import distributed
+    job_id = None
+    if args.inputs:
+        if not args.to or not args.output_dir:
+            print("Error: queueing inputs needs --to and -o.", file=sys.stderr)
+            return 2
+        if args.pixel_ops and (len(args.to) > 1 or args.to[0] in DOCUMENT_TARGETS):
+            print("Error: --pixel-ops needs a single image target.", file=sys.stderr)
+            return 2
+        if args.pixel_ops:
+            from .pixelops import parse_ops
+            try:
+                parse_ops(args.pixel_ops) # checked here, parsed again by each worker
+            except ValueError as e:
+                print(f"Error: --pixel-ops: {e}", file=sys.stderr)
+                return 2
+        paths = expand_inputs(args.inputs, args.recursive)
+        batches, skipped = plan_batches(paths, args.to)
+        for path in skipped:
+            print(f"Skipped ({path}): not a valid input for --to {','.join(args.to)}", file=sys.stderr)
+        if not batches:
+            print("No input files matched.", file=sys.stderr)
+            return 2
+        for batch_function, inputs, kwargs in batches:
+            if batch_function is engine.convert_images:
+                kwargs['save_kwargs'] = {**kwargs['save_kwargs'], **_save_overrides(args)}
+                kwargs['frames'] = args.frames
+                kwargs['pixel_ops'] = args.pixel_ops
+                kwargs['max_size'] = args.max_size
+            elif batch_function is engine.convert_images_multi:
+                kwargs['max_size'] = args.max_size
+        queue = distributed.WorkQueue(args.queue)
+        try:
+            job_id = queue.add_job(batches, args.output_dir, ",".join(args.to), args.unit_files)
+        finally:
+            queue.close()
+        print(f"Queued job {job_id}: {sum(len(inputs) for _, inputs, _ in batches)} files in {args.queue}", file=sys.stderr)
+    if args.no_wait:
+        return 0
+    progress = distributed.watch_progress(args.queue, job_id, args.interval,
+                                          stream=open(os.devnull, "w") if args.quiet else sys.stderr)
+    queue = distributed.WorkQueue(args.queue)
+    try:
+        failures = queue.failures(job_id)
+    finally:
+        queue.close()
+    print(json.dumps({'job': job_id, **progress,
+                      'failures': [{'input_path': path, 'error': error} for path, error in failures]}, indent=2))
+    return 1 if progress['failed'] or progress['units']['failed'] else 0
+
+def cmd_worker(args):
+    from . import distributed
+    log = (lambda message: None) if args.quiet else (lambda message: print(message, file=sys.stderr, flush=True))
+    worker = distributed.Worker(args.queue, args.id, args.workers, args.lease, args.poll, args.exit_when_idle, log)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    try:
+        error = worker.run()
+    except KeyboardInterrupt:
+        error = None
+    if error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m converter_core", description="Batch file converter.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert files, directories or glob patterns")
+    convert.add_argument("inputs", nargs="+", help="input files, directories or glob patterns")
+    convert.add_argument("--to", required=True, type=parse_targets, metavar="TARGET[,TARGET...]",
+                         help=f"target format: {', '.join(all_targets())}; "
+                              "several image targets are produced from a single decode")
+    convert.add_argument("-o", "--output-dir", required=True, help="folder for converted files")
+    convert.add_argument("-r", "--recursive", action="store_true", help="descend into directories and expand ** in globs")
+    convert.add_argument("-q", "--quality", type=int, help="encoder quality for JPG/WEBP")
+    convert.add_argument("--max-size", type=int, metavar="PX", help="scale images down to fit in PX x PX")
+    convert.add_argument("--max-bytes", type=parse_size, metavar="SIZE",
+                         help="search the JPG/WEBP quality per image for the best one under SIZE (e.g. 200K)")
+    convert.add_argument("--min-ssim", type=float, metavar="S",
+                         help="search the JPG/WEBP quality per image for the smallest file with SSIM >= S (e.g. 0.95)")
+    convert.add_argument("--min-psnr", type=float, metavar="DB",
+                         help="search the JPG/WEBP quality per image for the smallest file with PSNR >= DB")
+    convert.add_argument("--frames", choices=("auto", "split", "first"), default="auto",
+                         help="animated and multi-page images: keep every frame in GIF/WEBP/PNG outputs (auto), write "
+                              "each frame to a numbered file (split) or keep only the first frame")
+    convert.add_argument("--pixel-ops", type=parse_pixel_ops, metavar="OPS",
+                         help="per-pixel steps run in one NumPy pass before encoding, e.g. "
+                              "'flatten=#fff,gray=rec709,gamma=2.2,levels=16:235' (also invert, swap=bgr)")
+    convert.add_argument("--option", action="append", type=parse_option, metavar="KEY=VALUE",
+                         help="extra Pillow save option, may be repeated")
+    convert.add_argument("-j", "--workers", type=int, default=engine.default_workers(),
+                         help="worker processes for image batches and PDF page ranges (default: CPU count)")
+    convert.add_argument("--memory-limit", type=int, metavar="MB",
+                         help="keep the estimated memory of images converted at once under MB; huge files run alone")
+    convert.add_argument("--pages-per-chunk", type=int, default=PAGES_PER_CHUNK,
+                         help=f"PDF pages converted per worker task for --to docx, 0 for one pass (default: {PAGES_PER_CHUNK})")
+    convert.add_argument("--office-backend", choices=office.BACKENDS, default="auto",
+                         help="Word to PDF engine: a pool of -j headless LibreOffice workers or Microsoft Word via docx2pdf "
+                              "(default: auto)")
+    convert.add_argument("--office-max-jobs", type=int, default=office.DEFAULT_MAX_JOBS, metavar="N",
+                         help="restart each LibreOffice worker after N documents")
+    convert.add_argument("--office-timeout", type=int, default=office.DEFAULT_TIMEOUT, metavar="SECONDS",
+                         help="restart a LibreOffice worker when one document takes longer than this")
+    convert.add_argument("--html-renderer", choices=render.RENDERERS, default="auto",
+                         help="HTML to PNG engine: -j warm headless Chromium tabs (Playwright) or wkhtmltoimage processes "
+                              "(default: auto)")
+    convert.add_argument("--page-width", type=int, default=1024, metavar="PX", help="viewport width for HTML pages")
+    convert.add_argument("--page-height", type=int, metavar="PX", help="viewport height for HTML pages (default: full page)")
+    convert.add_argument("--zoom", type=float, default=1.0, help="zoom factor for HTML pages")
+    convert.add_argument("--crop", type=parse_crop, metavar="X,Y,W,H", help="crop rendered HTML pages to this rectangle")
+    convert.add_argument("--page-timeout", type=float, default=render.DEFAULT_TIMEOUT, metavar="SECONDS",
+                         help="give up on an HTML page after this long")
+    convert.add_argument("--manifest", metavar="FILE",
+                         help=f"job manifest used to skip up-to-date outputs (default: OUTPUT_DIR/{MANIFEST_NAME})")
+    convert.add_argument("--no-manifest", action="store_true", help="convert every input even if its output is up to date")
+    convert.add_argument("--no-cache", action="store_true", help="always convert, ignoring the conversion cache")
+    convert.add_argument("--cache-dir", help="conversion cache folder (default: per-user cache folder)")
+    convert.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2, metavar="MB",
+                         help="size cap of the conversion cache in MB")
+    convert.add_argument("--no-preflight", action="store_true",
+                         help="skip the pre-flight check of formats, headers and output name collisions")
+    convert.add_argument("--summary", metavar="FILE", help="write the JSON summary to FILE instead of stdout")
+    convert.add_argument("--trace", metavar="FILE", help="append a JSON-lines record per file with its stage timings")
+    convert.add_argument("--profile", metavar="FILE",
+                         help="write cProfile stats of the run to FILE (use with -j 1 to include the conversions)")
+    convert.add_argument("--quiet", action="store_true", help="do not print per-file progress")
+    convert.set_defaults(func=cmd_convert)
+
+    bench = commands.add_parser("bench", help="benchmark every conversion on a generated corpus")
+    bench.add_argument("--scale", choices=["small", "medium", "large"], default="small", help="corpus size")
+    bench.add_argument("-j", "--workers", type=int, help="worker processes for parallel scenarios (default: CPU count)")
+    bench.add_argument("--only", action="append", metavar="PATTERN", help="run only scenarios matching PATTERN, may be repeated")
+    bench.add_argument("--corpus-dir", help="generate the corpus here and keep it (default: temporary folder)")
+    bench.add_argument("--out", metavar="FILE", help="write the results JSON to FILE instead of stdout")
+    bench.add_argument("--baseline", metavar="FILE", help="compare against a stored results file and exit 1 on regressions")
+    bench.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before a regression is flagged (default: 0.15)")
+    bench.add_argument("--save-baseline", metavar="FILE", help="also store these results as a baseline")
+    bench.set_defaults(func=cmd_bench)
+
+    from .server import DEFAULT_BATCH_MAX, DEFAULT_BATCH_WINDOW, DEFAULT_MAX_PENDING, DEFAULT_PORT
+    serve = commands.add_parser("serve", help="run a local HTTP conversion service")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    serve.add_argument("--unix-socket", metavar="PATH", help="listen on a unix socket instead of a TCP port")
+    serve.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    serve.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                       help="requests waiting or running before new ones get 429")
+    serve.add_argument("--batch-window-ms", type=float, default=DEFAULT_BATCH_WINDOW * 1000,
+                       help="how long small image requests wait to be grouped into one worker task")
+    serve.add_argument("--batch-max", type=int, default=DEFAULT_BATCH_MAX, help="most images in one worker task")
+    serve.add_argument("--html-renderer", choices=render.RENDERERS, default="auto", help="HTML to PNG engine")
+    serve.add_argument("--office-backend", choices=office.BACKENDS, default="auto", help="Word to PDF engine")
+    serve.add_argument("--quiet", action="store_true", help="do not log requests")
+    serve.set_defaults(func=cmd_serve)
+
+    from .watch import AFTER_ACTIONS, DEFAULT_MAX_BATCH, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE
+    watch = commands.add_parser("watch", help="convert files as they arrive in watched folders")
+    watch.add_argument("folder", nargs="?", help="folder to watch (or use --config)")
+    watch.add_argument("-o", "--output-dir", help="folder for converted files")
+    watch.add_argument("--rule", action="append", type=parse_rule, metavar="PATTERN=TARGET",
+                       help="convert files matching PATTERN to TARGET, e.g. '*.heic=jpg'; may be repeated, first match wins")
+    watch.add_argument("--config", metavar="FILE", help="JSON file with several folders and their rules")
+    watch.add_argument("-r", "--recursive", action="store_true", help="also watch subfolders")
+    watch.add_argument("-j", "--workers", type=int, default=engine.default_workers(),
+                       help="worker processes per batch (default: CPU count)")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE, metavar="SECONDS",
+                       help="convert a file once its size and mtime have not changed for this long")
+    watch.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, metavar="SECONDS",
+                       help="how often folders are listed when file events are not available")
+    watch.add_argument("--polling", action="store_true", help="poll even if the watchdog library is installed")
+    watch.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="most files converted in one batch")
+    watch.add_argument("--after", choices=AFTER_ACTIONS, default="keep",
+                       help="what to do with converted inputs: keep them, move them to .processed (failures to "
+                            ".failed) or delete them")
+    watch.add_argument("--stats-interval", type=float, metavar="SECONDS", help="print JSON counters to stderr this often")
+    watch.add_argument("--metrics-port", type=int, help="serve Prometheus counters at /metrics on this port")
+    watch.add_argument("--metrics-host", default="127.0.0.1", help="address for --metrics-port (default: 127.0.0.1)")
+    watch.add_argument("--quiet", action="store_true", help="do not log converted files")
+    watch.set_defaults(func=cmd_watch)
+
+    from .distributed import DEFAULT_LEASE, DEFAULT_POLL, DEFAULT_UNIT_FILES
+    coordinator = commands.add_parser("coordinator",
+                                      help="queue a job in a shared work queue for worker processes and follow it")
+    coordinator.add_argument("queue", help="work queue file (SQLite), created if missing")
+    coordinator.add_argument("inputs", nargs="*", help="inputs to queue; without them, follow the jobs already queued")
+    coordinator.add_argument("--to", type=parse_targets, metavar="TARGET[,TARGET...]", help="target format")
+    coordinator.add_argument("-o", "--output-dir", help="folder for converted files, as the workers see it")
+    coordinator.add_argument("-r", "--recursive", action="store_true", help="descend into directories and expand ** in globs")
+    coordinator.add_argument("-q", "--quality", type=int, help="encoder quality for JPG/WEBP")
+    coordinator.add_argument("--max-size", type=int, metavar="PX", help="scale images down to fit in PX x PX")
+    coordinator.add_argument("--frames", choices=("auto", "split", "first"), default="auto",
+                             help="animated and multi-page images, as for convert")
+    coordinator.add_argument("--pixel-ops", metavar="OPS", help="pixel operations, as for convert")
+    coordinator.add_argument("--option", action="append", type=parse_option, metavar="KEY=VALUE",
+                             help="extra encoder option, as for convert")
+    coordinator.add_argument("--unit-files", type=int, default=DEFAULT_UNIT_FILES,
+                             help=f"most files in one work unit (default: {DEFAULT_UNIT_FILES})")
+    coordinator.add_argument("--interval", type=float, default=5.0, metavar="SECONDS",
+                             help="how often progress is printed and expired leases are requeued")
+    coordinator.add_argument("--no-wait", action="store_true", help="queue the job and exit")
+    coordinator.add_argument("--quiet", action="store_true", help="only print the final summary")
+    coordinator.set_defaults(func=cmd_coordinator)
+
+    worker = commands.add_parser("worker", help="convert work units from a shared work queue")
+    worker.add_argument("queue", help="work queue file (SQLite) written by the coordinator")
+    worker.add_argument("-j", "--workers", type=int, default=engine.default_workers(),
+                        help="worker processes per unit (default: CPU count)")
+    worker.add_argument("--lease", type=float, default=DEFAULT_LEASE, metavar="SECONDS",
+                        help="a unit goes back to the queue when this worker is silent this long")
+    worker.add_argument("--poll", type=float, default=DEFAULT_POLL, metavar="SECONDS",
+                        help="how often an idle worker looks for work")
+    worker.add_argument("--exit-when-idle", action="store_true", help="exit once every queued unit is finished")
+    worker.add_argument("--id", help="worker name shown in the queue (default: host-pid-random)")
+    worker.add_argument("--quiet", action="store_true", help="do not log finished units")
+    worker.set_defaults(func=cmd_worker)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,413 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from . import engine
+from .trace import file_size
+
+# Distributed batch conversion through a shared work queue.
+# The queue is a SQLite file. A coordinator shards a job's inputs into work
+# units of a few dozen files (largest files first, so the long units do not
+# all end up at the tail) and watches them; any number of worker processes,
+# on this host or on others that see the same paths, lease one unit at a
+# time, convert it with the usual batch functions and report the outcome.
+# A lease is kept alive by a heartbeat while the unit runs; when a worker
+# dies its lease runs out and the unit is queued again, up to MAX_ATTEMPTS
+# times. Leasing happens inside an IMMEDIATE transaction, so two workers
+# never get the same unit. SQLite needs working file locks: put the queue
+# on a local disk, or on a network filesystem that provides them.
+
+DEFAULT_UNIT_FILES = 32
+DEFAULT_UNIT_BYTES = 256 * 1024 ** 2
+DEFAULT_LEASE = 120.0  # seconds a unit stays leased without a heartbeat
+DEFAULT_POLL = 2.0
+MAX_ATTEMPTS = 3
+THROUGHPUT_WINDOW = 60.0  # seconds of finished units used for the current rate
+MAX_FAILURES_KEPT = 20  # per unit; the rest are only counted
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    target TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    function TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    requeues INTEGER NOT NULL DEFAULT 0,
+    finished REAL,
+    seconds REAL,
+    succeeded INTEGER,
+    failures TEXT,
+    output_bytes INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS units_state ON units(state, id);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started REAL,
+    last_seen REAL,
+    units INTEGER NOT NULL DEFAULT 0,
+    files INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def shard(paths, unit_files=DEFAULT_UNIT_FILES, unit_bytes=DEFAULT_UNIT_BYTES):
+    """Splits `paths` into lists of at most `unit_files` files and (unless a single file is larger) `unit_bytes`."""
+    sizes = {path: file_size(path) or 0 for path in paths}
+    units, current, current_bytes = [], [], 0
+    for path in sorted(paths, key=lambda p: -sizes[p]):
+        if current and (len(current) >= unit_files or current_bytes + sizes[path] > unit_bytes):
+            units.append(current)
+            current, current_bytes = [], 0
+        current.append(path)
+        current_bytes += sizes[path]
+    if current:
+        units.append(current)
+    return [(unit, sum(sizes[p] for p in unit)) for unit in units]
+
+
+class WorkQueue:
+    """The shared queue in the SQLite file at `path`; one instance per thread."""
+
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction that takes the database lock up front, so reads and the update cannot interleave."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def close(self):
+        self._db.close()
+
+    # --- Coordinator side ---
+    def add_job(self, batches, output_dir, target, unit_files=DEFAULT_UNIT_FILES, unit_bytes=DEFAULT_UNIT_BYTES):
+        """Queues planned batches, as from planning.plan_batches, as one job; returns the job id.
+
+        Batch options must be JSON-serializable; `workers`, the cache and
+        other per-machine settings are left to the workers.
+        """
+        output_dir = os.path.abspath(output_dir)
+        rows = []
+        for function, inputs, kwargs in batches:
+            options = json.dumps(kwargs)
+            for paths, size in shard([os.path.abspath(p) for p in inputs], unit_files, unit_bytes):
+                rows.append((function.__name__, options, json.dumps(paths), len(paths), size))
+        with self._transaction() as db:
+            job_id = db.execute("INSERT INTO jobs (created, target, output_dir, files, bytes) VALUES (?, ?, ?, ?, ?)",
+                                (time.time(), target, output_dir, sum(r[3] for r in rows),
+                                 sum(r[4] for r in rows))).lastrowid
+            db.executemany("INSERT INTO units (job_id, function, kwargs, paths, files, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                           [(job_id, *row) for row in rows])
+        return job_id
+
+    def requeue_expired(self):
+        """Puts units whose lease ran out back in the queue (or fails them after MAX_ATTEMPTS); returns how many."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE units SET state = ?, error = 'lease expired ' || attempts || ' times' "
+                       "WHERE state = ? AND lease_expires < ? AND attempts >= ?", (FAILED, LEASED, now, MAX_ATTEMPTS))
+            return db.execute("UPDATE units SET state = ?, worker = NULL, requeues = requeues + 1 "
+                              "WHERE state = ? AND lease_expires < ?", (QUEUED, LEASED, now)).rowcount
+
+    def jobs(self):
+        return [dict(row) for row in self._db.execute("SELECT * FROM jobs ORDER BY id")]
+
+    def progress(self, job_id=None):
+        """Aggregate state of one job (default: all jobs): unit and file counts, throughput, ETA and active workers."""
+        where, args = ("WHERE job_id = ?", (job_id,)) if job_id is not None else ("", ())
+        now = time.time()
+        units = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in self._db.execute(f"SELECT state, COUNT(*) FROM units {where} GROUP BY state", args):
+            units[row[0]] = row[1]
+        totals = self._db.execute(
+            f"SELECT COALESCE(SUM(files), 0), COALESCE(SUM(bytes), 0), "
+            f"COALESCE(SUM(CASE WHEN state IN ('done', 'failed') THEN files END), 0), "
+            f"COALESCE(SUM(CASE WHEN state IN ('done', 'failed') THEN bytes END), 0), "
+            f"COALESCE(SUM(succeeded), 0), COALESCE(SUM(output_bytes), 0), COALESCE(SUM(requeues), 0), "
+            f"MIN(finished) FROM units {where}", args).fetchone()
+        files, size, files_done, bytes_done, succeeded, output_bytes, requeues, first_finished = totals
+        recent = self._db.execute(
+            f"SELECT COALESCE(SUM(files), 0), COALESCE(SUM(bytes), 0) FROM units "
+            f"{where + ' AND' if where else 'WHERE'} finished >= ?", (*args, now - THROUGHPUT_WINDOW)).fetchone()
+        window = min(THROUGHPUT_WINDOW, now - first_finished) if first_finished else None
+        rate = recent[0] / window if window else None
+        workers = self._db.execute("SELECT COUNT(*) FROM workers WHERE last_seen >= ?",
+                                   (now - DEFAULT_LEASE,)).fetchone()[0]
+        return {
+            'units': units,
+            'files': files,
+            'files_done': files_done,
+            'succeeded': succeeded,
+            'failed': files_done - succeeded,
+            'bytes': size,
+            'bytes_done': bytes_done,
+            'output_bytes': output_bytes,
+            'requeues': requeues,
+            'files_per_second': round(rate, 2) if rate else None,
+            'mb_per_second': round(recent[1] / window / 1024 ** 2, 2) if window else None,
+            'eta_seconds': round((files - files_done) / rate) if rate else None,
+            'active_workers': workers,
+            'finished': units[QUEUED] == 0 and units[LEASED] == 0,
+        }
+
+    def failures(self, job_id=None, limit=100):
+        """Failed files as (path, error), and units that failed as a whole as (None, error)."""
+        where, args = ("AND job_id = ?", (job_id,)) if job_id is not None else ("", ())
+        found = []
+        for row in self._db.execute(f"SELECT state, failures, error FROM units WHERE (failures IS NOT NULL OR "
+                                    f"state = 'failed') {where} ORDER BY id", args):
+            if row['state'] == FAILED:
+                found.append((None, row['error']))
+            found.extend(tuple(item) for item in json.loads(row['failures'] or "[]"))
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    # --- Worker side ---
+    def register_worker(self, worker_id):
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO workers (id, host, pid, started, last_seen) VALUES (?, ?, ?, ?, ?)",
+                       (worker_id, socket.gethostname(), os.getpid(), time.time(), time.time()))
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE):
+        """Leases the next queued unit (or one whose lease expired) to `worker_id`; returns it as a dict, or None."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT * FROM units WHERE state = ? OR (state = ? AND lease_expires < ? AND attempts < ?) "
+                             "ORDER BY state = ? DESC, id LIMIT 1", (QUEUED, LEASED, now, MAX_ATTEMPTS, LEASED)).fetchone()
+            db.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker_id))
+            if row is None:
+                return None
+            db.execute("UPDATE units SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                       "requeues = requeues + ? WHERE id = ?",
+                       (LEASED, worker_id, now + lease_seconds, int(row['state'] == LEASED), row['id']))
+            output_dir = db.execute("SELECT output_dir FROM jobs WHERE id = ?", (row['job_id'],)).fetchone()[0]
+        unit = dict(row)
+        unit['paths'] = json.loads(unit['paths'])
+        unit['kwargs'] = json.loads(unit['kwargs'])
+        unit['output_dir'] = output_dir
+        return unit
+
+    def heartbeat(self, worker_id, unit_id, lease_seconds=DEFAULT_LEASE):
+        """Extends the lease; False when the unit is no longer this worker's (it expired and was leased again)."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker_id))
+            return db.execute("UPDATE units SET lease_expires = ? WHERE id = ? AND worker = ? AND state = ?",
+                              (now + lease_seconds, unit_id, worker_id, LEASED)).rowcount == 1
+
+    def complete(self, worker_id, unit_id, batch, seconds):
+        """Records a converted unit; False (and nothing recorded) when the lease was lost meanwhile."""
+        failures = [(r.input_path, r.error) for r in batch.results if not r.ok]
+        output_bytes = sum(r.output_bytes or 0 for r in batch.results)
+        with self._transaction() as db:
+            updated = db.execute(
+                "UPDATE units SET state = ?, finished = ?, seconds = ?, succeeded = ?, failures = ?, output_bytes = ?, "
+                "lease_expires = NULL WHERE id = ? AND worker = ? AND state = ?",
+                (DONE, time.time(), seconds, batch.success_count, json.dumps(failures[:MAX_FAILURES_KEPT]) if failures
+                 else None, output_bytes, unit_id, worker_id, LEASED)).rowcount == 1
+            if updated:
+                db.execute("UPDATE workers SET last_seen = ?, units = units + 1, files = files + ? WHERE id = ?",
+                           (time.time(), len(batch.results), worker_id))
+        return updated
+
+    def release(self, worker_id, unit_id, error):
+        """Gives a unit back after the worker could not run it; it fails for good after MAX_ATTEMPTS tries."""
+        with self._transaction() as db:
+            db.execute("UPDATE units SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, "
+                       "lease_expires = NULL, error = ?, finished = CASE WHEN attempts >= ? THEN ? END "
+                       "WHERE id = ? AND worker = ? AND state = ?",
+                       (MAX_ATTEMPTS, FAILED, QUEUED, error, MAX_ATTEMPTS, time.time(), unit_id, worker_id, LEASED))
+
+
+def _decode_options(kwargs):
+    """Batch options as the engine takes them, from their JSON form in the queue."""
+    kwargs = dict(kwargs)
+    save_kwargs = kwargs.get('save_kwargs')
+    if save_kwargs and 'sizes' in save_kwargs:
+        kwargs['save_kwargs'] = {**save_kwargs, 'sizes': [tuple(size) for size in save_kwargs['sizes']]}
+    if isinstance(kwargs.get('pixel_ops'), str):
+        from .pixelops import parse_ops
+        kwargs['pixel_ops'] = parse_ops(kwargs['pixel_ops'])
+    return kwargs
+
+
+class _Heartbeat:
+    """Keeps a unit's lease alive from a background thread while the unit converts."""
+
+    def __init__(self, queue_path, worker_id, unit_id, lease_seconds):
+        self.lost = False
+        self._stop = threading.Event()
+        self._args = (queue_path, worker_id, unit_id, lease_seconds)
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        queue_path, worker_id, unit_id, lease_seconds = self._args
+        queue = WorkQueue(queue_path)
+        try:
+            while not self._stop.wait(lease_seconds / 3):
+                try:
+                    if not queue.heartbeat(worker_id, unit_id, lease_seconds):
+                        self.lost = True
+                        return
+                except sqlite3.OperationalError:
+                    pass # database busy for longer than the timeout; the next beat tries again
+        finally:
+            queue.close()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Worker:
+    """Leases units from the queue at `queue_path` and converts them with `workers` processes each.
+
+    Document and HTML engines are opened once and reused across units.
+    With `exit_when_idle` the worker stops once no unit is queued or
+    leased; otherwise it waits for new jobs until `stop` is called.
+    """
+
+    def __init__(self, queue_path, worker_id=None, workers=None, lease_seconds=DEFAULT_LEASE, poll=DEFAULT_POLL,
+                 exit_when_idle=False, log=None):
+        self.queue_path = queue_path
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.workers = workers or engine.default_workers()
+        self.lease_seconds = lease_seconds
+        self.poll = poll
+        self.exit_when_idle = exit_when_idle
+        self.log = log or (lambda message: None)
+        self.units_done = 0
+        self._stop = threading.Event()
+        self._engines = {}
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Works until stopped (or idle, with exit_when_idle); returns an error message if a unit could not run."""
+        queue = WorkQueue(self.queue_path)
+        queue.register_worker(self.id)
+        self.log(f"Worker {self.id} started with {self.workers} process(es)")
+        try:
+            while not self._stop.is_set():
+                unit = queue.lease(self.id, self.lease_seconds)
+                if unit is None:
+                    # Workers settle dead workers' units themselves, so the queue drains without a coordinator.
+                    if queue.requeue_expired():
+                        continue
+                    if self.exit_when_idle and queue.progress()['finished']:
+                        return None
+                    self._stop.wait(self.poll)
+                    continue
+                error = self._run_unit(queue, unit)
+                if error:
+                    return error
+            return None
+        finally:
+            queue.close()
+            for backend in self._engines.values():
+                backend.close()
+
+    def _run_unit(self, queue, unit):
+        function = getattr(engine, unit['function'])
+        kwargs = _decode_options(unit['kwargs'])
+        kwargs['workers'] = self.workers
+        if function is engine.convert_documents and kwargs.get('out_ext') == ".pdf":
+            kwargs['office_backend'] = self._engine("office")
+        elif function is engine.convert_html_files:
+            kwargs['renderer'] = self._engine("html")
+        os.makedirs(unit['output_dir'], exist_ok=True)
+        heartbeat = _Heartbeat(self.queue_path, self.id, unit['id'], self.lease_seconds)
+        start = time.perf_counter()
+        try:
+            batch = function(unit['paths'], unit['output_dir'], **kwargs)
+        except Exception as e:
+            batch = engine.BatchResult(total=len(unit['paths']), aborted=f"{type(e).__name__}: {e}")
+        finally:
+            heartbeat.stop()
+        seconds = time.perf_counter() - start
+        if batch.aborted:
+            # Usually a missing library or tool on this machine: hand the unit to another worker and stop.
+            queue.release(self.id, unit['id'], batch.aborted)
+            self.log(f"Unit {unit['id']} could not run here: {batch.aborted}")
+            return batch.aborted
+        if heartbeat.lost or not queue.complete(self.id, unit['id'], batch, seconds):
+            self.log(f"Unit {unit['id']}: lease lost, result discarded (another worker converts it again)")
+            return None
+        self.units_done += 1
+        self.log(f"Unit {unit['id']}: {batch.success_count}/{batch.total} files in {seconds:.1f}s")
+        return None
+
+    def _engine(self, kind):
+        """The office backend or HTML renderer, opened on first use and kept for later units."""
+        if kind not in self._engines:
+            try:
+                if kind == "office":
+                    from .office import open_backend
+                    self._engines[kind] = open_backend("auto", self.workers)
+                    if self._engines[kind].notice:
+                        self.log(f"Note: {self._engines[kind].notice}")
+                else:
+                    from .render import open_renderer
+                    self._engines[kind] = open_renderer("auto", self.workers)
+            except engine.MissingDependencyError:
+                return "auto" # the batch reports the missing tool itself
+        return self._engines[kind]
+
+
+def watch_progress(queue_path, job_id=None, interval=5.0, stream=sys.stderr, stop=None):
+    """Requeues expired leases and prints a JSON progress line every `interval` seconds until the job is finished.
+
+    Returns the final progress.
+    """
+    queue = WorkQueue(queue_path)
+    try:
+        while True:
+            requeued = queue.requeue_expired()
+            progress = queue.progress(job_id)
+            print(json.dumps({'job': job_id, 'requeued_now': requeued, **progress}), file=stream, flush=True)
+            if progress['finished'] or (stop and stop.is_set()):
+                return progress
+            time.sleep(interval)
+    finally:
+        queue.close()
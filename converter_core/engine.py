@@ -0,0 +1,748 @@
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+
+from .trace import StageTimer, TraceWriter, file_size, profiled
+
+# Headless conversion engine.
+# Nothing in this module touches Tk, and the heavy conversion libraries
+# (Pillow, pdf2docx, docx2pdf, pythoncom, imgkit) are only imported when a
+# conversion of that kind actually runs, so importing it is cheap on any OS.
+
+ENGINE_VERSION = "2.3"
+
+# Image targets offered by the app: format, Pillow save options and the mode
+# the image is converted to before saving.
+IMAGE_TARGETS = {
+    "jpg": {'out_format': "JPG", 'save_kwargs': {'format': 'JPEG', 'quality': 95}, 'convert_mode': 'RGB'},
+    "png": {'out_format': "PNG", 'save_kwargs': {'format': 'PNG'}, 'convert_mode': None},
+    "webp": {'out_format': "WEBP", 'save_kwargs': {'format': 'WEBP', 'quality': 85}, 'convert_mode': None},
+    "ico": {'out_format': "ICO", 'save_kwargs': {'format': 'ICO', 'sizes': [(16,16), (32,32), (48,48), (64,64)]}, 'convert_mode': None},
+    "bmp": {'out_format': "BMP", 'save_kwargs': {'format': 'BMP'}, 'convert_mode': None},
+    "gif": {'out_format': "GIF", 'save_kwargs': {'format': 'GIF'}, 'convert_mode': None},
+    "grayscale": {'out_format': "PNG", 'save_kwargs': {'format': 'PNG'}, 'convert_mode': 'L'},
+}
+
+
+class MissingDependencyError(RuntimeError):
+    """Raised when a conversion cannot run at all on this machine."""
+
+
+@dataclass
+class FileResult:
+    """Outcome of converting a single input file."""
+    input_path: str
+    output_path: str = None
+    ok: bool = False
+    error: str = None
+    seconds: float = 0.0
+    cache_hit: bool = None  # None when the conversion ran without a cache
+    up_to_date: bool = False  # skipped because the job manifest says the output is current
+    targets: dict = None  # multi-target jobs: per-target output_path, ok, error and seconds
+    stages: dict = None  # seconds per stage (open, decode, resize, convert, encode, engine, render, cache)
+    input_bytes: int = None
+    output_bytes: int = None
+    error_class: str = None
+    frames: list = None  # multi-frame sources split into numbered files: one output path per frame
+    tuning: dict = None  # tuned encodes: chosen quality, output bytes, measured SSIM/PSNR and whether the goal was met
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a batch; `aborted` holds the reason if it stopped early."""
+    total: int = 0
+    results: list = field(default_factory=list)
+    aborted: str = None
+    cancelled: bool = False
+
+    @property
+    def success_count(self):
+        return sum(1 for r in self.results if r.ok)
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def up_to_date_count(self):
+        return sum(1 for r in self.results if r.up_to_date)
+
+    @property
+    def cache_hits(self):
+        return sum(1 for r in self.results if r.cache_hit)
+
+    @property
+    def cache_misses(self):
+        return sum(1 for r in self.results if r.cache_hit is False)
+
+    def target_seconds(self):
+        """Total encode time per target of a multi-target batch."""
+        totals = {}
+        for r in self.results:
+            for name, target in (r.targets or {}).items():
+                totals[name] = totals.get(name, 0.0) + target['seconds']
+        return totals
+
+    def summary_text(self):
+        text = f"{self.success_count}/{self.total} files converted successfully."
+        if self.cancelled:
+            text = f"Cancelled. {text}"
+        if self.up_to_date_count:
+            text += f" {self.up_to_date_count} skipped as up to date."
+        if self.cache_hits or self.cache_misses:
+            text += f" Cache: {self.cache_hits} hits, {self.cache_misses} misses."
+        return text
+
+
+class BatchControl:
+    """Lets another thread pause, resume or cancel a running batch between files."""
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self.cancelled = False
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self._running.set()
+
+    def wait(self):
+        """Blocks while paused; returns False once the batch should stop."""
+        self._running.wait()
+        return not self.cancelled
+
+
+# --- Optional Support Checks ---
+_heic_support = None
+
+def heic_supported():
+    """Registers the HEIC opener with Pillow once and reports whether it is available."""
+    global _heic_support
+    if _heic_support is None:
+        try:
+            import pillow_heif
+            pillow_heif.register_heif_opener()
+            _heic_support = True
+        except ImportError:
+            _heic_support = False
+    return _heic_support
+
+def _require(module_name, package):
+    """Imports a conversion library on first use, turning a missing one into MissingDependencyError."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise MissingDependencyError(f"The '{package}' library is required for this conversion.\n\nTo install, run: pip install {package}")
+
+def html_supported():
+    """Reports whether an HTML renderer (Playwright or the wkhtmltoimage tool) is installed."""
+    from .render import find_wkhtmltoimage
+    return importlib.util.find_spec("playwright") is not None or bool(find_wkhtmltoimage())
+
+
+def output_path_for(path, output_dir, out_ext):
+    """Builds the output path for `path`; `out_ext` may be given with or without the dot."""
+    if not out_ext.startswith("."):
+        out_ext = "." + out_ext.lower()
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir, f"{base_name}{out_ext}")
+
+
+# --- Single File Conversions ---
+def _finish(result, timer, start, error=None):
+    """Fills in the timing, stage breakdown, sizes and error of a FileResult."""
+    if error is not None:
+        result.error = str(error)
+        result.error_class = type(error).__name__
+    result.seconds = time.perf_counter() - start
+    result.stages = timer.stages
+    result.input_bytes = file_size(result.input_path)
+    if result.ok:
+        if result.frames:
+            outputs = result.frames
+        elif result.targets:
+            outputs = [t['output_path'] for t in result.targets.values()]
+        else:
+            outputs = [result.output_path]
+        result.output_bytes = sum(file_size(p) or 0 for p in outputs)
+    return result
+
+def _swap(old, new):
+    """Returns `new`, closing `old` first when it is a different image so its pixels are freed right away."""
+    if new is not old:
+        old.close()
+    return new
+
+def _save_image(img, target, options, tune=None, tune_cache=None):
+    """Saves `img`; with a TuningGoal `tune` searches the encoder settings and returns the tuning report."""
+    if tune is None:
+        img.save(target, **options)
+        return None
+    from .tuning import save_tuned
+    return save_tuned(img, target, options, tune, tune_cache)
+
+def _encode_image(source, target, save_kwargs, convert_mode=None, max_size=None, timer=None, tune=None,
+                  tune_cache=None, animate=False, frame_workers=None, pixel_ops=None):
+    """Decodes `source` and encodes it into `target`; each is a path or a binary file object.
+
+    The one image pipeline behind convert_image and converter_core.streams,
+    so files and in-memory data give identical output. Returns the tuning
+    report when `tune` is given (see converter_core.tuning). With `animate`,
+    a multi-frame source is encoded with all its frames (see
+    converter_core.frames). `pixel_ops` run before the mode conversion (see
+    converter_core.pixelops).
+    """
+    from . import imaging, pixelops
+    Image = _require("PIL.Image", "Pillow")
+    timer = timer or StageTimer()
+    with timer.stage("open"):
+        img = Image.open(source)
+    with img:
+        if animate and getattr(img, "n_frames", 1) > 1:
+            from .frames import save_animation
+            with timer.stage("encode"):
+                save_animation(img, target, save_kwargs, convert_mode, max_size, frame_workers, pixel_ops)
+            return None
+        with timer.stage("decode"):
+            imaging.draft_for(img, save_kwargs, max_size)
+            img.load()
+        # Each step drops the previous full-size copy before the next one is saved.
+        with timer.stage("resize"):
+            resized, options = imaging.prepare(img, save_kwargs, max_size)
+            img = _swap(img, resized)
+        with timer.stage("convert"):
+            img = _swap(img, pixelops.convert(img, convert_mode, pixel_ops, frame_workers or 1))
+        with timer.stage("encode"):
+            report = _save_image(img, target, options, tune, tune_cache)
+        img.close()
+    return report
+
+def convert_image(path, output_dir, out_format, save_kwargs, convert_mode=None, cache=None, max_size=None,
+                  low_memory=False, tune=None, tune_cache=None, frames="auto", frame_workers=None, pixel_ops=None):
+    """Converts one image file, reusing a cached output when `cache` has one.
+
+    `max_size` scales the image down to fit in a max_size x max_size box.
+    Small outputs such as icons are decoded at reduced size (see
+    converter_core.imaging). With `low_memory`, a large uncompressed source
+    that only needs a mode change is converted in row bands (see
+    converter_core.memory). `tune`, a converter_core.tuning.TuningGoal,
+    replaces the fixed quality with a search for the cheapest setting that
+    meets it; `tune_cache` (a ParameterCache) remembers the settings found.
+
+    `frames` decides what happens to animated and multi-page sources:
+    "auto" keeps every frame when the output format can be animated (GIF,
+    WEBP, PNG as APNG) and the first frame otherwise, "split" writes each
+    frame to a numbered file (listed in `result.frames`) and "first" keeps
+    only the first frame. `frame_workers` threads process the frames.
+
+    `pixel_ops` is a sequence of converter_core.pixelops operations
+    (grayscale weights, alpha flattening, gamma, levels...) run as one
+    NumPy pass before the conversion to `convert_mode`. Either way, alpha
+    is flattened onto white when `convert_mode` has none.
+    """
+    from . import frames as multiframe
+    _require("PIL.Image", "Pillow") # a missing Pillow stops the batch instead of failing every file
+    if pixel_ops:
+        _require("numpy", "numpy")
+    heic_supported()
+
+    start = time.perf_counter()
+    timer = StageTimer()
+    output_path = output_path_for(path, output_dir, out_format)
+    result = FileResult(path, output_path)
+    try:
+        count = 1
+        if frames == "split" or (frames == "auto" and multiframe.animates(save_kwargs)):
+            with timer.stage("open"):
+                count = multiframe.frame_count(path)
+        if frames == "split" and count > 1:
+            # Several outputs per input, so the single-file conversion cache does not apply.
+            result.output_path = None
+            with timer.stage("encode"):
+                result.frames = multiframe.split_frames(
+                    path, multiframe.frame_output_paths(path, output_dir, out_format, count), save_kwargs,
+                    convert_mode, max_size, frame_workers, pixel_ops)
+            result.ok = True
+            return _finish(result, timer, start)
+        animated = frames == "auto" and count > 1
+
+        with timer.stage("cache"):
+            params = ["image", out_format, save_kwargs, convert_mode, max_size] + ([tune] if tune else [])
+            params += ["animated"] if animated else []
+            params += [list(pixel_ops)] if pixel_ops else []
+            key = cache.key_for(path, params) if cache else None
+            hit = bool(key) and cache.fetch(key, output_path)
+        if hit:
+            result.cache_hit = True
+        else:
+            if cache:
+                cache.prepare_output(output_path)
+            banded = None
+            if (low_memory and convert_mode and not max_size and not animated and not pixel_ops
+                    and save_kwargs.get('format') != "ICO"):
+                from .memory import convert_in_bands
+                with timer.stage("convert"):
+                    banded = convert_in_bands(path, convert_mode)
+            if banded is not None:
+                with banded, timer.stage("encode"):
+                    result.tuning = _save_image(banded, output_path, save_kwargs, tune, tune_cache)
+            else:
+                result.tuning = _encode_image(path, output_path, save_kwargs, convert_mode, max_size, timer, tune,
+                                              tune_cache, animated, frame_workers, pixel_ops)
+            if key:
+                with timer.stage("cache"):
+                    cache.store(key, output_path)
+                result.cache_hit = False
+        result.ok = True
+    except Exception as e:
+        return _finish(result, timer, start, e)
+    return _finish(result, timer, start)
+
+def target_output_paths(path, output_dir, targets):
+    """Output path per target name; targets sharing an extension get a `_name` suffix."""
+    extensions = [IMAGE_TARGETS[name]['out_format'].lower() for name in targets]
+    paths = {}
+    for name, ext in zip(targets, extensions):
+        if extensions.count(ext) > 1:
+            base_name = os.path.splitext(os.path.basename(path))[0]
+            paths[name] = os.path.join(output_dir, f"{base_name}_{name}.{ext}")
+        else:
+            paths[name] = output_path_for(path, output_dir, ext)
+    return paths
+
+def convert_image_multi(path, output_dir, targets, max_size=None):
+    """Decodes one image once and encodes it to every IMAGE_TARGETS name in `targets`.
+
+    Mode conversions are shared between targets that need the same mode.
+    The result is ok only if every target succeeded; `result.targets`
+    holds the per-target outcome and encode time.
+    """
+    from . import imaging
+    Image = _require("PIL.Image", "Pillow")
+    heic_supported()
+
+    start = time.perf_counter()
+    timer = StageTimer()
+    output_paths = target_output_paths(path, output_dir, targets)
+    result = FileResult(path, output_paths[targets[0]], targets={})
+    try:
+        with timer.stage("open"):
+            source = Image.open(path)
+        with source:
+            with timer.stage("decode"):
+                if max_size:
+                    imaging.draft_for(source, {}, max_size)
+                elif all(IMAGE_TARGETS[name]['save_kwargs']['format'] == "ICO" for name in targets):
+                    imaging.request_draft(source, imaging.cover_size(source.size, imaging.ICO_MAX_SIZE))
+                source.load()
+            if max_size:
+                with timer.stage("resize"):
+                    source = _swap(source, imaging.limit_size(source, max_size))
+            converted = {source.mode: source}
+            for name in targets:
+                spec = IMAGE_TARGETS[name]
+                target_start = time.perf_counter()
+                outcome = {'output_path': output_paths[name], 'ok': False, 'error': None, 'error_class': None}
+                try:
+                    mode = spec['convert_mode'] or source.mode
+                    if mode not in converted:
+                        converted[mode] = imaging.to_mode(source, mode)
+                    img, options = imaging.prepare(converted[mode], spec['save_kwargs'])
+                    img.save(output_paths[name], **options)
+                    outcome['ok'] = True
+                except Exception as e:
+                    outcome['error'] = str(e)
+                    outcome['error_class'] = type(e).__name__
+                outcome['seconds'] = time.perf_counter() - target_start
+                result.targets[name] = outcome
+        failed = [f"{name}: {t['error']}" for name, t in result.targets.items() if not t['ok']]
+        result.ok = not failed
+        result.error = "; ".join(failed) or None
+        result.stages = timer.stages
+        for name, target in result.targets.items():
+            timer.stages[f"target:{name}"] = target['seconds']
+    except Exception as e:
+        return _finish(result, timer, start, e)
+    return _finish(result, timer, start)
+
+def convert_document(path, output_dir, out_ext, pages_per_chunk=None, workers=1, page_progress=None, cache=None,
+                     office_backend=None):
+    """Converts one PDF to Word (.docx) or one Word document to PDF.
+
+    With `pages_per_chunk` set, a PDF is converted in page ranges spread over
+    `workers` processes and `page_progress(done_pages, total_pages)` reports
+    progress inside the file (see converter_core.pdf). Word documents go
+    through `office_backend` (see converter_core.office), Microsoft Word via
+    docx2pdf by default.
+    """
+    start = time.perf_counter()
+    timer = StageTimer()
+    output_path = output_path_for(path, output_dir, out_ext)
+    result = FileResult(path, output_path)
+    try:
+        with timer.stage("cache"):
+            backend_name = getattr(office_backend, 'name', None) if out_ext == ".pdf" else None
+            key = cache.key_for(path, ["document", out_ext, pages_per_chunk, backend_name]) if cache else None
+            hit = bool(key) and cache.fetch(key, output_path)
+        if hit:
+            result.cache_hit = True
+            result.ok = True
+            return _finish(result, timer, start)
+        if cache:
+            cache.prepare_output(output_path)
+
+        with timer.stage("engine"):
+            if out_ext == ".pdf":
+                if office_backend is None:
+                    from .office import Docx2PdfBackend
+                    office_backend = Docx2PdfBackend()
+                office_backend.convert(path, output_path)
+            elif pages_per_chunk:
+                from .pdf import convert_pdf_chunked
+                convert_pdf_chunked(path, output_path, pages_per_chunk, workers, page_progress)
+            else: # PDF to Word
+                pdf2docx = _require("pdf2docx", "pdf2docx")
+                cv = pdf2docx.Converter(path)
+                try:
+                    cv.convert(output_path, start=0, end=None)
+                finally:
+                    cv.close()
+        result.ok = os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        if not result.ok:
+            result.error = "No output was produced."
+            result.error_class = "EmptyOutput"
+        elif key:
+            with timer.stage("cache"):
+                cache.store(key, output_path)
+            result.cache_hit = False
+    except MissingDependencyError:
+        raise
+    except Exception as e:
+        return _finish(result, timer, start, e)
+    return _finish(result, timer, start)
+
+def convert_html(path, output_dir, out_ext=".png", renderer=None):
+    """Renders one HTML file to an image.
+
+    `renderer` is an open converter_core.render renderer; without one the
+    page is rendered by a fresh wkhtmltoimage process through imgkit.
+    """
+    imgkit = None if renderer else _require("imgkit", "imgkit")
+
+    start = time.perf_counter()
+    timer = StageTimer()
+    output_path = output_path_for(path, output_dir, out_ext)
+    result = FileResult(path, output_path)
+    try:
+        with timer.stage("render"):
+            if renderer:
+                renderer.render(path, output_path)
+            else:
+                imgkit.from_file(path, output_path, options={'enable-local-file-access': None})
+        result.ok = True
+    except OSError as e:
+        if "No wkhtmltoimage executable found" in str(e):
+            raise MissingDependencyError("wkhtmltoimage tool not found. Please ensure it is installed and in your system's PATH.")
+        return _finish(result, timer, start, e)
+    except Exception as e:
+        return _finish(result, timer, start, e)
+    return _finish(result, timer, start)
+
+
+# --- Batches ---
+def default_workers():
+    """Number of worker processes used when a caller asks for 'all cores'."""
+    return os.cpu_count() or 1
+
+def run_batch(convert_one, input_paths, progress=None, workers=1, manifest=None, control=None, trace=None, threads=False,
+              budget=None, **kwargs):
+    """Runs `convert_one(path, **kwargs)` over every input.
+
+    With `workers` > 1 the files are converted in that many worker processes
+    and results arrive out of order; `batch.results` is put back into input
+    order at the end; `threads` uses worker threads instead, for converters
+    that hand the work to other processes themselves (e.g. an office pool).
+    `progress(done, total, result)` is called after each
+    file. A MissingDependencyError stops the batch and is recorded in
+    `aborted`; any other failure only affects its own file.
+
+    With a converter_core.manifest.JobManifest, inputs it reports as up to
+    date are skipped and every new result is recorded in it as it arrives.
+    A converter_core.trace.TraceWriter as `trace` gets every new result the
+    same way. A BatchControl pauses or cancels the batch between files, and
+    a converter_core.memory.MemoryBudget holds back parallel files until
+    their estimated memory fits next to the ones already running.
+    """
+    batch = BatchResult(total=len(input_paths))
+    results = []
+    todo = input_paths
+    if manifest:
+        todo = []
+        for path in input_paths:
+            if manifest.is_up_to_date(path):
+                results.append(FileResult(path, manifest.entry(path)['output_path'], ok=True, up_to_date=True))
+            else:
+                todo.append(path)
+    sinks = [sink for sink in (manifest, trace) if sink]
+    if sinks:
+        progress = _recording_progress(sinks, progress)
+
+    if workers and workers > 1 and len(todo) > 1:
+        _run_parallel(convert_one, todo, batch, results, progress, workers, kwargs, control, threads, budget)
+    else:
+        _run_serial(convert_one, todo, batch, results, progress, kwargs, control)
+    batch.cancelled = bool(control and control.cancelled)
+    order = {path: i for i, path in enumerate(input_paths)}
+    batch.results = sorted(results, key=lambda r: order.get(r.input_path, 0))
+    return batch
+
+def _recording_progress(sinks, progress):
+    def record_then_report(done, total, result):
+        for sink in sinks:
+            sink.record(result)
+        if progress:
+            progress(done, total, result)
+    return record_then_report
+
+def _record(batch, results, result, progress):
+    if not result.ok:
+        print(f"Error ({result.input_path}): {result.error}", file=sys.stderr)
+    results.append(result)
+    if progress:
+        progress(len(results), batch.total, result)
+
+def _run_serial(convert_one, input_paths, batch, results, progress, kwargs, control):
+    for path in input_paths:
+        if control and not control.wait():
+            break
+        try:
+            result = convert_one(path, **kwargs)
+        except MissingDependencyError as e:
+            batch.aborted = str(e)
+            break
+        _record(batch, results, result, progress)
+
+def _run_parallel(convert_one, input_paths, batch, results, progress, workers, kwargs, control, threads=False,
+                  budget=None):
+    # Files are submitted a few at a time rather than all up front, so a
+    # pause or cancel takes effect after the files already running.
+    workers = min(workers, len(input_paths))
+    paths = iter(input_paths)
+    in_flight = {}
+    held = None # the next file, waiting for room in the memory budget
+    exhausted = False
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(max_workers=workers) as pool:
+        while not (control and control.cancelled):
+            while not exhausted and len(in_flight) < workers * 2 and not (control and control.paused):
+                path, held = held or next(paths, None), None
+                if path is None:
+                    exhausted = True
+                elif budget and not budget.admit(path, idle=not in_flight):
+                    held = path
+                    break
+                else:
+                    in_flight[pool.submit(convert_one, path, **kwargs)] = path
+            if not in_flight:
+                if exhausted or not control.wait():
+                    break
+                continue
+
+            done, _ = wait(in_flight, timeout=0.25, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                if budget:
+                    budget.release(path)
+                try:
+                    result = future.result()
+                except MissingDependencyError as e:
+                    batch.aborted = str(e)
+                    exhausted = True
+                    continue
+                except Exception as e: # the worker process itself died
+                    result = FileResult(path, error=f"{type(e).__name__}: {e}")
+                _record(batch, results, result, progress)
+            if batch.aborted:
+                break
+
+        # Files still queued are dropped; ones already running are finished and kept.
+        for future, path in in_flight.items():
+            if future.cancel():
+                continue
+            try:
+                _record(batch, results, future.result(), progress)
+            except Exception:
+                pass
+
+def _open_manifest(manifest_path, params):
+    if not manifest_path:
+        return None
+    from .manifest import JobManifest
+    return JobManifest(manifest_path, params)
+
+def _memory_budget(memory_limit, convert_modes, max_size):
+    if not memory_limit:
+        return None
+    from .memory import MemoryBudget, estimate_peak
+    return MemoryBudget(memory_limit, lambda path: estimate_peak(path, convert_modes, max_size))
+
+@contextmanager
+def _observed(trace_path, profile_path, job):
+    """Opens the batch's trace log (if any) and profiles the batch (if asked); yields the TraceWriter."""
+    trace = TraceWriter(trace_path, job) if trace_path else None
+    try:
+        with profiled(profile_path):
+            yield trace
+    finally:
+        if trace:
+            trace.close()
+
+def convert_images(input_paths, output_dir, out_format, save_kwargs, convert_mode=None, progress=None, workers=1,
+                   cache=None, manifest_path=None, max_size=None, control=None, trace_path=None, profile_path=None,
+                   memory_limit=None, tune=None, tune_cache=None, frames="auto", pixel_ops=None):
+    """Converts multiple images, in `workers` processes when more than one is given.
+
+    Pass a converter_core.cache.ConversionCache as `cache` to skip inputs
+    that were already converted with the same settings anywhere, and a
+    `manifest_path` to make the job resumable (see converter_core.manifest).
+    `max_size` limits the output's width and height and `control` (a
+    BatchControl) pauses or cancels the batch. `trace_path` appends a
+    per-file, per-stage trace (see converter_core.trace) and `profile_path`
+    writes cProfile stats of the batch; with `workers` > 1 the profile only
+    covers the parent process, so profile with a single worker.
+    `memory_limit` (bytes) bounds the estimated memory of the files being
+    converted at once and converts large uncompressed files in row bands.
+    `tune` and `tune_cache` search the encoder settings per file, `frames`
+    handles animated sources and `pixel_ops` adds per-pixel operations, as
+    in convert_image.
+    """
+    budget = _memory_budget(memory_limit, [convert_mode], max_size)
+    manifest = _open_manifest(manifest_path, ["image", os.path.abspath(output_dir), out_format, save_kwargs, convert_mode, max_size]
+                                             + ([tune] if tune else []) + ([frames] if frames != "auto" else [])
+                                             + ([list(pixel_ops)] if pixel_ops else []))
+    try:
+        with _observed(trace_path, profile_path, f"image:{out_format}") as trace:
+            batch = run_batch(convert_image, input_paths, progress, workers, manifest, control, trace,
+                              output_dir=output_dir, out_format=out_format, save_kwargs=save_kwargs,
+                              convert_mode=convert_mode, cache=cache, max_size=max_size, budget=budget,
+                              low_memory=bool(memory_limit), tune=tune, tune_cache=tune_cache, frames=frames,
+                              frame_workers=max(1, default_workers() // max(1, workers)), pixel_ops=pixel_ops)
+    finally:
+        if manifest:
+            manifest.close()
+    if cache:
+        cache.trim()
+    return batch
+
+def convert_images_multi(input_paths, output_dir, targets, progress=None, workers=1, manifest_path=None, max_size=None,
+                         control=None, trace_path=None, profile_path=None, memory_limit=None):
+    """Converts multiple images to several IMAGE_TARGETS at once, decoding each source only once.
+
+    `memory_limit` bounds the estimated memory of the files converted at once, as in convert_images.
+    """
+    targets = list(targets)
+    budget = _memory_budget(memory_limit, [IMAGE_TARGETS[name]['convert_mode'] for name in targets], max_size)
+    manifest = _open_manifest(manifest_path, ["image-multi", os.path.abspath(output_dir), targets, max_size])
+    try:
+        with _observed(trace_path, profile_path, f"image-multi:{','.join(targets)}") as trace:
+            return run_batch(convert_image_multi, input_paths, progress, workers, manifest, control, trace,
+                             output_dir=output_dir, targets=targets, max_size=max_size, budget=budget)
+    finally:
+        if manifest:
+            manifest.close()
+
+def convert_documents(input_paths, output_dir, out_ext, progress=None, pages_per_chunk=None, workers=1, page_progress=None,
+                      cache=None, manifest_path=None, control=None, trace_path=None, profile_path=None,
+                      office_backend="auto"):
+    """Converts multiple PDF or Word documents.
+
+    `pages_per_chunk` and `workers` parallelise the pages inside each PDF;
+    `page_progress(path, done_pages, total_pages)` reports that progress.
+    Word documents are converted by `office_backend`, a backend name from
+    converter_core.office.BACKENDS (opened with `workers` office processes
+    and closed after the batch) or an already open backend, which is left
+    open so its workers stay warm between batches. `cache`,
+    `manifest_path`, `control`, `trace_path` and `profile_path` work as in
+    convert_images.
+    """
+    def file_page_progress(path):
+        if page_progress:
+            return lambda done, total: page_progress(path, done, total)
+        return None
+
+    def convert_one(path, **kwargs):
+        return convert_document(path, pages_per_chunk=pages_per_chunk, workers=workers,
+                                page_progress=file_page_progress(path), **kwargs)
+
+    backend = None
+    if out_ext == ".pdf":
+        backend = office_backend
+        if not hasattr(backend, "convert"):
+            from .office import open_backend
+            try:
+                backend = open_backend(office_backend or "auto", workers)
+            except MissingDependencyError as e:
+                return BatchResult(total=len(input_paths), aborted=str(e))
+
+    manifest = _open_manifest(manifest_path, ["document", os.path.abspath(output_dir), out_ext, pages_per_chunk,
+                                              getattr(backend, 'name', None)])
+    try:
+        with _observed(trace_path, profile_path, f"document:{out_ext}") as trace:
+            if backend is not None:
+                # Office backends do the work in their own processes, so threads are enough to keep them all busy.
+                batch = run_batch(convert_one, input_paths, progress, backend.size, manifest, control, trace, threads=True,
+                                  output_dir=output_dir, out_ext=out_ext, cache=cache, office_backend=backend)
+            else:
+                batch = run_batch(convert_one, input_paths, progress, manifest=manifest, control=control, trace=trace,
+                                  output_dir=output_dir, out_ext=out_ext, cache=cache)
+    finally:
+        if manifest:
+            manifest.close()
+        if backend is not None and backend is not office_backend:
+            backend.close()
+    if cache:
+        cache.trim()
+    return batch
+
+def convert_html_files(input_paths, output_dir, out_ext=".png", progress=None, control=None, trace_path=None,
+                       profile_path=None, renderer="auto", workers=1, render_options=None):
+    """Converts multiple HTML files to PNG images, `workers` pages at a time.
+
+    `renderer` is a name from converter_core.render.RENDERERS (opened for
+    this batch with `render_options`, a RenderOptions) or an open renderer,
+    which is left open for later batches. A missing renderer aborts the
+    batch before the first page.
+    """
+    owned = not hasattr(renderer, "render")
+    if owned:
+        from .render import open_renderer
+        try:
+            renderer = open_renderer(renderer or "auto", workers, render_options)
+        except MissingDependencyError as e:
+            return BatchResult(total=len(input_paths), aborted=str(e))
+    try:
+        with _observed(trace_path, profile_path, f"html:{out_ext}") as trace:
+            return run_batch(convert_html, input_paths, progress, renderer.size, control=control, trace=trace,
+                             threads=True, output_dir=output_dir, out_ext=out_ext, renderer=renderer)
+    finally:
+        if owned:
+            renderer.close()
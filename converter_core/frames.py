@@ -0,0 +1,125 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .engine import _require
+
+# Multi-frame and animated images.
+# GIF, WEBP and APNG frames are stored as changes to the frames before them,
+# so they are decoded in order, one at a time; the per-frame work after
+# that (resize, mode conversion, GIF palette quantization, encoding) runs on
+# a thread pool, as Pillow releases the GIL for it. Pages of TIFF and MPO
+# files do not depend on each other and are also decoded in parallel, each
+# thread reading the file through its own handle. When frames are split
+# into numbered files, at most a few frames per worker are in flight, so
+# memory does not grow with the length of the animation. Animated outputs
+# are assembled by Pillow's encoders, which need every frame at once.
+
+FRAME_MODES = ("auto", "split", "first")
+ANIMATED_FORMATS = {"GIF", "WEBP", "PNG"}
+INDEPENDENT_FORMATS = {"TIFF", "MPO"}  # pages decode without the pages before them
+DEFAULT_DURATION = 100  # ms per frame when the source has none
+IN_FLIGHT_PER_WORKER = 2
+
+
+def default_workers():
+    return min(4, os.cpu_count() or 1)
+
+def animates(save_kwargs):
+    """Whether the output format can hold an animation."""
+    return save_kwargs.get('format', "").upper() in ANIMATED_FORMATS
+
+def frame_count(source):
+    """Number of frames or pages in the image at `source`; 1 for still images."""
+    Image = _require("PIL.Image", "Pillow")
+    with Image.open(source) as img:
+        return getattr(img, "n_frames", 1)
+
+def frame_output_paths(path, output_dir, out_ext, count):
+    """Numbered output paths, one per frame: name_0001.ext, name_0002.ext, ..."""
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    ext = out_ext.lstrip(".").lower()
+    width = max(4, len(str(count)))
+    return [os.path.join(output_dir, f"{base_name}_{i:0{width}d}.{ext}") for i in range(1, count + 1)]
+
+
+def _prepare_frame(frame, save_kwargs, convert_mode=None, max_size=None, pixel_ops=None):
+    """Resizes and converts one decoded frame; returns (image, save options)."""
+    from . import imaging, pixelops
+    frame, options = imaging.prepare(frame, save_kwargs, max_size)
+    frame = pixelops.convert(frame, convert_mode, pixel_ops)
+    if options.get('format', "").upper() == "GIF" and frame.mode == "RGB":
+        # The GIF encoder would quantize every frame itself, one after another.
+        frame = frame.quantize(256)
+    return frame, options
+
+def _decoded_frames(img):
+    """Yields (frame copy, duration ms) for every frame of an opened image, in order."""
+    for index in range(getattr(img, "n_frames", 1)):
+        img.seek(index)
+        img.load()
+        yield img.copy(), img.info.get('duration', DEFAULT_DURATION)
+
+def _page(source, index):
+    Image = _require("PIL.Image", "Pillow")
+    with Image.open(source) as img:
+        img.seek(index)
+        img.load()
+        return img.copy()
+
+
+def save_animation(img, target, save_kwargs, convert_mode=None, max_size=None, workers=None, pixel_ops=None):
+    """Encodes every frame of the opened image `img` into one animated GIF, WEBP or PNG (APNG).
+
+    Frame durations and the loop count are carried over; `target` is a path
+    or a binary file.
+    """
+    loop = img.info.get('loop', 0)
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        futures, durations = [], []
+        for frame, duration in _decoded_frames(img):
+            futures.append(pool.submit(_prepare_frame, frame, save_kwargs, convert_mode, max_size, pixel_ops))
+            durations.append(duration)
+        frames = [future.result()[0] for future in futures]
+    options = futures[0].result()[1]
+    if options.get('format', "").upper() == "PNG" and len({frame.mode for frame in frames}) > 1:
+        # APNG frames are all stored in the first frame's mode; a palette there would dither the rest.
+        has_alpha = any(frame.mode in ("RGBA", "LA", "PA") or "transparency" in frame.info for frame in frames)
+        frames = [frame.convert("RGBA" if has_alpha else "RGB") for frame in frames]
+    first, rest = frames[0], frames[1:]
+    first.save(target, save_all=True, append_images=rest, duration=durations, loop=loop,
+               **{k: v for k, v in options.items() if k != 'append_images'})
+    for frame in frames:
+        frame.close()
+
+def split_frames(path, output_paths, save_kwargs, convert_mode=None, max_size=None, workers=None, pixel_ops=None):
+    """Writes frame i of the image at `path` to output_paths[i], encoding frames in parallel.
+
+    Animation frames are decoded in order and handed to the pool as they
+    come, with at most IN_FLIGHT_PER_WORKER frames per worker waiting, so
+    only a few decoded frames are held at a time. Independent pages (TIFF,
+    MPO) are also decoded in parallel.
+    """
+    Image = _require("PIL.Image", "Pillow")
+    workers = workers or default_workers()
+
+    def write(frame, output_path):
+        with frame:
+            prepared, options = _prepare_frame(frame, save_kwargs, convert_mode, max_size, pixel_ops)
+            with prepared:
+                prepared.save(output_path, **options)
+
+    with Image.open(path) as img, ThreadPoolExecutor(max_workers=workers) as pool:
+        if img.format in INDEPENDENT_FORMATS:
+            futures = [pool.submit(lambda i: write(_page(path, i), output_paths[i]), i) for i in range(len(output_paths))]
+        else:
+            slots = threading.BoundedSemaphore(workers * IN_FLIGHT_PER_WORKER)
+            futures = []
+            for (frame, _), output_path in zip(_decoded_frames(img), output_paths):
+                slots.acquire()
+                future = pool.submit(write, frame, output_path)
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+        for future in futures:
+            future.result() # re-raises the first failed frame
+    return output_paths
@@ -0,0 +1,142 @@
+import math
+
+# Size-aware decoding and resizing.
+# When the output is much smaller than the source, most of the decode work
+# is thrown away. JPEG sources are opened in draft mode, which makes libjpeg
+# decode at 1/2, 1/4 or 1/8 scale and shrinks decode time and memory by the
+# square of that factor. Everything else is shrunk with Pillow's
+# reducing_gap resize, which does a cheap integer Image.reduce before the
+# final Lanczos pass.
+
+ICO_MAX_SIZE = 256
+DEFAULT_ICO_SIZES = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+REDUCING_GAP = 2.0
+ALPHA_MODES = {"RGBA", "LA", "PA", "RGBa", "La"}
+FLATTEN_BACKGROUND = (255, 255, 255)
+
+
+def _scaled(size, longest_side):
+    width, height = size
+    scale = longest_side / max(width, height)
+    return (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+
+def fit_size(size, max_size):
+    """Size of an image scaled down to fit in a max_size x max_size box (never scaled up)."""
+    if max(size) <= max_size:
+        return tuple(size)
+    return _scaled(size, max_size)
+
+def cover_size(size, min_side):
+    """Size of an image scaled down so its shorter side is still at least `min_side`."""
+    width, height = size
+    if min(width, height) <= min_side:
+        return tuple(size)
+    scale = min_side / min(width, height)
+    return (max(min_side, math.ceil(width * scale)), max(min_side, math.ceil(height * scale)))
+
+def request_draft(img, size):
+    """Asks a not yet loaded JPEG to decode at the smallest scale that is still >= `size`."""
+    if img.format == "JPEG" and img.tile:
+        img.draft(None, size)
+
+def shrink(img, size):
+    """Resizes `img` down to `size` using an integer reduce first; returns `img` if already that small."""
+    from PIL import Image
+
+    if img.size[0] <= size[0] and img.size[1] <= size[1]:
+        return img
+    if img.mode in ("1", "P"):
+        # Palette images can only be resized with NEAREST; resample in a full colour mode instead.
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def limit_size(img, max_size):
+    """Fits an opened image inside max_size x max_size, decoding JPEGs at reduced scale."""
+    target = fit_size(img.size, max_size)
+    request_draft(img, target)
+    return shrink(img, fit_size(img.size, max_size))
+
+def has_alpha(img):
+    return img.mode in ALPHA_MODES or "transparency" in img.info
+
+def to_mode(img, mode, background=FLATTEN_BACKGROUND):
+    """img.convert(mode), except that transparent pixels are composited onto `background` when `mode` has no alpha.
+
+    Pillow's convert only drops the alpha channel, so transparent areas
+    come out in whatever colour they happen to store, usually black.
+    Returns `img` itself when it is already in `mode`.
+    """
+    from PIL import Image
+
+    if img.mode == mode:
+        return img
+    if mode in ALPHA_MODES or not has_alpha(img):
+        return img.convert(mode)
+    rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+    flat = Image.new("RGB", img.size, background)
+    flat.paste(rgba, mask=rgba)
+    if rgba is not img:
+        rgba.close()
+    if mode == "RGB":
+        return flat
+    converted = flat.convert(mode)
+    flat.close()
+    return converted
+
+def ico_sizes(save_kwargs):
+    """The ICO sizes to write, largest first (Pillow's defaults when none are given)."""
+    return sorted({tuple(s) for s in save_kwargs.get('sizes') or DEFAULT_ICO_SIZES}, reverse=True)
+
+def prepare_ico(img, save_kwargs):
+    """Builds the ICO frames as a cascade from the largest size down.
+
+    The source is first reduced so its shorter side just covers the largest
+    icon size; for square sources every smaller size is then resized from
+    the previous one and handed to Pillow through `append_images`, instead
+    of Pillow thumbnailing the full-size image once per size. Returns the
+    image to save and the updated save options.
+    """
+    sizes = ico_sizes(save_kwargs)
+    largest = min(max(max(s) for s in sizes), ICO_MAX_SIZE)
+    target = cover_size(img.size, largest)
+    request_draft(img, target)
+    img = shrink(img, cover_size(img.size, largest))
+    # Pillow thumbnails any size it was not handed from the last provided
+    # frame, so only cascade when every frame can be provided.
+    if img.size[0] != img.size[1] or any(w != h for w, h in sizes):
+        return img, save_kwargs
+
+    frames = []
+    previous = img
+    for size in sizes:
+        if size[0] > img.size[0]:
+            continue
+        previous = shrink(previous, size)
+        frames.append(previous)
+    return img, {**save_kwargs, 'append_images': frames}
+
+def draft_for(img, save_kwargs, max_size=None):
+    """Requests the JPEG draft scale that still satisfies every size step `prepare` will apply.
+
+    Lets callers decode (img.load) separately from resizing without losing
+    draft mode.
+    """
+    needs = []
+    if max_size:
+        needs.append(fit_size(img.size, max_size))
+    if save_kwargs.get('format') == "ICO":
+        largest = min(max(max(s) for s in ico_sizes(save_kwargs)), ICO_MAX_SIZE)
+        needs.append(cover_size(img.size, largest))
+    if needs:
+        request_draft(img, (max(w for w, _ in needs), max(h for _, h in needs)))
+
+def prepare(img, save_kwargs, max_size=None):
+    """Applies the size-aware steps for one output; returns (image, save options).
+
+    Must be called before the image is loaded so JPEG draft mode can apply.
+    """
+    if max_size:
+        img = limit_size(img, max_size)
+    if save_kwargs.get('format') == "ICO":
+        img, save_kwargs = prepare_ico(img, save_kwargs)
+    return img, save_kwargs
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+# Persistent job manifest for resumable batches.
+# Every converted input is appended to a JSON-lines file as soon as its
+# result is known, with the input's size and mtime, a hash of the
+# conversion parameters and the stat of every output it produced. Rerunning
+# the same job skips inputs whose entry still matches, like make, so a
+# crashed or cancelled batch resumes where it stopped. Later lines win
+# when the file is read back, and the file is compacted on close.
+# Several jobs may share one manifest (the GUI and the CLI default to the
+# same one per output folder): appends and the compaction hold a lock on
+# a sidecar .lock file, and compaction merges the lines other jobs wrote.
+
+MANIFEST_NAME = ".converter-manifest.jsonl"
+
+
+def params_key(params):
+    """Short, stable hash of a job's conversion parameters."""
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+@contextmanager
+def _locked(path):
+    """Holds an exclusive lock on `path`.lock, shared with other processes using the same manifest."""
+    with open(path + ".lock", "a+b") as lock:
+        if sys.platform == "win32":
+            import msvcrt
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _output_paths(result):
+    if result.frames:
+        return [os.path.abspath(path) for path in result.frames]
+    if result.targets:
+        return [os.path.abspath(t['output_path']) for t in result.targets.values()]
+    return [os.path.abspath(result.output_path)] if result.output_path else []
+
+
+class JobManifest:
+    """Records per-input status for one job's parameters in a manifest file.
+
+    Several jobs (e.g. JPG and WEBP targets) can share a manifest file;
+    entries are keyed on the input path and the parameter hash.
+    """
+
+    def __init__(self, path, params):
+        self.path = path
+        self.params_key = params_key(params)
+        self._written = False
+        self.entries = self._read()
+
+    def _key(self, input_path):
+        return f"{os.path.abspath(input_path)}|{self.params_key}"
+
+    def _read(self):
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError: # a line cut short by a crash
+                    continue
+                entries[entry['key']] = entry
+        return entries
+
+    def is_up_to_date(self, input_path):
+        """True if `input_path` was converted with these parameters and neither it nor its outputs changed since."""
+        entry = self.entries.get(self._key(input_path))
+        if not entry or entry['status'] != "done":
+            return False
+        return (entry['input_stat'] == _stat(input_path)
+                and bool(entry.get('outputs'))
+                and all(_stat(path) == stat for path, stat in entry['outputs'].items()))
+
+    def entry(self, input_path):
+        return self.entries.get(self._key(input_path))
+
+    def record(self, result):
+        """Appends the outcome of one conversion and flushes it to disk."""
+        entry = {
+            'key': self._key(result.input_path),
+            'input_path': os.path.abspath(result.input_path),
+            'params': self.params_key,
+            'input_stat': _stat(result.input_path),
+            'output_path': result.output_path and os.path.abspath(result.output_path),
+            'outputs': {path: _stat(path) for path in _output_paths(result)} if result.ok else {},
+            'status': "done" if result.ok else "failed",
+            'error': result.error,
+        }
+        self.entries[entry['key']] = entry
+        if not self._written:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._written = True
+        # Opened per line so a compaction by another job never leaves this one appending to a replaced file.
+        with _locked(self.path), open(self.path, "a+b") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n": # a line cut short by a crash; do not glue this entry onto it
+                    f.write(b"\n")
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+
+    def close(self):
+        """Rewrites the manifest with one line per entry, keeping the entries other jobs added meanwhile."""
+        if not self._written:
+            return
+        self._written = False
+        with _locked(self.path):
+            entries = self._read()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
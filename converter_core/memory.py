@@ -0,0 +1,165 @@
+import threading
+
+from .engine import _require
+
+# Memory-bounded image conversion.
+# Image headers give the pixel size and mode before anything is decoded, so
+# the memory a conversion will need can be estimated up front. A
+# MemoryBudget uses those estimates to decide how many files may be in
+# flight at once: small files fill every worker while a huge scan runs on
+# its own. For uncompressed formats (BMP, PPM/PGM, raw TIFF) the pixels of
+# any row band sit at a known offset in the file, so a mode change is done
+# band by band into the output image and the full-size source bitmap is
+# never held in memory.
+
+BAND_BYTES = 64 * 1024 ** 2  # decoded source rows read per band
+STRIP_THRESHOLD = 256 * 1024 ** 2  # decoded size above which band conversion is used
+
+# Bytes per pixel of uncompressed raw modes, for rows written without an explicit stride.
+RAW_PIXEL_BYTES = {
+    "L": 1, "P": 1, "LA": 2, "RGB": 3, "BGR": 3, "RGBA": 4, "RGBX": 4, "BGRA": 4, "BGRX": 4, "CMYK": 4,
+    "I;16": 2, "I;16B": 2, "I;16L": 2, "I;32": 4, "F;32F": 4,
+}
+
+
+def pixel_bytes(mode):
+    """Bytes Pillow uses per pixel in memory for `mode` (RGB and LA are stored as four bytes)."""
+    if mode in ("1", "L", "P"):
+        return 1
+    if mode.startswith("I;16"):
+        return 2
+    return 4
+
+def decoded_bytes(size, mode):
+    return size[0] * size[1] * pixel_bytes(mode)
+
+def estimate_peak(path, convert_modes=(), max_size=None):
+    """Estimated peak memory, in bytes, of converting the image at `path`; read from its header only.
+
+    `convert_modes` are the modes the outputs are converted to; each one
+    that differs from the source mode costs a converted copy. Returns 0 for
+    files Pillow cannot identify; their conversion fails quickly anyway.
+    """
+    from . import imaging
+    Image = _require("PIL.Image", "Pillow")
+    try:
+        with Image.open(path) as img:
+            size, mode = img.size, img.mode
+            banded = band_plan(img) is not None
+    except Exception:
+        return 0
+    source = decoded_bytes(size, mode)
+    out_size = imaging.fit_size(size, max_size) if max_size else size
+    out_modes = {m for m in convert_modes if m and m != mode}
+    if banded and not max_size and len(out_modes) == 1 and source > STRIP_THRESHOLD:
+        return decoded_bytes(out_size, out_modes.pop()) + min(source, BAND_BYTES)
+    peak = source
+    if max_size:
+        peak += decoded_bytes(out_size, mode)
+    return peak + sum(decoded_bytes(out_size, m) for m in out_modes)
+
+
+def _raw_layout(tile, width):
+    """(rawmode, row stride, orientation) of a raw tile, or None when its rows cannot be located."""
+    args = tile[3]
+    rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+    if not stride:
+        if rawmode not in RAW_PIXEL_BYTES:
+            return None
+        stride = width * RAW_PIXEL_BYTES[rawmode]
+    return rawmode, stride, orientation or 1
+
+def band_plan(img, band_bytes=BAND_BYTES):
+    """Row bands [(top, bottom, offset, raw_args)] that can each be read and decoded on their own, or None.
+
+    Only not yet loaded images whose pixels are one uncompressed full-frame
+    raw tile qualify; `offset` is where the band's rows start in the file
+    and `raw_args` are the raw decoder's (rawmode, stride, orientation).
+    """
+    if not img.tile or len(img.tile) != 1 or getattr(img, "n_frames", 1) != 1:
+        return None
+    tile = img.tile[0]
+    width, height = img.size
+    if tile[0] != "raw" or tuple(tile[1]) != (0, 0, width, height):
+        return None
+    layout = _raw_layout(tile, width)
+    if layout is None:
+        return None
+    stride, orientation = layout[1], layout[2]
+    rows = max(1, band_bytes // max(1, width * pixel_bytes(img.mode)))
+    bands = []
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        # Bottom-up files (BMP) store the last row first.
+        first_row = top if orientation > 0 else height - bottom
+        bands.append((top, bottom, tile[2] + first_row * stride, layout))
+    return bands
+
+def _read_band(file, mode, width, top, bottom, offset, raw_args, palette, info):
+    """Decodes one band's rows with Image.frombytes; `palette` is the source's (rawmode, data) for P images."""
+    Image = _require("PIL.Image", "Pillow")
+    rows = bottom - top
+    file.seek(offset)
+    band = Image.frombytes(mode, (width, rows), file.read(raw_args[1] * rows), "raw", *raw_args)
+    if palette:
+        band.putpalette(palette[1], palette[0])
+    if "transparency" in info:
+        band.info['transparency'] = info['transparency']
+    return band
+
+def convert_in_bands(path, mode, threshold=STRIP_THRESHOLD, band_bytes=BAND_BYTES):
+    """Converts an uncompressed image to `mode` one row band at a time.
+
+    Peak memory is the converted image plus one decoded band, instead of
+    the full source plus the converted copy. Returns None, without decoding
+    anything, when the image is already in `mode`, decodes to no more than
+    `threshold` bytes or is not stored in a way that allows it.
+    """
+    from . import imaging
+    Image = _require("PIL.Image", "Pillow")
+    with Image.open(path) as src:
+        if src.mode == mode or decoded_bytes(src.size, src.mode) <= threshold:
+            return None
+        plan = band_plan(src, band_bytes)
+        size, src_mode, info = src.size, src.mode, dict(src.info)
+        # The header's palette, read without decoding the pixels (getpalette would load them all).
+        palette = src.palette.getdata() if src_mode == "P" and src.palette else None
+    if plan is None:
+        return None
+    out = Image.new(mode, size)
+    with open(path, "rb") as file:
+        for top, bottom, offset, raw_args in plan:
+            with _read_band(file, src_mode, size[0], top, bottom, offset, raw_args, palette, info) as band:
+                out.paste(imaging.to_mode(band, mode), (0, top))
+    return out
+
+
+class MemoryBudget:
+    """Admits files while the sum of their estimated peak memory stays within `limit` bytes.
+
+    `estimate(path)` gives a file's cost. A file larger than the whole
+    budget is admitted only when nothing else is running, so it runs on its
+    own instead of never. Thread-safe.
+    """
+
+    def __init__(self, limit, estimate):
+        self.limit = limit
+        self.estimate = estimate
+        self.in_use = 0
+        self._costs = {}
+        self._lock = threading.Lock()
+
+    def admit(self, path, idle=False):
+        """Reserves `path`'s cost and returns True if it fits (or `idle` is true); otherwise False."""
+        cost = self._costs.get(path)
+        if cost is None:
+            cost = self._costs[path] = self.estimate(path)
+        with self._lock:
+            if self.in_use + cost > self.limit and not (idle and self.in_use == 0):
+                return False
+            self.in_use += cost
+            return True
+
+    def release(self, path):
+        with self._lock:
+            self.in_use = max(0, self.in_use - self._costs.pop(path, 0))
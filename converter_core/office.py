@@ -0,0 +1,292 @@
+import importlib.util
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .engine import MissingDependencyError, _require
+
+# Pluggable Word to PDF backends.
+# The docx2pdf backend drives Microsoft Word over COM and starts Word for
+# every file, so it only runs on Windows or macOS with Word installed. The
+# LibreOffice backend keeps a pool of headless soffice processes running,
+# each with its own user profile and listening on its own pipe, and sends
+# every conversion to an idle one over UNO. Startup is paid once per worker
+# instead of once per file, the workers convert in parallel, and a worker is
+# restarted after `max_jobs` conversions or when a conversion hangs.
+
+BACKENDS = ("auto", "libreoffice", "docx2pdf")
+DEFAULT_MAX_JOBS = 200
+DEFAULT_TIMEOUT = 120
+STARTUP_TIMEOUT = 60
+SOFFICE_NAMES = ("soffice", "libreoffice")
+ONE_SHOT_NOTICE = ("The 'uno' module is not importable, so LibreOffice starts once per document instead of staying "
+                   "warm. Install python3-uno (or run with LibreOffice's bundled Python) for the faster pool.")
+
+
+class ConversionTimeout(RuntimeError):
+    """Raised when a document takes longer than the backend's timeout to convert."""
+
+
+def find_soffice():
+    """Path of the LibreOffice executable, or None."""
+    for name in SOFFICE_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    if sys.platform == "win32":
+        for root in (os.environ.get("PROGRAMFILES"), os.environ.get("PROGRAMFILES(X86)")):
+            path = root and os.path.join(root, "LibreOffice", "program", "soffice.exe")
+            if path and os.path.exists(path):
+                return path
+    return None
+
+def _importable(module_name):
+    return importlib.util.find_spec(module_name) is not None
+
+
+class Docx2PdfBackend:
+    """Converts through Microsoft Word with docx2pdf, one file at a time."""
+
+    name = "docx2pdf"
+    notice = None
+    size = 1
+
+    def convert(self, path, output_path):
+        docx2pdf = _require("docx2pdf", "docx2pdf")
+        if sys.platform != "win32":
+            docx2pdf.convert(path, output_path)
+            return
+        pythoncom = _require("pythoncom", "pypiwin32")
+        pythoncom.CoInitialize()
+        try:
+            docx2pdf.convert(path, output_path)
+        finally:
+            pythoncom.CoUninitialize()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _OfficeWorker:
+    """One headless soffice process with a private profile, reached over a named UNO pipe."""
+
+    def __init__(self, soffice, index, timeout):
+        self.soffice = soffice
+        self.index = index
+        self.timeout = timeout
+        self.jobs = 0
+        self.process = None
+        self._desktop = None
+        self._profile_dir = tempfile.mkdtemp(prefix=f"converter-office-{index}-")
+        self._pipe = f"converter-{os.getpid()}-{index}-{id(self):x}"
+
+    def start(self):
+        profile_url = "file:///" + self._profile_dir.replace(os.sep, "/").lstrip("/")
+        self.process = subprocess.Popen(
+            [self.soffice, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+             f"-env:UserInstallation={profile_url}", f"--accept=pipe,name={self._pipe};urp;StarOffice.ComponentContext"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.jobs = 0
+        self._desktop = self._connect()
+
+    def _connect(self):
+        import uno
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:pipe,name={self._pipe};urp;StarOffice.ComponentContext")
+                return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+            except Exception:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"soffice exited during startup (code {self.process.returncode})")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionTimeout(f"soffice did not start within {STARTUP_TIMEOUT}s")
+                time.sleep(0.25)
+
+    def convert(self, path, output_path):
+        """Converts in a helper thread so a hung soffice can be killed after `timeout` seconds."""
+        outcome = {}
+
+        def run():
+            try:
+                self._convert(path, output_path)
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=run, name=f"office-worker-{self.index}", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        self.jobs += 1
+        if thread.is_alive():
+            self.stop() # breaks the UNO bridge, which releases the stuck call
+            raise ConversionTimeout(f"Conversion took longer than {self.timeout}s; the office worker was restarted.")
+        if 'error' in outcome:
+            raise outcome['error']
+
+    def _convert(self, path, output_path):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def props(**values):
+            items = []
+            for key, value in values.items():
+                prop = PropertyValue()
+                prop.Name = key
+                prop.Value = value
+                items.append(prop)
+            return tuple(items)
+
+        doc = self._desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(path)), "_blank", 0,
+                                                 props(Hidden=True, ReadOnly=True))
+        if doc is None:
+            raise RuntimeError("LibreOffice could not open the document.")
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output_path)), props(FilterName="writer_pdf_Export"))
+        finally:
+            doc.close(True)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        self._desktop = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def remove(self):
+        self.stop()
+        shutil.rmtree(self._profile_dir, ignore_errors=True)
+
+
+class _OneShotWorker:
+    """Fallback when the uno module is not importable: one `soffice --convert-to` run per file.
+
+    Still pays LibreOffice's startup for every file, but keeps a private
+    profile per worker so several can run in parallel.
+    """
+
+    alive = True
+
+    def __init__(self, soffice, index, timeout):
+        self.soffice = soffice
+        self.index = index
+        self.timeout = timeout
+        self.jobs = 0
+        self._profile_dir = tempfile.mkdtemp(prefix=f"converter-office-{index}-")
+
+    def start(self):
+        self.jobs = 0
+
+    def convert(self, path, output_path):
+        profile_url = "file:///" + self._profile_dir.replace(os.sep, "/").lstrip("/")
+        with tempfile.TemporaryDirectory(prefix="converter-pdf-") as out_dir:
+            try:
+                subprocess.run([self.soffice, "--headless", "--norestore", "--nolockcheck",
+                                f"-env:UserInstallation={profile_url}", "--convert-to", "pdf", "--outdir", out_dir, path],
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               timeout=self.timeout, check=True)
+            except subprocess.TimeoutExpired:
+                raise ConversionTimeout(f"Conversion took longer than {self.timeout}s.")
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(e.stderr.decode(errors="replace").strip() or f"soffice exited with code {e.returncode}")
+            produced = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".pdf")
+            if not os.path.exists(produced):
+                raise RuntimeError("LibreOffice did not produce a PDF.")
+            shutil.move(produced, output_path)
+        self.jobs += 1
+
+    def stop(self):
+        pass
+
+    def remove(self):
+        shutil.rmtree(self._profile_dir, ignore_errors=True)
+
+
+class LibreOfficePool:
+    """A pool of `size` warm headless LibreOffice workers; `convert` is thread-safe.
+
+    Workers start on first use. A worker is restarted after `max_jobs`
+    conversions, after a conversion exceeds `timeout` seconds, and whenever
+    its process has died.
+    """
+
+    name = "libreoffice"
+
+    def __init__(self, size=1, max_jobs=DEFAULT_MAX_JOBS, timeout=DEFAULT_TIMEOUT, soffice=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise MissingDependencyError("LibreOffice (soffice) was not found. Please install it and make sure it is in your PATH.")
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        # uno ships with LibreOffice's own Python and is not always importable.
+        self.warm = _importable("uno")
+        self.notice = None if self.warm else ONE_SHOT_NOTICE  # shown by front ends, see open_backend
+        worker_class = _OfficeWorker if self.warm else _OneShotWorker
+        self._workers = [worker_class(self.soffice, i, timeout) for i in range(self.size)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._closed = False
+
+    def convert(self, path, output_path):
+        if self._closed:
+            raise RuntimeError("The office pool is closed.")
+        worker = self._idle.get()
+        try:
+            if not worker.alive or worker.jobs >= self.max_jobs:
+                worker.stop()
+                worker.start()
+            worker.convert(path, output_path)
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """Stops every worker process and removes their profiles."""
+        self._closed = True
+        for worker in self._workers:
+            worker.remove()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_backend(name="auto", workers=1, max_jobs=DEFAULT_MAX_JOBS, timeout=DEFAULT_TIMEOUT):
+    """Creates a Word to PDF backend; the caller closes it.
+
+    A backend's `notice` is a message for the user when it runs in a
+    degraded mode (LibreOffice without uno, see ONE_SHOT_NOTICE), else None.
+    "auto" prefers LibreOffice when it is installed, except on Windows where
+    docx2pdf (Microsoft Word) is used if it can be imported.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown office backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == "auto":
+        word_first = sys.platform == "win32" and _importable("docx2pdf")
+        if word_first or not find_soffice():
+            name = "docx2pdf"
+        else:
+            name = "libreoffice"
+    if name == "docx2pdf":
+        return Docx2PdfBackend()
+    return LibreOfficePool(size=workers, max_jobs=max_jobs, timeout=timeout)
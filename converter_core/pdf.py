@@ -0,0 +1,97 @@
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .engine import MissingDependencyError, _require
+
+# Page-parallel PDF to Word conversion.
+# A long PDF is split into page ranges that are converted to separate .docx
+# parts in worker processes (pdf2docx's start/end arguments), then the parts
+# are merged into one document. Each worker process handles a single range
+# and exits, so the parser's memory is returned after every chunk and peak
+# RSS depends on the chunk size rather than on the length of the document.
+
+PAGES_PER_CHUNK = 25
+
+
+def page_count(path):
+    """Returns the number of pages in a PDF without parsing its layout."""
+    fitz = _require("fitz", "PyMuPDF")
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+def page_ranges(total_pages, pages_per_chunk):
+    """Splits `total_pages` into [start, end) ranges of at most `pages_per_chunk` pages."""
+    return [(start, min(start + pages_per_chunk, total_pages)) for start in range(0, total_pages, pages_per_chunk)]
+
+def _convert_range(path, part_path, start, end):
+    pdf2docx = _require("pdf2docx", "pdf2docx")
+    cv = pdf2docx.Converter(path)
+    try:
+        cv.convert(part_path, start=start, end=end)
+    finally:
+        cv.close()
+    return end - start
+
+def merge_docx(part_paths, output_path):
+    """Appends the .docx parts, in order, into one document at `output_path`."""
+    docx = _require("docx", "python-docx")
+    composer_module = _require("docxcompose.composer", "docxcompose")
+    composer = composer_module.Composer(docx.Document(part_paths[0]))
+    for part_path in part_paths[1:]:
+        composer.append(docx.Document(part_path))
+    composer.save(output_path)
+
+def convert_pdf_chunked(path, output_path, pages_per_chunk=PAGES_PER_CHUNK, workers=1, page_progress=None):
+    """Converts one PDF to .docx in page ranges spread over `workers` processes.
+
+    `page_progress(done_pages, total_pages)` is called whenever a range
+    finishes. Documents that fit in one chunk are converted in a single
+    pass, exactly like the plain conversion, and so is every PDF when
+    PyMuPDF (which counts the pages) is not installed.
+    """
+    try:
+        total_pages = page_count(path)
+    except MissingDependencyError:
+        # pdf2docx normally brings PyMuPDF along, but it is not required for a single pass.
+        _convert_range(path, output_path, 0, None)
+        return
+    ranges = page_ranges(total_pages, pages_per_chunk)
+    if len(ranges) <= 1:
+        _convert_range(path, output_path, 0, None)
+        if page_progress:
+            page_progress(total_pages, total_pages)
+        return
+
+    try:
+        _require("docxcompose.composer", "docxcompose")
+    except MissingDependencyError:
+        # Without a merger, fall back to pdf2docx's own multi-process parse.
+        _convert_multiprocess(path, output_path, workers)
+        if page_progress:
+            page_progress(total_pages, total_pages)
+        return
+
+    pool_kwargs = {'max_workers': max(1, min(workers, len(ranges)))}
+    if sys.version_info >= (3, 11):
+        pool_kwargs['max_tasks_per_child'] = 1
+    with tempfile.TemporaryDirectory(prefix="pdf2docx-parts-") as parts_dir:
+        part_paths = [os.path.join(parts_dir, f"part{i:05d}.docx") for i in range(len(ranges))]
+        done_pages = 0
+        with ProcessPoolExecutor(**pool_kwargs) as pool:
+            futures = [pool.submit(_convert_range, path, part_path, start, end)
+                       for part_path, (start, end) in zip(part_paths, ranges)]
+            for future in as_completed(futures):
+                done_pages += future.result()
+                if page_progress:
+                    page_progress(done_pages, total_pages)
+        merge_docx(part_paths, output_path)
+
+def _convert_multiprocess(path, output_path, workers):
+    pdf2docx = _require("pdf2docx", "pdf2docx")
+    cv = pdf2docx.Converter(path)
+    try:
+        cv.convert(output_path, multi_processing=workers > 1, cpu_count=workers)
+    finally:
+        cv.close()
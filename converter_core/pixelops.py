@@ -0,0 +1,347 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .engine import _require
+
+# Per-pixel operations as one fused NumPy pass.
+# A pipeline is a sequence of small operations: grayscale with chosen
+# weights, flattening alpha onto a background colour, gamma, levels, invert
+# and channel mixing. Before it runs, the sequence is compiled: neighbouring
+# tone curves (gamma, levels, invert) are folded into a single 256-entry
+# lookup table and neighbouring linear steps (grayscale, channel mixes)
+# into a single matrix, so each run of them costs one operation per pixel
+# instead of one full-size image per step. The decoded pixels are copied
+# out of Pillow once; the pipeline then walks that array in cache-sized row
+# bands, which are views of it, and writes each band straight into the
+# output array, optionally on several threads. Tables at either end of the
+# pipeline go through Pillow's point, which looks up faster than np.take.
+# Tone curves work on 8-bit values between linear steps, like the chain of
+# Pillow calls they replace (see the pixel_ops scenarios in bench).
+
+REC601 = (0.299, 0.587, 0.114)  # what Pillow's convert("L") uses
+REC709 = (0.2126, 0.7152, 0.0722)
+GRAY_WEIGHTS = {"rec601": REC601, "rec709": REC709, "average": (1 / 3, 1 / 3, 1 / 3)}
+WHITE = (255, 255, 255)
+BAND_PIXELS = 1 << 14  # pixels per band; keeps a band's float buffers within the CPU's L2 cache
+
+
+@dataclass(frozen=True)
+class Grayscale:
+    """Weighted sum of R, G and B; a no-op on single-channel images."""
+    weights: tuple = REC601
+
+    def matrix(self, channels):
+        return [list(self.weights) + [0.0]] if channels == 3 else None
+
+
+@dataclass(frozen=True)
+class ChannelMix:
+    """Each output channel is a weighted sum of the input channels plus an optional offset.
+
+    `rows` holds one row per output channel (1 or 3 of them), each with one
+    weight per input channel and optionally a trailing offset.
+    """
+    rows: tuple
+
+    @classmethod
+    def swap(cls, order):
+        """Reorders RGB channels, e.g. swap("bgr")."""
+        return cls(tuple(tuple(1.0 if i == "rgb".index(c) else 0.0 for i in range(3)) for c in order.lower()))
+
+    def matrix(self, channels):
+        if len(self.rows) not in (1, 3) or any(len(row) not in (channels, channels + 1) for row in self.rows):
+            raise ValueError(f"A channel mix for {channels} channel(s) needs 1 or 3 rows of {channels} weights "
+                             "and an optional offset.")
+        return [list(row) + [0.0] * (channels + 1 - len(row)) for row in self.rows]
+
+
+@dataclass(frozen=True)
+class Flatten:
+    """Composites the image onto `background` and drops its alpha; a no-op on opaque images."""
+    background: tuple = WHITE
+
+
+@dataclass(frozen=True)
+class Gamma:
+    """Gamma correction; values above 1 brighten the mid-tones."""
+    gamma: float
+
+    def curve(self, np, x):
+        return 255.0 * np.power(x / 255.0, 1.0 / self.gamma)
+
+
+@dataclass(frozen=True)
+class Levels:
+    """Stretches [black, white] to the full 0-255 range, clipping what lies outside."""
+    black: int = 0
+    white: int = 255
+
+    def curve(self, np, x):
+        return (x - self.black) * (255.0 / max(1, self.white - self.black))
+
+
+@dataclass(frozen=True)
+class Invert:
+    """Negative of the colour channels."""
+
+    def curve(self, np, x):
+        return 255.0 - x
+
+
+def parse_ops(text):
+    """Parses a comma-separated pipeline such as "flatten=#fff,gray=rec709,gamma=2.2,levels=16:235".
+
+    Operations: gray[=rec601|rec709|average|R:G:B], flatten[=COLOUR],
+    gamma=G, levels=BLACK:WHITE, invert and swap=ORDER (e.g. swap=bgr).
+    """
+    ops = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, value = item.partition("=")
+        name = name.strip().lower()
+        if name in ("gray", "grey", "grayscale"):
+            weights = GRAY_WEIGHTS.get(value or "rec601") or tuple(float(w) for w in value.split(":"))
+            if len(weights) != 3:
+                raise ValueError(f"gray needs three weights: {item}")
+            ops.append(Grayscale(tuple(weights)))
+        elif name == "flatten":
+            from PIL import ImageColor
+            ops.append(Flatten(ImageColor.getrgb(value)[:3] if value else WHITE))
+        elif name == "gamma":
+            ops.append(Gamma(float(value)))
+        elif name == "levels":
+            black, white = (int(v) for v in value.split(":"))
+            ops.append(Levels(black, white))
+        elif name == "invert":
+            ops.append(Invert())
+        elif name == "swap":
+            ops.append(ChannelMix.swap(value))
+        else:
+            raise ValueError(f"Unknown pixel operation: {item}")
+    return tuple(ops)
+
+
+# --- Compiling ---
+def _background(background, channels):
+    rgb = tuple(background) if len(background) >= 3 else tuple(background[:1]) * 3
+    if channels == 3:
+        return list(rgb[:3])
+    return [sum(w * c for w, c in zip(REC601, rgb))]
+
+def _compile(np, ops, channels, alpha):
+    """Turns `ops` into stages; returns (stages, output channels, output keeps alpha).
+
+    A stage is ("lut", table) on 8-bit values or ("float", steps), where a
+    step is ("affine", matrix) or ("flatten", background). Neighbouring
+    curves share one table and neighbouring linear steps one matrix; a
+    flatten is moved after the matrix that follows it, so it runs on the
+    (usually fewer) output channels.
+    """
+    stages = []
+    source_alpha = alpha
+    for op in ops:
+        if isinstance(op, Flatten):
+            if not alpha:
+                continue
+            steps = _float_stage(stages)
+            steps.append(("flatten", np.array(_background(op.background, channels), np.float64)))
+            alpha = False
+        elif hasattr(op, "curve"):
+            if stages and stages[-1][0] == "lut":
+                stages[-1][1].append(op)
+            else:
+                stages.append(["lut", [op]])
+        else:
+            rows = op.matrix(channels)
+            if rows is None:
+                continue
+            matrix = np.array(rows, np.float64)
+            moved = None
+            if stages and stages[-1][0] == "lut" and _is_permutation(np, matrix):
+                # Tables apply the same curve to every channel, so a reorder can run before them and join
+                # the matrix there instead of starting another float stage.
+                moved = stages.pop()
+            steps = _float_stage(stages)
+            flatten = steps.pop() if steps and steps[-1][0] == "flatten" else None
+            if steps and steps[-1][0] == "affine":
+                # Two affine maps compose into one: M2 (M1 x + t1) + t2.
+                previous = steps[-1][1]
+                linear = matrix[:, :-1] @ previous[:, :-1]
+                offset = matrix[:, :-1] @ previous[:, -1] + matrix[:, -1]
+                steps[-1] = ("affine", np.column_stack([linear, offset]))
+            else:
+                steps.append(("affine", matrix))
+            if flatten:
+                # M (a c + (1 - a) bg) + t = a (M c + t) + (1 - a) (M bg + t)
+                steps.append(("flatten", matrix[:, :-1] @ flatten[1] + matrix[:, -1]))
+            channels = matrix.shape[0]
+            if moved:
+                stages.append(moved)
+    compiled = []
+    extra = 1 if source_alpha else 0
+    for kind, body in stages:
+        if kind == "lut":
+            x = np.arange(256, dtype=np.float64)
+            for op in body:
+                x = np.clip(op.curve(np, x), 0, 255)
+            compiled.append(("lut", np.rint(x).astype(np.uint8)))
+            continue
+        steps = []
+        for step, value in body:
+            if step == "affine" and extra:
+                # One more row and column carry the source's alpha column through unchanged.
+                linear = np.zeros((value.shape[0] + 1, value.shape[1]))
+                linear[:-1, :-1], linear[-1, -1] = value[:, :-1], 1.0
+                steps.append((step, (np.ascontiguousarray(linear.T, np.float32), value[:, -1].tolist())))
+            elif step == "affine":
+                steps.append((step, (np.ascontiguousarray(value[:, :-1].T, np.float32), value[:, -1].tolist())))
+            else:
+                steps.append((step, value.tolist()))
+        compiled.append(("float", steps))
+    return compiled, channels, alpha
+
+def _is_permutation(np, matrix):
+    linear = matrix[:, :-1]
+    return (linear.shape[0] == linear.shape[1] and not matrix[:, -1].any() and set(np.unique(linear)) <= {0.0, 1.0}
+            and (linear.sum(axis=0) == 1).all() and (linear.sum(axis=1) == 1).all())
+
+def _float_stage(stages):
+    if not stages or stages[-1][0] != "float":
+        stages.append(["float", []])
+    return stages[-1][1]
+
+
+# --- Running ---
+def _normalized(img):
+    """`img` in L, LA, RGB or RGBA, the modes the pipeline works on."""
+    from . import imaging
+    if imaging.has_alpha(img):
+        return img if img.mode in ("LA", "RGBA") else img.convert("LA" if img.mode in ("L", "La") else "RGBA")
+    if img.mode in ("L", "RGB"):
+        return img
+    return img.convert("L" if img.mode in ("1", "I", "I;16", "F") else "RGB")
+
+def _run_band(np, stages, band, out, channels):
+    """Runs the compiled stages over one band of pixels, writing the result into `out`.
+
+    Every step works on whole rows, the source's alpha column included:
+    NumPy handles a contiguous (pixels, 4) array many times faster than a
+    strided view of its first three columns. Alpha itself never changes, so
+    that column is restored after table lookups and dropped at the end when
+    the output has no alpha.
+    """
+    pixels = band.reshape(-1, band.shape[-1])
+    alpha = pixels[:, channels] if pixels.shape[1] > channels else None
+    data, count = pixels, channels  # uint8 (or float32 inside a float stage), colour channels
+    weight = None
+    index = 0
+    while index < len(stages):
+        kind, body = stages[index]
+        following = stages[index + 1] if index + 1 < len(stages) else None
+        index += 1
+        if kind == "lut":
+            # Followed by a float stage, look up floats directly instead of converting afterwards.
+            data = np.take(body.astype(np.float32) if following else body, data)
+            if alpha is not None:
+                data[:, count] = alpha
+            continue
+        data = data.astype(np.float32)
+        for step, value in body:
+            if step == "affine":
+                matrix, offsets = value
+                data = data @ matrix
+                for column, offset in enumerate(offsets):
+                    if offset:
+                        data[:, column] += offset
+                count = len(offsets)
+            else:
+                if weight is None:
+                    weight = alpha.astype(np.float32)
+                    weight *= 1 / 255
+                for column, background in enumerate(value):
+                    # background + alpha * (colour - background), in place
+                    channel = data[:, column]
+                    channel -= background
+                    channel *= weight
+                    channel += background
+        np.clip(data, 0, 255, out=data)
+        data += 0.5
+        if following:
+            # The next table is indexed with the rounded values; no 8-bit copy in between.
+            data = np.take(following[1], data.astype(np.intp))
+            if alpha is not None:
+                data[:, count] = alpha
+            index += 1
+        else:
+            data = data.astype(np.uint8)
+    target = out.reshape(-1, out.shape[-1])
+    if data.shape[1] == target.shape[1]:
+        target[...] = data
+    else:
+        for column in range(target.shape[1]):
+            target[:, column] = data[:, column]
+
+def _point(img, table):
+    """Applies a tone table to the colour bands of `img` with Pillow's C lookup; alpha is left alone."""
+    identity = list(range(256))
+    return img.point([v for band in img.getbands() for v in (identity if band == "A" else table.tolist())])
+
+def apply(img, ops, workers=1):
+    """Runs the pixel operations `ops` over `img`; returns an L, LA, RGB or RGBA image.
+
+    With `workers` > 1 the bands are processed by that many threads (NumPy
+    releases the GIL). The result is `img` itself when the operations
+    change nothing (e.g. only a flatten, on an opaque image).
+    """
+    np = _require("numpy", "numpy")
+    Image = _require("PIL.Image", "Pillow")
+    result = _normalized(img)
+    channels = 3 if result.mode in ("RGB", "RGBA") else 1
+    stages, out_channels, keeps_alpha = _compile(np, tuple(ops), channels, result.mode in ("LA", "RGBA"))
+    # A table lookup at either end needs no arithmetic around it, and Pillow's is faster than np.take.
+    leading = stages.pop(0)[1] if stages and stages[0][0] == "lut" else None
+    trailing = stages.pop()[1] if stages and stages[-1][0] == "lut" else None
+    if leading is not None:
+        result = _swap_owned(img, result, _point(result, leading))
+    if stages:
+        # Pillow has no buffer export, so this is the one copy; every band below is a view of it.
+        pixels = np.asarray(result)
+        if pixels.ndim == 2:
+            pixels = pixels[..., None]
+        height, width = pixels.shape[:2]
+        out = np.empty((height, width, out_channels + keeps_alpha), np.uint8)
+        rows = max(1, BAND_PIXELS // max(1, width))
+
+        def run(top):
+            _run_band(np, stages, pixels[top:top + rows], out[top:top + rows], channels)
+
+        if workers > 1 and height > rows:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(run, range(0, height, rows)))
+        else:
+            for top in range(0, height, rows):
+                run(top)
+        result = _swap_owned(img, result, Image.fromarray(out[..., 0] if out.shape[2] == 1 else out))
+    if trailing is not None:
+        result = _swap_owned(img, result, _point(result, trailing))
+    return result
+
+def _swap_owned(original, old, new):
+    """Returns `new`, closing `old` unless it is the caller's image."""
+    if old is not original:
+        old.close()
+    return new
+
+def convert(img, mode=None, ops=None, workers=1):
+    """Applies `ops` (if any), then brings the result to `mode` (if given) with alpha flattened onto white.
+
+    The pixel stage of the image pipeline; returns `img` itself when there
+    is nothing to do. Without `ops` only Pillow is used.
+    """
+    from . import imaging
+    result = apply(img, ops, workers) if ops else img
+    if mode and result.mode != mode:
+        converted = imaging.to_mode(result, mode)
+        if result is not img:
+            result.close()
+        result = converted
+    return result
@@ -0,0 +1,60 @@
+import os
+
+from . import engine
+
+# Planning of conversion jobs.
+# Maps target names ("jpg", "docx", ...) and a list of input files to the
+# engine batches that produce them. The CLI, the watch-folder daemon and
+# the distributed coordinator all plan their work through here.
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff", ".heic", ".heif"}
+HTML_EXTENSIONS = {".html", ".htm"}
+
+# Document targets: output extension and the input extensions they accept.
+DOCUMENT_TARGETS = {
+    "docx": {'out_ext': ".docx", 'inputs': {".pdf"}},
+    "pdf": {'out_ext': ".pdf", 'inputs': {".docx", ".doc"}},
+}
+
+
+def all_targets():
+    """Every target name, sorted."""
+    return sorted([*engine.IMAGE_TARGETS, *DOCUMENT_TARGETS])
+
+def output_extension(target):
+    """The extension (or image format name) engine.output_path_for is given for `target`."""
+    if target in DOCUMENT_TARGETS:
+        return DOCUMENT_TARGETS[target]['out_ext']
+    return engine.IMAGE_TARGETS[target]['out_format']
+
+def plan_batches(paths, targets):
+    """Groups inputs into engine batches for `targets`; returns (batches, skipped paths)."""
+    batches = []
+    skipped = []
+    if len(targets) > 1:
+        images = [p for p in paths if _ext(p) in IMAGE_EXTENSIONS]
+        skipped = [p for p in paths if _ext(p) not in IMAGE_EXTENSIONS]
+        if images:
+            batches.append((engine.convert_images_multi, images, {'targets': targets}))
+        return batches, skipped
+
+    target = targets[0]
+    if target in DOCUMENT_TARGETS:
+        spec = DOCUMENT_TARGETS[target]
+        docs = [p for p in paths if _ext(p) in spec['inputs']]
+        skipped = [p for p in paths if _ext(p) not in spec['inputs']]
+        if docs:
+            batches.append((engine.convert_documents, docs, {'out_ext': spec['out_ext']}))
+        return batches, skipped
+
+    images = [p for p in paths if _ext(p) in IMAGE_EXTENSIONS]
+    pages = [p for p in paths if _ext(p) in HTML_EXTENSIONS] if target == "png" else []
+    skipped = [p for p in paths if p not in images and p not in pages]
+    if images:
+        batches.append((engine.convert_images, images, dict(engine.IMAGE_TARGETS[target])))
+    if pages:
+        batches.append((engine.convert_html_files, pages, {'out_ext': ".png"}))
+    return batches, skipped
+
+def _ext(path):
+    return os.path.splitext(path)[1].lower()
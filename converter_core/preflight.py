@@ -0,0 +1,246 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+
+from . import engine
+
+# Pre-flight scan of a selection before any conversion starts.
+# Every file is checked concurrently by reading only what is cheap: the
+# first bytes (to sniff the real format whatever the extension says), the
+# last bytes (to catch truncated JPEG, PNG and PDF files), the image header
+# through a lazy Image.open without load(), and a PDF's page count. Invalid
+# files are reported instead of failing inside the batch, inputs whose
+# outputs would overwrite each other are caught, and the remaining work is
+# ordered largest-first so the big files do not end up running last on an
+# otherwise idle pool.
+
+SNIFF_BYTES = 64
+TAIL_BYTES = 1024
+DEFAULT_WORKERS = 8
+
+IMAGE_KINDS = {"jpeg", "png", "gif", "bmp", "webp", "tiff", "heic", "ico", "ppm"}
+KIND_EXTENSIONS = {
+    "jpeg": {".jpg", ".jpeg", ".jpe", ".jfif"}, "png": {".png"}, "gif": {".gif"}, "bmp": {".bmp", ".dib"},
+    "webp": {".webp"}, "tiff": {".tif", ".tiff"}, "heic": {".heic", ".heif"}, "ico": {".ico"},
+    "ppm": {".ppm", ".pgm", ".pbm", ".pnm"}, "pdf": {".pdf"}, "docx": {".docx"}, "doc": {".doc"},
+    "html": {".html", ".htm"},
+}
+HEIC_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+# End markers that must appear near the end of a complete file. A PNG
+# always ends with its IEND chunk; JPEG and PDF files may carry trailing
+# data after theirs, so a missing marker there is only a warning.
+END_MARKERS = {"png": (b"IEND", True), "jpeg": (b"\xff\xd9", False), "pdf": (b"%%EOF", False)}
+
+
+@dataclass
+class FileInfo:
+    """What the pre-flight scan learned about one input."""
+    path: str
+    kind: str = None
+    ok: bool = False
+    error: str = None
+    warning: str = None
+    size_bytes: int = 0
+    width: int = None
+    height: int = None
+    mode: str = None
+    pages: int = None
+    cost: int = 0  # relative amount of work: pixels, pages or bytes
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class PreflightReport:
+    """`files` are the inputs to convert, largest first; `rejected` were dropped, with the reason in `error`."""
+    files: list = field(default_factory=list)
+    rejected: list = field(default_factory=list)
+
+    @property
+    def paths(self):
+        return [info.path for info in self.files]
+
+    @property
+    def warnings(self):
+        return [info for info in self.files if info.warning]
+
+    def summary_text(self, max_lines=None):
+        details = [f"Skipped {os.path.basename(info.path)}: {info.error}" for info in self.rejected]
+        details += [f"Note {os.path.basename(info.path)}: {info.warning}" for info in self.warnings]
+        if max_lines and len(details) > max_lines:
+            details = details[:max_lines] + [f"... and {len(details) - max_lines} more."]
+        return "\n".join([f"{len(self.files)} file(s) ready, {len(self.rejected)} skipped.", *details])
+
+
+def sniff(head):
+    """Names the format of a file from its first bytes, or None."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if head[4:8] == b"ftyp" and head[8:12] in HEIC_BRANDS:
+        return "heic"
+    if head[:4] == b"\x00\x00\x01\x00":
+        return "ico"
+    if len(head) > 2 and head[0:1] == b"P" and head[1:2] in b"123456" and head[2:3].isspace():
+        return "ppm"
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        return "doc"
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<!doctype html", b"<html", b"<head", b"<body", b"<!--", b"<meta", b"<div", b"<table")):
+        return "html"
+    return None
+
+def _kind_for_extension(path):
+    ext = os.path.splitext(path)[1].lower()
+    return next((kind for kind, extensions in KIND_EXTENSIONS.items() if ext in extensions), None)
+
+def scan_file(path, kinds=None):
+    """Checks one file without decoding it; `kinds` are the formats the batch accepts."""
+    info = FileInfo(path)
+    try:
+        info.size_bytes = os.path.getsize(path)
+        if not info.size_bytes:
+            info.error = "The file is empty."
+            return info
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+            f.seek(max(0, info.size_bytes - TAIL_BYTES))
+            tail = f.read()
+    except OSError as e:
+        info.error = f"Cannot read the file ({e.strerror or e})."
+        return info
+
+    labelled = _kind_for_extension(path)
+    kind = sniff(head)
+    if kind == "zip":
+        kind = _zip_kind(path)
+    elif kind is None and labelled == "html":
+        kind = "html" # HTML has no signature; trust the extension
+    info.kind = kind
+    if kind is None:
+        info.error = "Unrecognised file format."
+        return info
+    if kinds and kind not in kinds:
+        info.error = f"This is a {kind.upper()} file, which this conversion does not accept."
+        return info
+    marker, required = END_MARKERS.get(kind, (None, False))
+    if marker and marker not in tail:
+        if required:
+            info.error = f"The {kind.upper()} file is truncated."
+            return info
+        info.warning = f"The {kind.upper()} file may be truncated."
+    if labelled and labelled != kind:
+        info.warning = f"Named as {labelled.upper()} but contains {kind.upper()}."
+
+    info.cost = info.size_bytes
+    try:
+        if kind in IMAGE_KINDS:
+            _read_image_header(info)
+        elif kind == "pdf":
+            _read_page_count(info)
+    except engine.MissingDependencyError:
+        pass # keep the file-size cost; the batch reports the missing library
+    except Exception as e:
+        info.error = f"Unreadable {kind.upper()} header ({e})."
+        return info
+    info.ok = True
+    return info
+
+def _zip_kind(path):
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return "docx" if "word/document.xml" in archive.namelist() else None
+    except zipfile.BadZipFile:
+        return None
+
+def _read_image_header(info):
+    Image = engine._require("PIL.Image", "Pillow")
+    with Image.open(info.path) as img: # header only; nothing is decoded
+        info.width, info.height = img.size
+        info.mode = img.mode
+    info.cost = info.width * info.height
+
+def _read_page_count(info):
+    from .pdf import page_count
+    info.pages = page_count(info.path)
+    info.cost = info.pages
+    if not info.pages:
+        raise ValueError("no pages")
+
+
+def scan(paths, kinds=None, outputs_for=None, workers=DEFAULT_WORKERS):
+    """Scans `paths` concurrently and returns a PreflightReport.
+
+    Invalid files are rejected. When `outputs_for(path)` (the output paths
+    an input will produce) is given, an input whose output another input
+    already claims is rejected too, so the first one is not silently
+    overwritten. The accepted files are ordered largest-first.
+    """
+    if kinds is None or "heic" in kinds:
+        engine.heic_supported() # registers the HEIC opener before headers are read
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        infos = list(pool.map(lambda path: scan_file(path, kinds), paths))
+
+    report = PreflightReport()
+    claimed = {}
+    for info in infos:
+        if info.ok and outputs_for:
+            outputs = [os.path.normcase(os.path.abspath(o)) for o in outputs_for(info.path)]
+            owner = next((claimed[o] for o in outputs if o in claimed), None)
+            if owner:
+                info.ok = False
+                info.error = f"Its output would overwrite the one from {owner}."
+            else:
+                claimed.update((o, info.path) for o in outputs)
+        (report.files if info.ok else report.rejected).append(info)
+    report.files.sort(key=lambda info: info.cost, reverse=True)
+    return report
+
+
+def batch_plan(batch_function, output_dir, kwargs):
+    """The input kinds a batch function accepts and its `outputs_for(path)`, for the given batch arguments."""
+    if batch_function is engine.convert_images:
+        out_format = kwargs['out_format']
+        if kwargs.get('frames') == "split":
+            return IMAGE_KINDS, lambda path: _split_outputs(path, output_dir, out_format)
+        return IMAGE_KINDS, lambda path: [engine.output_path_for(path, output_dir, out_format)]
+    if batch_function is engine.convert_images_multi:
+        targets = list(kwargs['targets'])
+        return IMAGE_KINDS, lambda path: list(engine.target_output_paths(path, output_dir, targets).values())
+    out_ext = kwargs.get('out_ext', ".png")
+    if batch_function is engine.convert_documents:
+        kinds = {"docx", "doc"} if out_ext == ".pdf" else {"pdf"}
+    elif batch_function is engine.convert_html_files:
+        kinds = {"html"}
+    else:
+        kinds = None
+    return kinds, lambda path: [engine.output_path_for(path, output_dir, out_ext)]
+
+def _split_outputs(path, output_dir, out_format):
+    """The numbered frame files of a multi-frame source in split mode (name_0001.png, ...), else its one output."""
+    from . import frames
+    count = frames.frame_count(path)
+    if count > 1:
+        return frames.frame_output_paths(path, output_dir, out_format, count)
+    return [engine.output_path_for(path, output_dir, out_format)]
+
+def check_batch(batch_function, input_paths, output_dir, kwargs, workers=DEFAULT_WORKERS):
+    """Runs `scan` with the kinds and output names of one planned batch."""
+    kinds, outputs_for = batch_plan(batch_function, output_dir, kwargs)
+    return scan(input_paths, kinds, outputs_for, workers)
@@ -0,0 +1,152 @@
+import importlib
+import importlib.util
+import sys
+from dataclasses import dataclass, field
+
+from .engine import IMAGE_TARGETS, default_workers
+from .pdf import PAGES_PER_CHUNK
+
+# Registry of the conversions the app offers.
+# Each conversion is declared once as a plugin: its input extensions, output
+# format, the batch function that runs it (named as "module:function" and
+# only imported when a job starts), its batch options and the capabilities
+# it needs. Capability checks only look for a module or an executable
+# without importing it, and each runs once per process, so listing the
+# conversions and building the UI from them imports no conversion library.
+# More conversions can be added with `register`.
+
+
+@dataclass
+class Conversion:
+    """One conversion offered by the app, e.g. PNG to JPG."""
+    name: str
+    title: str
+    icon: str
+    description: str
+    inputs: tuple  # accepted input extensions
+    file_label: str  # what the file dialog calls the inputs
+    batch: str  # "module:function" of the batch function, imported on first use
+    kind: str = "image"  # scheduler queue (see converter_core.scheduler)
+    options: dict = field(default_factory=dict)  # keyword arguments for the batch function
+    requires: tuple = ()  # capability names, see CAPABILITIES
+    worker_share: int = 1  # use 1/worker_share of the CPUs
+    max_workers: int = None
+    page_progress: bool = False  # the batch reports progress per page
+
+    def load(self):
+        """The batch function; imports its module on first use."""
+        module_name, _, function = self.batch.partition(":")
+        return getattr(importlib.import_module(module_name), function)
+
+    def filetypes(self):
+        """File dialog filter for the inputs."""
+        return [(self.file_label, " ".join(f"*{ext}" for ext in self.inputs))]
+
+    def worker_count(self):
+        count = max(1, default_workers() // self.worker_share)
+        return min(count, self.max_workers) if self.max_workers else count
+
+
+# --- Capabilities ---
+def _module_available(module_name):
+    return importlib.util.find_spec(module_name) is not None
+
+def _office_available():
+    from .office import find_soffice
+    return bool(find_soffice()) or (sys.platform == "win32" and _module_available("docx2pdf"))
+
+def _html_available():
+    from .render import find_wkhtmltoimage
+    return _module_available("playwright") or bool(find_wkhtmltoimage())
+
+# name: (check, message shown when it is missing)
+CAPABILITIES = {
+    'pillow': (lambda: _module_available("PIL"),
+               "The 'Pillow' library is required for image conversions.\n\nTo install, run: pip install Pillow"),
+    'heic': (lambda: _module_available("pillow_heif"),
+             "The 'pillow-heif' library is required for this feature.\n\nTo install, run: pip install pillow-heif"),
+    'pdf2docx': (lambda: _module_available("pdf2docx"),
+                 "The 'pdf2docx' library is required for this conversion.\n\nTo install, run: pip install pdf2docx"),
+    'office': (_office_available,
+               "Word to PDF needs LibreOffice (soffice on the PATH) or, on Windows, Microsoft Word with:\n\n"
+               "pip install docx2pdf pypiwin32"),
+    'html': (_html_available,
+             "Additional setup is required for HTML conversion. Install one of:\n\n"
+             "1. Playwright with its Chromium browser (fastest):\n"
+             "   pip install playwright && playwright install chromium\n\n"
+             "2. The wkhtmltoimage tool, added to your system's PATH.\n"
+             "   (You can download it from its official website)"),
+}
+_checked = {}
+
+def capability(name):
+    """Whether capability `name` is available; checked once per process."""
+    if name not in _checked:
+        _checked[name] = bool(CAPABILITIES[name][0]())
+    return _checked[name]
+
+def missing(conversion):
+    """The install hint for the first capability `conversion` lacks, or None when it can run."""
+    for name in conversion.requires:
+        if not capability(name):
+            return CAPABILITIES[name][1]
+    return None
+
+
+# --- Registry ---
+_conversions = {}
+
+def register(conversion):
+    """Adds (or replaces) a conversion; returns it."""
+    _conversions[conversion.name] = conversion
+    return conversion
+
+def conversions():
+    """The registered conversions, in the order they were registered."""
+    return list(_conversions.values())
+
+def get(name):
+    return _conversions[name]
+
+def _image(name, title, icon, target, inputs, file_label, description, requires=()):
+    register(Conversion(name, title, icon, description, inputs, file_label, "converter_core.engine:convert_images",
+                        options=dict(IMAGE_TARGETS[target]), requires=("pillow", *requires)))
+
+
+register(Conversion("pdf-to-word", "PDF to Word", "📄 → 📝", "Convert multiple .pdf files to .docx format.",
+                    (".pdf",), "PDF Files", "converter_core.engine:convert_documents", kind="document",
+                    options={'out_ext': ".docx", 'pages_per_chunk': PAGES_PER_CHUNK}, requires=("pdf2docx",),
+                    page_progress=True))
+register(Conversion("word-to-pdf", "Word to PDF", "📝 → 📄", "Convert multiple .docx files to .pdf format.",
+                    (".docx", ".doc"), "Word Documents", "converter_core.engine:convert_documents", kind="document",
+                    options={'out_ext': ".pdf"}, requires=("office",), worker_share=2))
+_image("png-to-jpg", "PNG to JPG", "🖼️ → JPG", "jpg", (".png",), "PNG Images",
+       "Convert multiple .png files to .jpg format.")
+_image("jpg-to-png", "JPG to PNG", "JPG → 🖼️", "png", (".jpg", ".jpeg"), "JPEG Images",
+       "Convert multiple .jpg files to .png format.")
+_image("image-to-webp", "Image to WEBP", "🖼️ → WEBP", "webp", (".png", ".jpg", ".jpeg", ".gif"), "Image Files",
+       "Convert multiple .png/.jpg/.gif files to .webp format; animations stay animated.")
+_image("webp-to-png", "WEBP to PNG", "WEBP → 🖼️", "png", (".webp",), "WEBP Images",
+       "Convert multiple .webp files to .png format.")
+_image("image-to-ico", "Image to ICO", "🖼️ → ICO", "ico", (".png", ".jpg", ".jpeg"), "Image Files",
+       "Convert multiple .png/.jpg files to .ico format.")
+_image("image-to-grayscale", "Image to Grayscale", "🎨 → 🔳", "grayscale", (".png", ".jpg", ".jpeg", ".bmp"),
+       "Image Files", "Convert multiple images to grayscale .png files.")
+_image("heic-to-jpg", "HEIC to JPG", "🍏 → 🖼️", "jpg", (".heic", ".heif"), "HEIC Images",
+       "Convert multiple .heic files to .jpg format.", requires=("heic",))
+_image("image-to-bmp", "Image to BMP", "🖼️ → BMP", "bmp", (".png", ".jpg", ".jpeg"), "Image Files",
+       "Convert multiple .png/.jpg files to .bmp format.")
+_image("animation-to-gif", "Animation to GIF", "🎞️ → GIF", "gif", (".webp", ".png", ".gif"), "Animated Images",
+       "Convert animated .webp and .png (APNG) files to animated .gif.")
+register(Conversion("extract-frames", "Extract Frames", "🎞️ → 🖼️",
+                    "Save every frame of animated or multi-page images as numbered .png files.",
+                    (".gif", ".webp", ".png", ".tif", ".tiff"), "Animated Images", "converter_core.engine:convert_images",
+                    options={**IMAGE_TARGETS["png"], 'frames': "split"}, requires=("pillow",)))
+register(Conversion("html-to-png", "HTML to PNG", "🌐 → 🖼️", "Convert multiple .html files to .png images.",
+                    (".html", ".htm"), "HTML Files", "converter_core.engine:convert_html_files", kind="html",
+                    options={'out_ext': ".png"}, requires=("html",), max_workers=4))
+register(Conversion("image-to-multiple", "Image to Multiple Formats", "🖼️ → ✳️",
+                    "Save each image as .jpg, .webp, .ico and grayscale .png in one pass.",
+                    (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".heic", ".heif"), "Image Files",
+                    "converter_core.engine:convert_images_multi", options={'targets': ["jpg", "webp", "ico", "grayscale"]},
+                    requires=("pillow",)))
@@ -0,0 +1,244 @@
+import importlib.util
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+
+from .engine import MissingDependencyError
+
+# Pooled HTML renderers.
+# The Chromium renderer keeps `size` headless browser pages open (one
+# Playwright instance per worker thread, as its sync API is not thread
+# safe) and renders every page in an already warm tab, so a page costs its
+# layout and paint time instead of a process start. Tabs are recycled
+# after `max_pages` renders and a crashed browser is relaunched. The
+# wkhtmltoimage renderer has no persistent mode; it runs up to `size`
+# wkhtmltoimage processes at once, called directly rather than via imgkit.
+# Both check for their browser or executable when they are opened, so a
+# missing tool stops a batch before the first page.
+
+RENDERERS = ("auto", "chromium", "wkhtmltoimage")
+DEFAULT_TIMEOUT = 60
+DEFAULT_MAX_PAGES = 500
+
+
+class RenderTimeout(RuntimeError):
+    """Raised when a page takes longer than the renderer's timeout."""
+
+
+@dataclass
+class RenderOptions:
+    """Output size and cropping for rendered pages.
+
+    `height` None renders the full page. `zoom` scales the page (a device
+    scale factor for Chromium). `crop` is (x, y, width, height) in page
+    pixels.
+    """
+    width: int = 1024
+    height: int = None
+    zoom: float = 1.0
+    crop: tuple = None
+    timeout: float = DEFAULT_TIMEOUT
+
+
+def _image_format(output_path):
+    return "jpeg" if os.path.splitext(output_path)[1].lower() in (".jpg", ".jpeg") else "png"
+
+
+class WkhtmlRenderer:
+    """Runs up to `size` wkhtmltoimage processes concurrently; `render` is thread-safe."""
+
+    name = "wkhtmltoimage"
+
+    def __init__(self, size=1, options=None, executable=None):
+        self.executable = executable or find_wkhtmltoimage()
+        if not self.executable:
+            raise MissingDependencyError("wkhtmltoimage tool not found. Please ensure it is installed and in your system's PATH.")
+        self.size = max(1, size)
+        self.options = options or RenderOptions()
+
+    def command(self, path, output_path):
+        o = self.options
+        args = [self.executable, "--quiet", "--enable-local-file-access", "--format", _image_format(output_path).replace("jpeg", "jpg"),
+                "--width", str(o.width)]
+        if o.height:
+            args += ["--height", str(o.height)]
+        if o.zoom != 1.0:
+            args += ["--zoom", str(o.zoom)]
+        if o.crop:
+            x, y, w, h = o.crop
+            args += ["--crop-x", str(x), "--crop-y", str(y), "--crop-w", str(w), "--crop-h", str(h)]
+        return args + [path, output_path]
+
+    def render(self, path, output_path):
+        try:
+            subprocess.run(self.command(path, output_path), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.PIPE, timeout=self.options.timeout, check=True)
+        except subprocess.TimeoutExpired:
+            raise RenderTimeout(f"Rendering took longer than {self.options.timeout}s.")
+        except subprocess.CalledProcessError as e:
+            # wkhtmltoimage exits 1 for pages with broken resources but still writes the image.
+            if not (os.path.exists(output_path) and os.path.getsize(output_path)):
+                raise RuntimeError(e.stderr.decode(errors="replace").strip() or f"wkhtmltoimage exited with code {e.returncode}")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _BrowserWorker(threading.Thread):
+    """Owns one Playwright instance, browser and tab; renders jobs from the shared queue."""
+
+    def __init__(self, index, jobs, options, max_pages):
+        super().__init__(name=f"html-renderer-{index}", daemon=True)
+        self.jobs = jobs
+        self.options = options
+        self.max_pages = max_pages
+        self.ready = threading.Event()
+        self.startup_error = None
+
+    def run(self):
+        try:
+            from playwright.sync_api import sync_playwright
+            playwright = sync_playwright().start()
+        except Exception as e:
+            self.startup_error = e
+            self.ready.set()
+            return
+        browser = page = None
+        try:
+            try:
+                browser, page = self._open(playwright)
+            except Exception as e:
+                self.startup_error = e
+                return
+            finally:
+                self.ready.set()
+            rendered = 0
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                path, output_path, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if not browser.is_connected():
+                        browser, page = self._open(playwright)
+                    elif rendered >= self.max_pages:
+                        page.context.close()
+                        page = self._new_page(browser)
+                        rendered = 0
+                    self._render(page, path, output_path)
+                    rendered += 1
+                    future.set_result(None)
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            try:
+                if browser is not None:
+                    browser.close()
+            finally:
+                playwright.stop()
+
+    def _open(self, playwright):
+        browser = playwright.chromium.launch()
+        return browser, self._new_page(browser)
+
+    def _new_page(self, browser):
+        o = self.options
+        context = browser.new_context(viewport={'width': o.width, 'height': o.height or 800}, device_scale_factor=o.zoom)
+        return context.new_page()
+
+    def _render(self, page, path, output_path):
+        from playwright.sync_api import TimeoutError as PlaywrightTimeout
+        o = self.options
+        try:
+            page.goto(Path(path).resolve().as_uri(), timeout=o.timeout * 1000, wait_until="load")
+        except PlaywrightTimeout:
+            raise RenderTimeout(f"Rendering took longer than {o.timeout}s.")
+        kwargs = {'path': output_path, 'type': _image_format(output_path), 'full_page': not o.height and not o.crop}
+        if o.crop:
+            x, y, w, h = o.crop
+            kwargs['clip'] = {'x': x, 'y': y, 'width': w, 'height': h}
+        page.screenshot(timeout=o.timeout * 1000, **kwargs)
+
+
+class ChromiumRenderer:
+    """`size` warm headless Chromium tabs (via Playwright); `render` is thread-safe."""
+
+    name = "chromium"
+
+    def __init__(self, size=1, options=None, max_pages=DEFAULT_MAX_PAGES):
+        if importlib.util.find_spec("playwright") is None:
+            raise MissingDependencyError("The 'playwright' library is required for Chromium rendering.\n\n"
+                                         "To install, run: pip install playwright && playwright install chromium")
+        self.size = max(1, size)
+        self.options = options or RenderOptions()
+        self._jobs = queue.Queue()
+        self._workers = [_BrowserWorker(i, self._jobs, self.options, max_pages) for i in range(self.size)]
+        for worker in self._workers:
+            worker.start()
+        for worker in self._workers:
+            worker.ready.wait()
+        failed = next((w.startup_error for w in self._workers if w.startup_error), None)
+        if failed:
+            self.close()
+            raise MissingDependencyError(f"Chromium could not be started ({failed}). Run: playwright install chromium")
+
+    def render(self, path, output_path):
+        future = Future()
+        self._jobs.put((path, output_path, future))
+        # The tab enforces the page timeout; the extra time covers a relaunch after a browser crash.
+        return future.result(timeout=self.options.timeout * 2 + 30)
+
+    def close(self):
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def find_wkhtmltoimage():
+    """Path of the wkhtmltoimage executable, or None."""
+    path = shutil.which("wkhtmltoimage")
+    if path or sys.platform != "win32":
+        return path
+    default = os.path.join(os.environ.get("PROGRAMFILES", r"C:\Program Files"), "wkhtmltopdf", "bin", "wkhtmltoimage.exe")
+    return default if os.path.exists(default) else None
+
+def open_renderer(name="auto", workers=1, options=None):
+    """Creates an HTML renderer with `workers` concurrent renders; the caller closes it.
+
+    "auto" uses Chromium when Playwright and its browser are installed and
+    falls back to wkhtmltoimage. Raises MissingDependencyError when the
+    chosen renderer cannot run.
+    """
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown HTML renderer {name!r}; expected one of {', '.join(RENDERERS)}")
+    if name in ("auto", "chromium"):
+        try:
+            return ChromiumRenderer(workers, options)
+        except MissingDependencyError:
+            if name == "chromium":
+                raise
+            if not find_wkhtmltoimage():
+                raise MissingDependencyError("No HTML renderer was found. Install wkhtmltoimage, or Playwright with "
+                                             "'pip install playwright && playwright install chromium'.")
+    return WkhtmlRenderer(workers, options)
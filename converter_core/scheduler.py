@@ -0,0 +1,240 @@
+import asyncio
+import itertools
+import sys
+import threading
+import time
+
+from .engine import BatchControl
+
+# Job scheduler for conversion batches.
+# An asyncio event loop runs on its own thread and keeps one priority queue
+# per kind of job (image, document, html). Each kind has a fixed number of
+# consumer tasks, which is its concurrency limit, so a long document batch
+# never holds up image jobs. The batches themselves run in the loop's
+# thread pool and can be paused, resumed or cancelled through their
+# BatchControl; a job paused before it starts is set aside, so it does not
+# hold its kind's consumer slot, and queued again when it is resumed.
+# Callers on other threads (e.g. the Tk thread) only ever call the
+# thread-safe methods of JobScheduler and Job.
+
+DEFAULT_LIMITS = {'image': 1, 'document': 1, 'html': 2}
+DEFAULT_MAX_QUEUED = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobScheduler.submit when the queue already holds max_queued jobs."""
+
+
+class Job:
+    """One queued batch: what to run, its state and its progress."""
+
+    def __init__(self, job_id, kind, title, priority, batch_function, kwargs, scheduler):
+        self.id = job_id
+        self.kind = kind
+        self.title = title
+        self.priority = priority
+        self.batch_function = batch_function
+        self.kwargs = kwargs
+        self.control = BatchControl()
+        self.status = QUEUED
+        self.done = 0
+        self.total = len(kwargs.get('input_paths', ()))
+        self.last_result = None
+        self.batch = None
+        self.error = None
+        self.submitted_at = time.time()
+        self._started = False
+        self._scheduler = scheduler
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    # State changes happen under the scheduler's lock, which the consumers also hold when they park or start a job.
+    def pause(self):
+        with self._scheduler._lock:
+            if self.finished:
+                return
+            self.control.pause()
+            self.status = PAUSED
+        self._scheduler._notify(self)
+
+    def resume(self):
+        with self._scheduler._lock:
+            if self.status != PAUSED:
+                return
+            self.control.resume()
+            self.status = RUNNING if self._started else QUEUED
+            entry = self._scheduler._unpark(self)
+        self._scheduler._requeue(self, entry)
+        self._scheduler._notify(self)
+
+    def cancel(self):
+        with self._scheduler._lock:
+            if self.finished:
+                return
+            self.control.cancel()
+            if not self._started:
+                self.status = CANCELLED
+                # A parked job is simply dropped; a queued one is dropped by its consumer.
+                self._scheduler._parked.pop(self.id, None)
+        self._scheduler._notify(self)
+
+    def _progress(self, done, total, result):
+        self.done = done
+        self.total = total
+        self.last_result = result
+        self._scheduler._notify(self)
+
+
+class JobScheduler:
+    """Runs submitted batches on a background asyncio loop with per-kind limits.
+
+    `listener(job)` is called, on a scheduler thread, whenever a job is
+    queued, starts, makes progress, changes state or finishes.
+    """
+
+    def __init__(self, limits=None, max_queued=DEFAULT_MAX_QUEUED, listener=None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_queued = max_queued
+        self.listener = listener
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._order = itertools.count()
+        self._queues = {}
+        self._consumers = []
+        self._parked = {}  # job id -> queue entry of jobs paused before they started
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="job-scheduler", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    # --- Loop Thread ---
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        for kind, limit in self.limits.items():
+            queue = asyncio.PriorityQueue()
+            self._queues[kind] = queue
+            for _ in range(limit):
+                self._consumers.append(self._loop.create_task(self._consume(queue)))
+        self._ready.set()
+        self._loop.run_forever()
+        for task in self._consumers:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*self._consumers, return_exceptions=True))
+        self._loop.close()
+
+    async def _consume(self, queue):
+        while True:
+            entry = await queue.get()
+            job = entry[2]
+            with self._lock:
+                self._queued -= 1
+                if job.control.cancelled:
+                    job.status = CANCELLED
+                elif job.control.paused:
+                    self._parked[job.id] = entry
+                    continue
+                else:
+                    job._started = True
+                    job.status = RUNNING
+            if job.status == CANCELLED:
+                self._notify(job)
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        self._notify(job)
+        error = None
+        try:
+            job.batch = await self._loop.run_in_executor(
+                None, lambda: job.batch_function(progress=job._progress, control=job.control, **job.kwargs))
+            if job.batch.cancelled:
+                status = CANCELLED
+            elif job.batch.aborted:
+                status, error = FAILED, job.batch.aborted
+            else:
+                status = DONE
+        except Exception as e:
+            status, error = FAILED, f"{type(e).__name__}: {e}"
+        with self._lock:
+            job.status = status
+            job.error = error
+        self._notify(job)
+
+    # --- Thread-Safe API ---
+    def submit(self, kind, batch_function, kwargs, title="", priority=0):
+        """Queues `batch_function(progress=..., control=..., **kwargs)`; lower priority numbers run first."""
+        if kind not in self.limits:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(self.limits)}")
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise QueueFullError(f"The job queue is full ({self.max_queued} waiting jobs).")
+            self._queued += 1
+            job = Job(next(self._ids), kind, title or kind, priority, batch_function, kwargs, self)
+            self.jobs[job.id] = job
+        entry = (priority, next(self._order), job)
+        self._loop.call_soon_threadsafe(self._queues[kind].put_nowait, entry)
+        self._notify(job)
+        return job
+
+    def cancel(self, job_id):
+        self.jobs[job_id].cancel()
+
+    def pause(self, job_id):
+        self.jobs[job_id].pause()
+
+    def resume(self, job_id):
+        self.jobs[job_id].resume()
+
+    def queue_depth(self):
+        with self._lock:
+            return self._queued
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def shutdown(self, cancel=True):
+        """Stops the loop; with `cancel`, running batches are told to stop first."""
+        if cancel:
+            for job in self.active_jobs():
+                job.cancel()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def _unpark(self, job):
+        """Takes a job set aside while paused out of the parked set; the caller holds _lock.
+
+        Returns its queue entry, counted as queued again, or None if it was
+        not parked.
+        """
+        entry = self._parked.pop(job.id, None)
+        if entry is not None:
+            self._queued += 1
+        return entry
+
+    def _requeue(self, job, entry):
+        """Puts an entry returned by _unpark back on its kind's queue."""
+        if entry is not None:
+            self._loop.call_soon_threadsafe(self._queues[job.kind].put_nowait, entry)
+
+    def _notify(self, job):
+        if self.listener:
+            try:
+                self.listener(job)
+            except Exception as e:
+                print(f"Job listener error: {e}", file=sys.stderr)
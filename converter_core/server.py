@@ -0,0 +1,518 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import engine
+from .engine import ENGINE_VERSION, IMAGE_TARGETS, MissingDependencyError
+
+# Local HTTP conversion service.
+# POST a file's bytes to /convert/image?target=webp (or /convert/pdf,
+# /convert/word, /convert/html) and the converted file comes back as a
+# chunked response. Conversions run in a persistent process pool that lives
+# as long as the server. Small images are not sent to the pool one by one:
+# requests arriving within a few milliseconds of each other are grouped
+# into one pool task, which saves a round trip per image. When more than
+# `max_pending` requests are waiting or running, new ones get 429 with
+# Retry-After instead of queueing without bound. A worker process that
+# crashes (e.g. out of memory on a decompression bomb) fails only the
+# requests of its task; the broken pool is replaced for the next ones.
+# GET /metrics reports
+# queue depth, counters and latency histograms in the Prometheus text
+# format. The server listens on a TCP port or, on POSIX, a unix socket.
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 64
+LISTEN_BACKLOG = 256  # connections the OS queues before accept; bursts beyond it are refused
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_BATCH_MAX = 16
+SMALL_IMAGE_BYTES = 512 * 1024
+MAX_BODY_BYTES = 256 * 1024 ** 2
+STREAM_CHUNK = 64 * 1024
+CRASH_MESSAGE = "A worker process crashed while converting this input."
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPES = {
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document", ".pdf": "application/pdf",
+}
+
+
+def image_content_type(image_format):
+    """Content type for a Pillow format name such as "JPEG", from Pillow's own registry of formats."""
+    Image = engine._require("PIL.Image", "Pillow")
+    Image.init()
+    return Image.MIME.get(image_format.upper(), "application/octet-stream")
+
+
+class ConversionError(RuntimeError):
+    """A conversion ran but failed; the message names the original error."""
+
+
+class BadRequest(ValueError):
+    """The request's parameters are invalid."""
+
+
+# --- Pool Tasks (run in worker processes) ---
+def _convert_image_batch(items):
+    """Converts [(data, spec)] in one worker task; returns [(ok, output bytes or error text)]."""
+    from .streams import convert_image_data
+    results = []
+    for data, spec in items:
+        try:
+            results.append((True, convert_image_data(data, **spec)))
+        except MissingDependencyError:
+            raise
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+def _convert_pdf(data):
+    from .streams import convert_pdf_data
+    return convert_pdf_data(data)
+
+
+class Metrics:
+    """Thread-safe counters, gauges and latency histograms rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.pending = 0
+        self.requests = {}  # (kind, status) -> count
+        self.latency = {}  # kind -> [bucket counts..., sum, count]
+        self.batches = 0
+        self.batched_requests = 0
+        self.pool_restarts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, kind, status, seconds):
+        with self._lock:
+            self.requests[(kind, status)] = self.requests.get((kind, status), 0) + 1
+            if status == "ok":
+                buckets = self.latency.setdefault(kind, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if seconds <= bound:
+                        buckets[i] += 1
+                buckets[-2] += seconds
+                buckets[-1] += 1
+
+    def pool_restart(self):
+        with self._lock:
+            self.pool_restarts += 1
+
+    def batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def text(self, queue_depth):
+        with self._lock:
+            lines = [
+                "# TYPE converter_pending_requests gauge", f"converter_pending_requests {self.pending}",
+                "# TYPE converter_batch_queue_depth gauge", f"converter_batch_queue_depth {queue_depth}",
+                "# TYPE converter_uptime_seconds gauge", f"converter_uptime_seconds {time.time() - self.started:.3f}",
+                "# TYPE converter_requests_total counter",
+            ]
+            lines += [f'converter_requests_total{{kind="{kind}",status="{status}"}} {count}'
+                      for (kind, status), count in sorted(self.requests.items())]
+            lines += ["# TYPE converter_image_batches_total counter", f"converter_image_batches_total {self.batches}",
+                      "# TYPE converter_batched_images_total counter", f"converter_batched_images_total {self.batched_requests}",
+                      "# TYPE converter_pool_restarts_total counter", f"converter_pool_restarts_total {self.pool_restarts}",
+                      "# TYPE converter_request_seconds histogram"]
+            for kind, buckets in sorted(self.latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'converter_request_seconds_bucket{{kind="{kind}",le="{bound}"}} {count}')
+                lines.append(f'converter_request_seconds_bucket{{kind="{kind}",le="+Inf"}} {buckets[-1]}')
+                lines.append(f'converter_request_seconds_sum{{kind="{kind}"}} {buckets[-2]:.6f}')
+                lines.append(f'converter_request_seconds_count{{kind="{kind}"}} {buckets[-1]}')
+        return "\n".join(lines) + "\n"
+
+
+class _ImageBatcher:
+    """Groups small image requests that arrive within `window` seconds into one pool task."""
+
+    def __init__(self, submit, metrics, window, max_items):
+        self.submit_task = submit
+        self.metrics = metrics
+        self.window = window
+        self.max_items = max_items
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="image-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, data, spec):
+        future = Future()
+        self._queue.put((data, spec, future))
+        return future
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_items:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        self.metrics.batch(len(batch))
+        try:
+            task = self.submit_task(_convert_image_batch, [(data, spec) for data, spec, _ in batch])
+        except Exception as e: # pool shut down
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        def distribute(task):
+            error = CancelledError() if task.cancelled() else task.exception()
+            if isinstance(error, BrokenProcessPool):
+                error = ConversionError(CRASH_MESSAGE)
+            for i, (_, _, future) in enumerate(batch):
+                if error:
+                    future.set_exception(error)
+                elif task.result()[i][0]:
+                    future.set_result(task.result()[i][1])
+                else:
+                    future.set_exception(ConversionError(task.result()[i][1]))
+        task.add_done_callback(distribute)
+
+
+class ConversionService:
+    """The conversions behind the HTTP server, independent of the transport.
+
+    Images and PDFs run in a persistent pool of `workers` processes; HTML
+    pages and Word documents use a warm renderer and office pool opened on
+    first use. `admit` and `release` bound the number of pending requests.
+    """
+
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, batch_window=DEFAULT_BATCH_WINDOW,
+                 batch_max=DEFAULT_BATCH_MAX, html_renderer="auto", office_backend="auto"):
+        self.workers = workers or engine.default_workers()
+        self.max_pending = max_pending
+        self.metrics = Metrics()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._pool_lock = threading.Lock()
+        self.batcher = _ImageBatcher(self._submit, self.metrics, batch_window, batch_max)
+        self.html_renderer = html_renderer
+        self.office_backend = office_backend
+        self._renderer = None
+        self._office = None
+        self._lock = threading.Lock()
+
+    def admit(self):
+        with self.metrics._lock:
+            if self.metrics.pending >= self.max_pending:
+                return False
+            self.metrics.pending += 1
+            return True
+
+    def release(self):
+        with self.metrics._lock:
+            self.metrics.pending -= 1
+
+    def queue_depth(self):
+        """Images waiting to be grouped into a pool task."""
+        return self.batcher.depth()
+
+    def _submit(self, fn, *args):
+        """Submits a task to the process pool, replacing the pool first if a crashed worker broke it."""
+        with self._pool_lock:
+            pool = self.pool
+        try:
+            task = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            pool = self._replace_pool(pool)
+            task = pool.submit(fn, *args)
+
+        def check(task):
+            if not task.cancelled() and isinstance(task.exception(), BrokenProcessPool):
+                self._replace_pool(pool)
+        task.add_done_callback(check)
+        return task
+
+    def _replace_pool(self, broken):
+        """Swaps a broken pool for a new one (once, however many tasks report it); returns the current pool."""
+        with self._pool_lock:
+            if self.pool is broken:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                self.metrics.pool_restart()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self.pool
+
+    # --- Conversions ---
+    def convert_image(self, data, target="png", quality=None, max_size=None):
+        if target not in IMAGE_TARGETS:
+            raise BadRequest(f"Unknown target {target!r}; expected one of {', '.join(IMAGE_TARGETS)}")
+        spec = dict(IMAGE_TARGETS[target])
+        if quality is not None:
+            spec['save_kwargs'] = {**spec['save_kwargs'], 'quality': quality}
+        spec['max_size'] = max_size
+        if len(data) <= SMALL_IMAGE_BYTES:
+            future = self.batcher.submit(data, spec)
+        else:
+            try:
+                ok, output = self._submit(_convert_image_batch, [(data, spec)]).result()[0]
+            except BrokenProcessPool:
+                raise ConversionError(CRASH_MESSAGE)
+            if not ok:
+                raise ConversionError(output)
+            return output, image_content_type(spec['save_kwargs']['format'])
+        return future.result(), image_content_type(spec['save_kwargs']['format'])
+
+    def convert_pdf(self, data):
+        try:
+            return self._submit(_convert_pdf, data).result(), CONTENT_TYPES[".docx"]
+        except MissingDependencyError:
+            raise
+        except BrokenProcessPool:
+            raise ConversionError(CRASH_MESSAGE)
+        except Exception as e:
+            raise ConversionError(f"{type(e).__name__}: {e}")
+
+    def convert_word(self, data, extension=".docx"):
+        with self._lock:
+            if self._office is None:
+                from .office import open_backend
+                self._office = open_backend(self.office_backend, self.workers)
+        return self._through_files(self._office.convert, data, extension, ".pdf"), CONTENT_TYPES[".pdf"]
+
+    def convert_html(self, data):
+        with self._lock:
+            if self._renderer is None:
+                from .render import open_renderer
+                self._renderer = open_renderer(self.html_renderer, self.workers)
+        return self._through_files(self._renderer.render, data, ".html", ".png"), image_content_type("PNG")
+
+    def _through_files(self, convert, data, in_ext, out_ext):
+        # Office suites and browsers only take files.
+        with tempfile.TemporaryDirectory(prefix="converter-serve-") as tmp:
+            in_path = os.path.join(tmp, "input" + in_ext)
+            out_path = os.path.join(tmp, "output" + out_ext)
+            with open(in_path, "wb") as f:
+                f.write(data)
+            try:
+                convert(in_path, out_path)
+                with open(out_path, "rb") as f:
+                    return f.read()
+            except MissingDependencyError:
+                raise
+            except Exception as e:
+                raise ConversionError(f"{type(e).__name__}: {e}")
+
+    def close(self):
+        self.batcher.close()
+        with self._pool_lock:
+            self.pool.shutdown(cancel_futures=True)
+        for backend in (self._renderer, self._office):
+            if backend is not None:
+                backend.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = f"converter/{ENGINE_VERSION}"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            self._send(200, self.service.metrics.text(self.service.queue_depth()).encode(), "text/plain; version=0.0.4")
+        elif path == "/health":
+            self._send(200, b'{"status": "ok"}', "application/json")
+        else:
+            self._error(404, "Not found.")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        kind = url.path.removeprefix("/convert/")
+        handlers = {'image': self._image, 'pdf': self._pdf, 'word': self._word, 'html': self._html}
+        if not url.path.startswith("/convert/") or kind not in handlers:
+            self._error(404, "Not found.")
+            return
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self._error(411, "Content-Length is required.")
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body's end is unknown, so the connection cannot be reused.
+            self.close_connection = True
+            self._error(400, "Content-Length must be a non-negative integer.", {'Connection': "close"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._error(413, f"The body is larger than {MAX_BODY_BYTES} bytes.", {'Connection': "close"})
+            return
+        if not self.service.admit():
+            # Rejected before the body is buffered; it is drained in chunks so the connection stays usable.
+            self._discard(length)
+            self.service.metrics.observe(kind, "rejected", 0)
+            self._error(429, "The converter is saturated; retry shortly.", {'Retry-After': "1"})
+            return
+
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            data = self.rfile.read(length)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            output, content_type = handlers[kind](data, params)
+        except BadRequest as e:
+            status = "bad_request"
+            self._error(400, str(e))
+        except ConversionError as e:
+            status = "failed"
+            self._error(422, str(e))
+        except MissingDependencyError as e:
+            status = "unavailable"
+            self._error(503, str(e))
+        except Exception as e:
+            status = "error"
+            self._error(500, f"{type(e).__name__}: {e}")
+        else:
+            self._stream(output, content_type)
+        finally:
+            self.service.release()
+            self.service.metrics.observe(kind, status, time.perf_counter() - start)
+
+    def _image(self, data, params):
+        try:
+            quality = int(params['quality']) if 'quality' in params else None
+            max_size = int(params['max_size']) if 'max_size' in params else None
+        except ValueError:
+            raise BadRequest("quality and max_size must be integers.")
+        return self.service.convert_image(data, params.get('target', "png"), quality, max_size)
+
+    def _pdf(self, data, params):
+        return self.service.convert_pdf(data)
+
+    def _word(self, data, params):
+        extension = "." + params.get('ext', "docx").lstrip(".")
+        if extension not in (".docx", ".doc"):
+            raise BadRequest("ext must be docx or doc.")
+        return self.service.convert_word(data, extension)
+
+    def _html(self, data, params):
+        return self.service.convert_html(data)
+
+    def _discard(self, length):
+        while length > 0:
+            chunk = self.rfile.read(min(length, STREAM_CHUNK))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    # --- Responses ---
+    def _stream(self, data, content_type):
+        """Sends `data` with chunked transfer encoding, so large outputs go out as they are written."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        view = memoryview(data)
+        for start in range(0, len(view), STREAM_CHUNK):
+            chunk = view[start:start + STREAM_CHUNK]
+            self.wfile.write(f"{len(chunk):X}\r\n".encode())
+            self.wfile.write(chunk)
+            self.wfile.write(b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send(self, code, body, content_type, headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message, headers=None):
+        self._send(code, json.dumps({'error': message}).encode(), "application/json", headers)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, address, service, quiet=False):
+        self.service = service
+        self.quiet = quiet
+        super().__init__(address, _Handler)
+
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        request_queue_size = LISTEN_BACKLOG
+
+        def __init__(self, path, service, quiet=False):
+            self.service = service
+            self.quiet = quiet
+            if os.path.exists(path):
+                os.unlink(path)
+            super().__init__(path, _Handler)
+
+        def server_close(self):
+            super().server_close()
+            if os.path.exists(self.server_address):
+                os.unlink(self.server_address)
+
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None, quiet=False):
+    """Creates the HTTP server for `service`, on host:port or on a unix socket path; call serve_forever()."""
+    if unix_socket:
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported on this platform.")
+        return _UnixHTTPServer(unix_socket, service, quiet)
+    return _HTTPServer((host, port), service, quiet)
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None, quiet=False, **service_options):
+    """Runs the conversion service until interrupted."""
+    service = ConversionService(**service_options)
+    server = make_server(service, host, port, unix_socket, quiet)
+    where = unix_socket or f"http://{server.server_address[0]}:{server.server_address[1]}"
+    print(f"Serving conversions on {where} with {service.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,164 @@
+import io
+import os
+
+from .engine import _encode_image, _require, heic_supported
+
+# In-memory conversion API.
+# Services that receive uploads can convert without writing temp files:
+# sources may be bytes, bytearray, memoryview, mmap or a binary file object,
+# and the output is returned as bytes, written to a file object, or written
+# straight into a caller-supplied writable buffer. Buffers are read through
+# a BufferReader that hands Pillow slices of the caller's memory instead of
+# copying the whole input first. Images go through the same pipeline as
+# convert_image, so the output matches the path-based flow byte for byte.
+
+
+class BufferTooSmall(ValueError):
+    """Raised when the encoded output does not fit in the caller's buffer."""
+
+
+class BufferReader(io.RawIOBase):
+    """A read-only, seekable file over any buffer (bytes, bytearray, memoryview, mmap), without copying it."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos += len(chunk)
+        return chunk
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class BufferWriter(io.RawIOBase):
+    """A seekable file that writes into a caller's writable buffer; `length` is the number of bytes written."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        if self._view.readonly:
+            raise TypeError("The output buffer is read-only.")
+        self._pos = 0
+        self.length = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self.length}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def write(self, b):
+        data = memoryview(b).cast("B")
+        end = self._pos + len(data)
+        if end > len(self._view):
+            raise BufferTooSmall(f"The output needs more than the {len(self._view)} bytes of the buffer.")
+        self._view[self._pos:end] = data
+        self._pos = end
+        self.length = max(self.length, end)
+        return len(data)
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def open_source(source):
+    """A seekable binary file for `source` (buffer or file object); file objects are used as they are when seekable."""
+    if hasattr(source, "read"):
+        if getattr(source, "seekable", lambda: False)():
+            return source
+        return io.BytesIO(source.read()) # e.g. a socket or pipe: needs to be buffered once
+    return BufferReader(source)
+
+def _deliver(write, sink):
+    """Runs `write(file)` into `sink` and returns the bytes (no sink) or the number of bytes written."""
+    if sink is None:
+        out = io.BytesIO()
+        write(out)
+        return out.getvalue()
+    if hasattr(sink, "write"):
+        start = sink.tell() if getattr(sink, "seekable", lambda: False)() else None
+        write(sink)
+        return sink.tell() - start if start is not None else None
+    writer = BufferWriter(sink)
+    write(writer)
+    return writer.length
+
+
+def convert_image_data(source, out_format, save_kwargs, convert_mode=None, max_size=None, sink=None, frames="auto",
+                       pixel_ops=None):
+    """Converts an image held in memory; arguments match convert_image, e.g. `**IMAGE_TARGETS["webp"]`.
+
+    Returns the encoded bytes, or with `sink` (a writable binary file or a
+    writable buffer such as a bytearray) writes into it and returns the
+    number of bytes written (None for an unseekable file). Raises
+    BufferTooSmall when a buffer sink cannot hold the output; conversion
+    errors propagate. `frames` is "auto" or "first" as in convert_image;
+    there is one output, so frames cannot be split. `pixel_ops` are
+    converter_core.pixelops operations, as in convert_image.
+    """
+    from .frames import animates
+    if frames not in ("auto", "first"):
+        raise ValueError(f"frames must be 'auto' or 'first' for in-memory conversions, not {frames!r}")
+    _require("PIL.Image", "Pillow")
+    heic_supported()
+    reader = open_source(source)
+    animate = frames == "auto" and animates(save_kwargs)
+    try:
+        return _deliver(lambda out: _encode_image(reader, out, save_kwargs, convert_mode, max_size, animate=animate,
+                                                  pixel_ops=pixel_ops), sink)
+    finally:
+        if reader is not source:
+            reader.close() # releases the view, so e.g. an mmap source can be closed
+
+def convert_pdf_data(source, sink=None):
+    """Converts a PDF held in memory to .docx, like convert_document's single-pass route.
+
+    `source` and `sink` work as in convert_image_data. pdf2docx parses from
+    a bytes object, so buffers other than bytes are copied once.
+    """
+    pdf2docx = _require("pdf2docx", "pdf2docx")
+    if hasattr(source, "read"):
+        data = source.read()
+    else:
+        data = source if isinstance(source, bytes) else memoryview(source).tobytes()
+
+    def write(out):
+        cv = pdf2docx.Converter(stream=data)
+        try:
+            cv.convert(out, start=0, end=None)
+        finally:
+            cv.close()
+    return _deliver(write, sink)
@@ -0,0 +1,111 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Per-file, per-stage instrumentation.
+# Conversions time their stages (open, decode, resize, convert, encode,
+# engine, render, cache) with a StageTimer and store them on the FileResult
+# together with input/output sizes and the error class. A TraceWriter
+# appends every result to a JSON-lines trace as it arrives, and summarize()
+# aggregates a batch into the slowest files, time per stage, compression
+# ratio and error counts.
+
+
+class StageTimer:
+    """Accumulates wall time per named stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+class TraceWriter:
+    """Appends one JSON object per converted file to a JSON-lines trace."""
+
+    def __init__(self, path, job=None):
+        self.path = path
+        self.job = job
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, result):
+        record = {'ts': round(time.time(), 3), 'job': self.job, **result.to_dict()}
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def summarize(results, top=10):
+    """Aggregates FileResults (or trace records) into a summary dict."""
+    records = [r.to_dict() if hasattr(r, "to_dict") else r for r in results]
+    converted = [r for r in records if not r.get('up_to_date')]
+    stage_totals = {}
+    for r in converted:
+        for name, seconds in (r.get('stages') or {}).items():
+            stage_totals[name] = stage_totals.get(name, 0.0) + seconds
+    errors = {}
+    for r in converted:
+        if not r['ok']:
+            errors[r.get('error_class') or "Error"] = errors.get(r.get('error_class') or "Error", 0) + 1
+
+    sized = [r for r in converted if r['ok'] and r.get('input_bytes') and r.get('output_bytes') is not None]
+    input_bytes = sum(r['input_bytes'] for r in sized)
+    output_bytes = sum(r['output_bytes'] for r in sized)
+    slowest = sorted(converted, key=lambda r: r['seconds'], reverse=True)[:top]
+    return {
+        'files': len(records),
+        'converted': len(converted),
+        'failed': sum(1 for r in converted if not r['ok']),
+        'total_seconds': round(sum(r['seconds'] for r in converted), 4),
+        'stage_seconds': {name: round(seconds, 4) for name, seconds in sorted(stage_totals.items(), key=lambda i: -i[1])},
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+        'compression_ratio': round(output_bytes / input_bytes, 4) if input_bytes else None,
+        'errors': errors,
+        'slowest': [{'input_path': r['input_path'], 'seconds': round(r['seconds'], 4), 'stages': r.get('stages')}
+                    for r in slowest],
+    }
+
+def read_trace(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@contextmanager
+def profiled(path):
+    """Runs the body under cProfile and dumps the stats to `path` (a no-op when `path` is None)."""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
@@ -0,0 +1,279 @@
+import io
+import json
+import math
+import os
+import tempfile
+from dataclasses import dataclass
+
+from .engine import _require
+
+# Encoder parameter search.
+# Instead of a fixed quality, a tuned encode is given a goal: a byte cap per
+# file and/or a minimum SSIM or PSNR against the image being encoded. JPEG
+# and WEBP quality is found by bisection, first on a proxy downscaled to
+# PROXY_SIDE pixels (cheap to encode and compare), then in a narrow window
+# around that estimate at full size, so the chosen setting is verified on
+# the real output. The result is remembered per image class (format, mode,
+# photo or graphic, detail and size bucket) and goal; the next similar
+# image starts from it and skips the proxy search. Tuned encodes also turn
+# on the lossless size savings Pillow leaves off by default.
+
+QUALITY_RANGE = (10, 95)  # JPEG quality above 95 mostly grows files without visible gain
+PROXY_SIDE = 512
+PROXY_WINDOW = 8  # full-size search window around the proxy's estimate, in quality steps
+CACHED_WINDOW = 3  # the same around a remembered setting
+SSIM_BLOCK = 8
+MAX_REMEMBERED = 4096
+TUNABLE_FORMATS = {"JPEG", "WEBP"}
+ENCODER_OPTIONS = {
+    "JPEG": {'optimize': True, 'progressive': True},
+    "WEBP": {'method': 6},
+    "PNG": {'optimize': True},
+}
+
+
+@dataclass(frozen=True)
+class TuningGoal:
+    """What a tuned encode must meet: at most `max_bytes`, and/or at least `min_ssim` (0-1) or `min_psnr` (dB).
+
+    With a quality floor the lowest passing quality is used, i.e. the
+    smallest file; with only a byte cap, the highest quality that fits.
+    """
+    max_bytes: int = None
+    min_ssim: float = None
+    min_psnr: float = None
+
+    def __post_init__(self):
+        if self.max_bytes is None and self.min_ssim is None and self.min_psnr is None:
+            raise ValueError("A tuning goal needs max_bytes, min_ssim or min_psnr.")
+
+    @property
+    def has_floor(self):
+        return self.min_ssim is not None or self.min_psnr is not None
+
+
+class ParameterCache:
+    """The quality chosen per image class and goal, in a small JSON file shared by worker processes and runs.
+
+    Only holds a path, so it can be passed to worker processes; concurrent
+    writers may drop each other's latest entry, which only costs a search.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            from .cache import default_cache_dir
+            path = os.path.join(default_cache_dir(), "tuning.json")
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        return self._load().get(key)
+
+    def put(self, key, quality):
+        entries = self._load()
+        entries.pop(key, None)
+        entries[key] = quality # most recent last, so the oldest are dropped first
+        while len(entries) > MAX_REMEMBERED:
+            entries.pop(next(iter(entries)))
+        folder = os.path.dirname(self.path) or "."
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# --- Quality metrics ---
+def _math(expression, **images):
+    from PIL import ImageMath
+    evaluate = getattr(ImageMath, "unsafe_eval", None) or ImageMath.eval
+    return evaluate(expression, **images)
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio of two same-size, same-mode images, in dB (inf when identical)."""
+    from PIL import ImageChops, ImageStat
+    squares = ImageStat.Stat(ImageChops.difference(a, b)).sum2
+    mse = sum(squares) / (a.size[0] * a.size[1] * len(squares))
+    return math.inf if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def ssim(a, b, block=SSIM_BLOCK):
+    """Mean structural similarity of the luma of two same-size images, over `block` x `block` windows."""
+    x, y = a.convert("L").convert("F"), b.convert("L").convert("F")
+    block = max(1, min(block, *x.size))
+    means = {'mx': x.reduce(block), 'my': y.reduce(block)}
+    squares = {name: _math(expression, x=x, y=y).reduce(block)
+               for name, expression in (('xx', "x * x"), ('yy', "y * y"), ('xy', "x * y"))}
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    similarity = _math(f"((2 * mx * my + {c1}) * (2 * (xy - mx * my) + {c2})) / "
+                       f"((mx * mx + my * my + {c1}) * ((xx - mx * mx) + (yy - my * my) + {c2}))", **means, **squares)
+    # ImageStat bins float images into a histogram; a reduce to a single pixel gives the exact mean.
+    return similarity.reduce(similarity.size).getpixel((0, 0))
+
+
+def _comparable(img):
+    if img.mode in ("L", "RGB", "RGBA"):
+        return img
+    has_alpha = img.mode in ("LA", "PA", "RGBa", "La") or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha else "RGB")
+
+def image_class(img, fmt):
+    """A key grouping images that end up with similar encoder settings."""
+    from PIL import ImageFilter, ImageStat
+    thumb = img.convert("RGB") if img.mode not in ("L", "RGB") else img
+    thumb = thumb.resize((64, 64))
+    kind = "graphic" if thumb.getcolors(256) is not None else "photo"
+    detail = min(7, int(ImageStat.Stat(thumb.convert("L").filter(ImageFilter.FIND_EDGES)).mean[0] // 8))
+    size = round(math.log2(max(1, img.size[0] * img.size[1])))
+    return f"{fmt}:{img.mode}:{kind}:{detail}:{size}"
+
+
+class _Trials:
+    """Encodes one image at given qualities, memoizing outputs and measurements."""
+
+    def __init__(self, img, options, goal, max_bytes=None):
+        self.img = img
+        self.reference = _comparable(img)
+        self.options = options
+        self.goal = goal
+        self.max_bytes = max_bytes
+        self.outputs = {}
+        self.measures = {}
+
+    def encode(self, quality):
+        if quality not in self.outputs:
+            out = io.BytesIO()
+            self.img.save(out, **{**self.options, 'quality': quality})
+            self.outputs[quality] = out.getvalue()
+        return self.outputs[quality]
+
+    def measure(self, quality):
+        """Size and, for quality floors, SSIM and PSNR of the output at `quality`."""
+        if quality not in self.measures:
+            from PIL import Image
+            data = self.encode(quality)
+            measure = {'bytes': len(data)}
+            if self.goal.has_floor:
+                with Image.open(io.BytesIO(data)) as decoded:
+                    decoded = decoded.convert(self.reference.mode)
+                if self.goal.min_ssim is not None:
+                    measure['ssim'] = ssim(self.reference, decoded)
+                if self.goal.min_psnr is not None:
+                    measure['psnr'] = psnr(self.reference, decoded)
+            self.measures[quality] = measure
+        return self.measures[quality]
+
+    def meets_floor(self, quality):
+        m = self.measure(quality)
+        return (m.get('ssim', math.inf) >= (self.goal.min_ssim or 0)
+                and m.get('psnr', math.inf) >= (self.goal.min_psnr or 0))
+
+    def fits(self, quality):
+        return self.max_bytes is None or len(self.encode(quality)) <= self.max_bytes
+
+    def choose(self, lo, hi):
+        """Bisects [lo, hi] for the goal's quality; returns (quality, met)."""
+        if self.goal.has_floor:
+            quality = _bisect(self.meets_floor, lo, hi, lowest=True)
+            if quality is not None and self.fits(quality):
+                return quality, True
+            if self.max_bytes is None:
+                return hi, False
+        # A byte cap alone, or a quality floor that cannot be met within it: the best quality that fits.
+        quality = _bisect(self.fits, lo, hi, lowest=False)
+        return (lo, False) if quality is None else (quality, not self.goal.has_floor)
+
+    def refine(self, estimate, window):
+        """Searches `window` steps around `estimate`, widening to the full range when the answer lies outside."""
+        low, high = QUALITY_RANGE
+        lo, hi = max(low, estimate - window), min(high, estimate + window)
+        quality, met = self.choose(lo, hi)
+        if quality == lo and lo > low and (not met or self.goal.has_floor):
+            quality, met = self.choose(low, lo)
+        elif quality == hi and hi < high and (not met or not self.goal.has_floor):
+            quality, met = self.choose(hi, high)
+        return quality, met
+
+
+def _bisect(passes, lo, hi, lowest):
+    """The lowest (or highest) value in [lo, hi] for which the monotonic `passes` holds, or None."""
+    found = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if passes(mid):
+            found = mid
+            lo, hi = (lo, mid - 1) if lowest else (mid + 1, hi)
+        else:
+            lo, hi = (mid + 1, hi) if lowest else (lo, mid - 1)
+    return found
+
+def _write(data, target):
+    if hasattr(target, "write"):
+        target.write(data)
+    else:
+        with open(target, "wb") as f:
+            f.write(data)
+
+def save_tuned(img, target, save_kwargs, goal, params=None):
+    """Encodes `img` into `target` (a path or binary file) with the cheapest settings that meet `goal`.
+
+    `params` is an optional ParameterCache. Returns a report with the
+    chosen quality, output bytes, the measured SSIM/PSNR, whether the goal
+    was met and where the estimate came from (cache, proxy or full). Formats
+    without a quality setting are saved once with their lossless savings.
+    """
+    from . import imaging
+    _require("PIL.Image", "Pillow")
+    fmt = save_kwargs.get('format', "").upper()
+    options = {**save_kwargs, **ENCODER_OPTIONS.get(fmt, {})}
+    if fmt not in TUNABLE_FORMATS:
+        out = io.BytesIO()
+        img.save(out, **options)
+        data = out.getvalue()
+        _write(data, target)
+        met = goal.max_bytes is None or len(data) <= goal.max_bytes
+        return {'quality': None, 'bytes': len(data), 'met': met, 'source': "lossless", 'encodes': 1}
+
+    full = _Trials(img, options, goal, goal.max_bytes)
+    key = f"{image_class(img, fmt)}|{goal.max_bytes}:{goal.min_ssim}:{goal.min_psnr}"
+    remembered = params.get(key) if params else None
+    if remembered is not None:
+        source, window, estimate = "cache", CACHED_WINDOW, remembered
+    elif max(img.size) > PROXY_SIDE:
+        proxy = imaging.shrink(img, imaging.fit_size(img.size, PROXY_SIDE))
+        if proxy.mode != img.mode:
+            proxy = proxy.convert(img.mode)
+        # Bytes per pixel stay roughly constant across scales, so the cap shrinks with the pixel count.
+        scale = (proxy.size[0] * proxy.size[1]) / (img.size[0] * img.size[1])
+        max_bytes = goal.max_bytes and goal.max_bytes * scale
+        estimate, _ = _Trials(proxy, options, goal, max_bytes).choose(*QUALITY_RANGE)
+        source, window = "proxy", PROXY_WINDOW
+    else:
+        source, window, estimate = "full", None, None
+
+    if window is None:
+        quality, met = full.choose(*QUALITY_RANGE)
+    else:
+        quality, met = full.refine(estimate, window)
+    data = full.encode(quality)
+    _write(data, target)
+    if params and met:
+        params.put(key, quality)
+
+    report = {'quality': quality, 'bytes': len(data), 'met': met, 'source': source, 'encodes': len(full.outputs)}
+    if goal.has_floor:
+        measure = full.measure(quality)
+        if 'ssim' in measure:
+            report['ssim'] = round(measure['ssim'], 4)
+        if 'psnr' in measure:
+            report['psnr'] = round(min(measure['psnr'], 99.99), 2)
+    return report
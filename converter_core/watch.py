@@ -0,0 +1,520 @@
+import fnmatch
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from . import engine, preflight
+from .planning import output_extension, plan_batches
+
+# Watch-folder daemon.
+# Input folders are watched through the OS's file events (inotify,
+# FSEvents or ReadDirectoryChangesW via the optional watchdog library) or,
+# without it, by polling a directory listing. Events only mark a file as
+# pending: it is converted once its size and mtime have not changed for
+# `settle` seconds, so files still being copied in are left alone. All
+# files that settle together are planned into as few batches as possible
+# (one per rule target) and run on the worker pool. Outputs are written to
+# a staging folder next to the final one and renamed into place, so
+# consumers of the output folder only ever see complete files.
+
+DEFAULT_SETTLE = 1.0
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_MAX_BATCH = 64
+TICK = 0.2
+STAGING_NAME = ".converter-staging"
+PROCESSED_NAME = ".processed"
+FAILED_NAME = ".failed"
+AFTER_ACTIONS = ("keep", "move", "delete")
+PARTIAL_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload", ".download", "~")
+LATENCY_WINDOW = 1000  # recent files used for the latency percentiles
+
+
+@dataclass
+class WatchRule:
+    """Files in a watched folder matching `pattern` (e.g. "*.heic") are converted to `target` (a CLI target)."""
+    pattern: str
+    target: str
+
+    def matches(self, name):
+        return fnmatch.fnmatch(name.lower(), self.pattern.lower())
+
+
+@dataclass
+class WatchFolder:
+    """A watched input folder, its rules (first match wins) and where outputs go."""
+    path: str
+    output_dir: str
+    rules: list = field(default_factory=list)
+    recursive: bool = False
+
+    def rule_for(self, path):
+        name = os.path.basename(path)
+        return next((rule for rule in self.rules if rule.matches(name)), None)
+
+
+def load_config(path):
+    """Reads watch folders from a JSON file:
+
+    {"folders": [{"path": "inbox", "output_dir": "out", "recursive": false,
+                  "rules": {"*.heic": "jpg", "*.pdf": "docx"}}]}
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return [WatchFolder(entry['path'], entry['output_dir'], [WatchRule(p, t) for p, t in entry['rules'].items()],
+                        entry.get('recursive', False))
+            for entry in config['folders']]
+
+def _ignored(name):
+    return name.startswith(".") or name.lower().endswith(PARTIAL_SUFFIXES)
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class WatchStats:
+    """Counters of a watch session; thread-safe."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.seen = 0
+        self.converted = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = 0  # inputs or outputs that could not be moved, renamed or deleted
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # seconds from first sighting to output in place
+        self._lock = threading.Lock()
+
+    def record(self, result, latency):
+        with self._lock:
+            if result.ok:
+                self.converted += 1
+                self.latencies.append(latency)
+            else:
+                self.failed += 1
+            self.bytes_in += result.input_bytes or 0
+            self.bytes_out += result.output_bytes or 0
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def _percentile(self, latencies, fraction):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))], 4) if latencies else None
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            uptime = time.time() - self.started
+            return {
+                'uptime_seconds': round(uptime, 1), 'seen': self.seen, 'converted': self.converted,
+                'failed': self.failed, 'batches': self.batches, 'errors': self.errors, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                'files_per_second': round(self.converted / self.busy_seconds, 2) if self.busy_seconds else None,
+                'latency_p50_seconds': self._percentile(latencies, 0.5),
+                'latency_p95_seconds': self._percentile(latencies, 0.95),
+            }
+
+    def text(self, pending=0):
+        """The counters in Prometheus text format."""
+        s = self.snapshot()
+        lines = [
+            "# TYPE converter_watch_files_total counter",
+            f'converter_watch_files_total{{status="ok"}} {s["converted"]}',
+            f'converter_watch_files_total{{status="failed"}} {s["failed"]}',
+            "# TYPE converter_watch_batches_total counter", f"converter_watch_batches_total {s['batches']}",
+            "# TYPE converter_watch_file_errors_total counter", f"converter_watch_file_errors_total {s['errors']}",
+            "# TYPE converter_watch_bytes_total counter",
+            f'converter_watch_bytes_total{{direction="in"}} {s["bytes_in"]}',
+            f'converter_watch_bytes_total{{direction="out"}} {s["bytes_out"]}',
+            "# TYPE converter_watch_pending gauge", f"converter_watch_pending {pending}",
+            "# TYPE converter_watch_busy_seconds_total counter", f"converter_watch_busy_seconds_total {self.busy_seconds:.3f}",
+        ]
+        for name, key in (("0.5", 'latency_p50_seconds'), ("0.95", 'latency_p95_seconds')):
+            if s[key] is not None:
+                lines.append(f'converter_watch_latency_seconds{{quantile="{name}"}} {s[key]}')
+        return "\n".join(lines) + "\n"
+
+
+class _EventSource:
+    """Feeds paths that may have changed to `touch`: watchdog observers when available, else polling."""
+
+    def __init__(self, folders, touch, poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False):
+        self.folders = folders
+        self.touch = touch
+        self.poll_interval = poll_interval
+        self._observer = None
+        self._last_poll = 0.0
+        self._listing = {}
+        if not force_polling and importlib.util.find_spec("watchdog") is not None:
+            self._observer = self._start_observer()
+        self.kind = "events" if self._observer else "polling"
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        touch = self.touch
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    touch(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    touch(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    touch(event.dest_path)
+
+        observer = Observer()
+        for folder in self.folders:
+            observer.schedule(Handler(), folder.path, recursive=folder.recursive)
+        observer.start()
+        return observer
+
+    def initial_scan(self):
+        for path in self._list():
+            self.touch(path)
+
+    def poll(self):
+        """Compares a fresh listing with the last one; only does work in polling mode, every poll_interval."""
+        if self._observer or time.monotonic() - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = time.monotonic()
+        listing = {}
+        for path in self._list():
+            listing[path] = _signature(path)
+            if self._listing.get(path) != listing[path]:
+                self.touch(path)
+        self._listing = listing
+
+    def _list(self):
+        for folder in self.folders:
+            stack = [folder.path]
+            while stack:
+                try:
+                    entries = list(os.scandir(stack.pop()))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if _ignored(entry.name):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if folder.recursive:
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.path
+
+    def close(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+
+
+class FolderWatcher:
+    """Converts files that arrive in `folders` (WatchFolder) until `stop` is called.
+
+    `after` is what happens to an input once converted: "keep" (converted
+    again only when it changes), "move" (to a .processed subfolder, failed
+    ones to .failed) or "delete". Files already in a folder at start are
+    converted unless their output is newer. `workers` is passed to every
+    batch; document and HTML engines are opened once and reused.
+    """
+
+    def __init__(self, folders, workers=1, settle=DEFAULT_SETTLE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 force_polling=False, max_batch=DEFAULT_MAX_BATCH, after="keep", log=None):
+        if after not in AFTER_ACTIONS:
+            raise ValueError(f"after must be one of {', '.join(AFTER_ACTIONS)}")
+        self.folders = [WatchFolder(os.path.abspath(f.path), os.path.abspath(f.output_dir), f.rules, f.recursive)
+                        for f in folders]
+        self.workers = workers
+        self.settle = settle
+        self.max_batch = max_batch
+        self.after = after
+        self.log = log or (lambda message: None)
+        self.stats = WatchStats()
+        self._pending = {}  # path: [signature, stable since, first seen]
+        self._done = {}  # path: signature it was last converted (or failed) with
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._engines = {}
+        self._missing = {}  # engine kind: why it cannot be opened
+        self.source = _EventSource(self.folders, self.touch, poll_interval, force_polling)
+
+    def touch(self, path):
+        """Marks `path` as possibly new or changed; called from event threads and the poller."""
+        path = os.path.abspath(path)
+        folder = self._folder_for(path)
+        if folder is None or _ignored(os.path.basename(path)) or folder.rule_for(path) is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if path not in self._pending:
+                self._pending[path] = [None, now, now]
+                self.stats.seen += 1
+
+    def _folder_for(self, path):
+        """The watched folder `path` belongs to; None outside them and inside dot folders (.processed, staging)."""
+        parent = os.path.dirname(path)
+        for folder in self.folders:
+            if parent == folder.path:
+                return folder
+            if folder.recursive and parent.startswith(folder.path + os.sep):
+                if any(part.startswith(".") for part in os.path.relpath(parent, folder.path).split(os.sep)):
+                    return None
+                return folder
+        return None
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _settled(self):
+        """Pending files whose size and mtime have not changed for `settle` seconds."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, state in list(self._pending.items()):
+                signature = _signature(path)
+                if signature is None:
+                    del self._pending[path] # deleted or moved away before it settled
+                elif signature != state[0]:
+                    state[0], state[1] = signature, now
+                elif now - state[1] >= self.settle:
+                    # Empty files settle too; pre-flight rejects them instead of leaving them pending forever.
+                    del self._pending[path]
+                    if self._done.get(path) != signature:
+                        ready.append((path, state[2]))
+        return ready[:self.max_batch] if len(ready) <= self.max_batch else self._requeue(ready)
+
+    def _requeue(self, ready):
+        with self._lock:
+            for path, first_seen in ready[self.max_batch:]:
+                self._pending[path] = [None, time.monotonic(), first_seen]
+        return ready[:self.max_batch]
+
+    # --- Running ---
+    def run(self):
+        """Watches until `stop` is called (e.g. from a signal handler or another thread)."""
+        self.log(f"Watching {len(self.folders)} folder(s) using {self.source.kind}")
+        self.source.initial_scan()
+        try:
+            while not self._stop.is_set():
+                self.source.poll()
+                ready = self._settled()
+                if ready:
+                    self.process(ready)
+                else:
+                    self._stop.wait(TICK)
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def process(self, ready):
+        """Converts settled files: one batch per folder and rule target."""
+        groups = {}
+        for path, first_seen in ready:
+            folder = self._folder_for(path)
+            if self.after != "keep" or not self._output_is_current(folder, path):
+                groups.setdefault((folder.path, folder.rule_for(path).target), []).append((path, first_seen))
+            else:
+                self._done[path] = _signature(path)
+        for (folder_path, target), items in groups.items():
+            folder = next(f for f in self.folders if f.path == folder_path)
+            started = time.perf_counter()
+            try:
+                self._run_group(folder, target, dict(items))
+            except Exception as e:
+                # E.g. the output folder is not writable; these inputs are tried again when they change.
+                # Errors of single inputs are handled per file in _run_group.
+                self.stats.error()
+                self.log(f"Batch for {target} in {folder.path} failed: {type(e).__name__}: {e}")
+                for path, _ in items:
+                    self._done[path] = _signature(path)
+            with self.stats._lock:
+                self.stats.busy_seconds += time.perf_counter() - started
+
+    def _output_is_current(self, folder, path):
+        output = engine.output_path_for(path, folder.output_dir, output_extension(folder.rule_for(path).target))
+        try:
+            return os.path.getmtime(output) >= os.path.getmtime(path)
+        except OSError:
+            return False
+
+    def _run_group(self, folder, target, first_seen):
+        staging = os.path.join(folder.output_dir, STAGING_NAME)
+        os.makedirs(staging, exist_ok=True)
+        batches, skipped = plan_batches(sorted(first_seen), [target])
+        for path in skipped:
+            self._fail(folder, path, f"Skipped: not a valid input for {target}")
+        for batch_function, inputs, kwargs in batches:
+            handled = set()
+            try:
+                report = preflight.check_batch(batch_function, inputs, staging, kwargs)
+                for info in report.rejected:
+                    self._fail(folder, info.path, f"Rejected: {info.error}")
+                    handled.add(info.path)
+                if not report.files:
+                    continue
+                kwargs['workers'] = self.workers
+                if batch_function is engine.convert_documents and kwargs['out_ext'] == ".pdf":
+                    kwargs['office_backend'] = self._engine("office")
+                elif batch_function is engine.convert_html_files:
+                    kwargs['renderer'] = self._engine("html")
+                batch = batch_function(report.paths, staging, **kwargs)
+            except OSError:
+                raise
+            except Exception as e:
+                # A bug or an unexpected input error must not stop the daemon; the batch's inputs count as failed.
+                for path in inputs:
+                    if path not in handled:
+                        self._fail(folder, path, f"{type(e).__name__}: {e}", first_seen[path])
+                continue
+            self.stats.batches += 1
+            if batch.aborted:
+                # Only a missing tool aborts a batch here; trying again would abort again.
+                self.log(f"Batch aborted: {batch.aborted}")
+                converted = {r.input_path for r in batch.results}
+                for path in report.paths:
+                    if path not in converted:
+                        self._fail(folder, path, f"Aborted: {batch.aborted}", first_seen[path])
+            for result in batch.results:
+                try:
+                    if result.ok:
+                        self._publish(result, staging, folder.output_dir)
+                    latency = time.monotonic() - first_seen[result.input_path]
+                    self.stats.record(result, latency)
+                    self.log(f"{'ok' if result.ok else 'FAILED'} {result.input_path} ({latency:.2f}s)"
+                             + ("" if result.ok else f": {result.error}"))
+                    self._finish_input(folder, result.input_path, result.ok)
+                except Exception as e:
+                    self.log(f"Could not finish {result.input_path}: {type(e).__name__}: {e}")
+                    self.stats.error()
+
+    def _fail(self, folder, path, error, first_seen=None):
+        """Counts, logs and finishes an input that was not converted (moved to .failed unless kept)."""
+        latency = time.monotonic() - first_seen if first_seen else 0.0
+        self.stats.record(engine.FileResult(path, error=error), latency)
+        self.log(f"FAILED {path}: {error}")
+        self._finish_input(folder, path, ok=False)
+
+    def _engine(self, kind):
+        """The office backend or HTML renderer, opened on first use and kept for later batches.
+
+        Raises MissingDependencyError when the tool is not installed; that is
+        logged once and remembered, and the inputs needing it fail.
+        """
+        if kind in self._missing:
+            raise engine.MissingDependencyError(self._missing[kind])
+        if kind not in self._engines:
+            try:
+                if kind == "office":
+                    from .office import open_backend
+                    self._engines[kind] = open_backend("auto", self.workers)
+                    if self._engines[kind].notice:
+                        self.log(f"Note: {self._engines[kind].notice}")
+                else:
+                    from .render import open_renderer
+                    self._engines[kind] = open_renderer("auto", self.workers)
+            except engine.MissingDependencyError as e:
+                self._missing[kind] = str(e)
+                self.log(f"Inputs needing the {kind} engine will fail: {e}")
+                raise
+        return self._engines[kind]
+
+    def _publish(self, result, staging, output_dir):
+        """Renames the outputs of `result` from the staging folder into `output_dir`; each rename is atomic.
+
+        If a rename fails, `result` is marked failed.
+        """
+        if result.frames:
+            outputs = result.frames
+        elif result.targets:
+            outputs = [t['output_path'] for t in result.targets.values()]
+        else:
+            outputs = [result.output_path]
+        for output in outputs:
+            final = os.path.join(output_dir, os.path.relpath(output, staging))
+            try:
+                os.replace(output, final)
+            except OSError as e:
+                self.stats.error()
+                result.ok, result.error = False, f"Could not move the output into place: {e}"
+                return
+
+    def _finish_input(self, folder, path, ok):
+        if self.after == "keep":
+            self._done[path] = _signature(path)
+            return
+        try:
+            if self.after == "delete" and ok:
+                os.remove(path)
+            else:
+                # Failed inputs are moved aside with "delete" too, so they are not retried in a loop.
+                destination = os.path.join(folder.path, PROCESSED_NAME if ok else FAILED_NAME)
+                os.makedirs(destination, exist_ok=True)
+                shutil.move(path, os.path.join(destination, os.path.basename(path)))
+        except OSError as e:
+            # Gone or locked; it is left where it is and tried again only if it changes.
+            self.stats.error()
+            self._done[path] = _signature(path)
+            self.log(f"Could not {self.after} {path}: {e}")
+
+    def close(self):
+        self.source.close()
+        for backend in self._engines.values():
+            backend.close()
+        self._engines.clear()
+
+
+def serve_metrics(watcher, host="127.0.0.1", port=9100):
+    """Serves the watcher's counters at http://host:port/metrics from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = watcher.stats.text(watcher.pending_count()).encode()
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/stats":
+                body = json.dumps(watcher.stats.snapshot()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="watch-metrics", daemon=True).start()
+    return server
+
+def print_stats_every(watcher, interval, stream=sys.stderr):
+    """Prints a JSON stats line every `interval` seconds from a daemon thread until the watcher stops."""
+    def loop():
+        while not watcher._stop.wait(interval):
+            print(json.dumps({'stats': watcher.stats.snapshot(), 'pending': watcher.pending_count()}), file=stream)
+    threading.Thread(target=loop, name="watch-stats", daemon=True).start()
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from converter_core import distributed, engine
+from converter_core.planning import plan_batches
+
+Image = pytest.importorskip("PIL.Image")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A worker whose conversions hang, standing in for a machine that dies mid-unit.
+HANGING_WORKER = textwrap.dedent("""
+    import sys, time
+    from converter_core import distributed, engine
+    engine.convert_images = lambda *args, **kwargs: time.sleep(3600)
+    distributed.Worker(sys.argv[1], "victim", workers=1, lease_seconds=float(sys.argv[2]), poll=0.1).run()
+""")
+
+
+def _queue_job(tmp_path, count=6, unit_files=2):
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    for i in range(count):
+        Image.new("RGB", (32 + i, 24), (i * 40, 80, 120)).save(inputs / f"img{i}.png")
+    queue_path = str(tmp_path / "queue.db")
+    batches, _ = plan_batches(sorted(str(p) for p in inputs.iterdir()), ["jpg"])
+    queue = distributed.WorkQueue(queue_path)
+    job_id = queue.add_job(batches, str(tmp_path / "out"), "jpg", unit_files)
+    queue.close()
+    return queue_path, job_id
+
+def _unit_states(queue_path):
+    queue = distributed.WorkQueue(queue_path)
+    try:
+        return [dict(row) for row in queue._db.execute("SELECT id, state, worker FROM units ORDER BY id")]
+    finally:
+        queue.close()
+
+
+def test_unit_of_killed_worker_is_converted_by_another(tmp_path):
+    queue_path, job_id = _queue_job(tmp_path)
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    victim = subprocess.Popen([sys.executable, "-c", HANGING_WORKER, queue_path, "1.0"], env=env)
+    try:
+        deadline = time.time() + 30
+        while not any(unit['worker'] == "victim" for unit in _unit_states(queue_path)):
+            assert time.time() < deadline, "the victim never leased a unit"
+            time.sleep(0.05)
+    finally:
+        victim.kill()
+        victim.wait()
+
+    rescuer = distributed.Worker(queue_path, "rescuer", workers=1, lease_seconds=1.0, poll=0.1, exit_when_idle=True)
+    assert rescuer.run() is None
+
+    queue = distributed.WorkQueue(queue_path)
+    progress = queue.progress(job_id)
+    queue.close()
+    assert progress['finished']
+    assert progress['succeeded'] == 6
+    assert progress['requeues'] >= 1
+    assert len(os.listdir(tmp_path / "out")) == 6
+    assert {unit['state'] for unit in _unit_states(queue_path)} == {distributed.DONE}
+
+def test_lost_lease_rejects_late_heartbeat_and_result(tmp_path):
+    queue_path, _ = _queue_job(tmp_path, count=2)
+    queue = distributed.WorkQueue(queue_path)
+    unit = queue.lease("slow", lease_seconds=0.1)
+    time.sleep(0.2)
+    assert queue.lease("fast", lease_seconds=30)['id'] == unit['id']
+    assert not queue.heartbeat("slow", unit['id'])
+    assert not queue.complete("slow", unit['id'], engine.BatchResult(total=2), 0.1)
+    assert queue.heartbeat("fast", unit['id'])
+    queue.close()
+
+def test_idle_worker_fails_units_that_ran_out_of_attempts(tmp_path):
+    queue_path, job_id = _queue_job(tmp_path, count=2)
+    queue = distributed.WorkQueue(queue_path)
+    for _ in range(distributed.MAX_ATTEMPTS):
+        assert queue.lease("dead", lease_seconds=0.05) is not None
+        time.sleep(0.1)
+    queue.close()
+
+    # No coordinator is following the queue: the idle worker itself has to give up on the unit.
+    worker = distributed.Worker(queue_path, "idle", workers=1, poll=0.05, exit_when_idle=True)
+    assert worker.run() is None
+    queue = distributed.WorkQueue(queue_path)
+    progress = queue.progress(job_id)
+    queue.close()
+    assert progress['finished']
+    assert progress['units'][distributed.FAILED] == 1
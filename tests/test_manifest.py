@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from converter_core import engine
+from converter_core.manifest import JobManifest
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _images(tmp_path, count=3):
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    for i in range(count):
+        Image.new("RGB", (16 + i, 12), (i * 60, 90, 30)).save(inputs / f"img{i}.png")
+    return sorted(str(p) for p in inputs.iterdir())
+
+def _convert(paths, tmp_path):
+    os.makedirs(tmp_path / "out", exist_ok=True)
+    return engine.convert_images(paths, str(tmp_path / "out"), "jpg", {'format': "JPEG"}, "RGB",
+                                 manifest_path=str(tmp_path / "manifest.jsonl"))
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rerun_skips_converted_inputs_and_redoes_changed_ones(tmp_path):
+    paths = _images(tmp_path)
+    first = _convert(paths, tmp_path)
+    assert first.success_count == 3
+    assert not any(r.up_to_date for r in first.results)
+
+    # One input changes and another one's output is deleted; only those two are converted again.
+    Image.new("RGB", (40, 30), (255, 0, 0)).save(paths[0])
+    os.remove(engine.output_path_for(paths[1], str(tmp_path / "out"), "jpg"))
+    second = _convert(paths, tmp_path)
+    up_to_date = {r.input_path: r.up_to_date for r in second.results}
+    assert up_to_date == {paths[0]: False, paths[1]: False, paths[2]: True}
+    assert all(r.ok for r in second.results)
+
+def test_jobs_sharing_a_manifest_keep_each_others_entries(tmp_path):
+    paths = _images(tmp_path, count=2)
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    jpg = JobManifest(manifest_path, ["jpg"])
+    webp = JobManifest(manifest_path, ["webp"])
+    for path in paths:
+        jpg.record(engine.FileResult(path, ok=False, error="boom"))
+        webp.record(engine.FileResult(path, ok=False, error="boom"))
+    jpg.record(engine.FileResult(paths[0], ok=False, error="again"))
+    # The first job compacts while the second one is still appending.
+    jpg.close()
+    assert len(_lines(manifest_path)) == 4
+    webp.record(engine.FileResult(paths[1], ok=False, error="again"))
+    webp.close()
+
+    entries = {(e['input_path'], e['params']): e for e in _lines(manifest_path)}
+    assert len(entries) == 4
+    assert entries[(os.path.abspath(paths[0]), jpg.params_key)]['error'] == "again"
+    assert entries[(os.path.abspath(paths[1]), webp.params_key)]['error'] == "again"
+    assert entries[(os.path.abspath(paths[1]), jpg.params_key)]['error'] == "boom"
+
+def test_line_cut_short_by_a_crash_is_ignored(tmp_path):
+    paths = _images(tmp_path, count=2)
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    _convert(paths, tmp_path)
+    with open(manifest_path, "a", encoding="utf-8") as f:
+        f.write('{"key": "half a li')
+
+    # The next entry goes on a line of its own instead of being lost with the broken one.
+    Image.new("RGB", (40, 30), (255, 0, 0)).save(paths[0])
+    assert [r.up_to_date for r in _convert(paths, tmp_path).results] == [False, True]
+    assert [r.up_to_date for r in _convert(paths, tmp_path).results] == [True, True]
+    assert len(_lines(manifest_path)) == 2
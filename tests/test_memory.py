@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from converter_core import imaging, memory
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _noise(mode, size=(53, 41)):
+    rng = random.Random(7)
+    rgb = Image.frombytes("RGB", size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    if mode == "P":
+        return rgb.convert("P", palette=Image.ADAPTIVE, colors=16)
+    return rgb.convert(mode)
+
+def _banded(path, mode):
+    # A zero threshold and a tiny band size force many bands on a small image.
+    return memory.convert_in_bands(str(path), mode, threshold=0, band_bytes=997)
+
+
+@pytest.mark.parametrize("source_mode, fmt, mode", [
+    ("RGB", "BMP", "L"),  # bottom-up rows
+    ("RGB", "PPM", "L"),
+    ("RGB", "TIFF", "L"),
+    ("L", "BMP", "RGB"),
+    ("RGBA", "TIFF", "RGB"),  # flattened onto the background like to_mode
+    ("P", "BMP", "RGB"),
+    ("1", "BMP", "L"),
+    ("I;16", "TIFF", "L"),
+])
+def test_bands_match_a_whole_image_conversion(tmp_path, source_mode, fmt, mode):
+    path = tmp_path / f"src.{fmt.lower()}"
+    _noise(source_mode).save(path, format=fmt)
+    with Image.open(path) as src:
+        assert memory.band_plan(src, 997) is not None
+        expected = imaging.to_mode(src, mode)
+        expected.load()
+    with _banded(path, mode) as out:
+        assert out.mode == mode
+        assert out.size == expected.size
+        assert out.tobytes() == expected.tobytes()
+
+def test_compressed_or_small_images_are_left_to_the_normal_path(tmp_path):
+    png = tmp_path / "src.png"
+    _noise("RGB").save(png)
+    assert _banded(png, "L") is None
+    bmp = tmp_path / "src.bmp"
+    _noise("RGB").save(bmp)
+    assert memory.convert_in_bands(str(bmp), "L") is None  # below STRIP_THRESHOLD
+    assert _banded(bmp, "RGB") is None  # already in the target mode
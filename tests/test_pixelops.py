@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from converter_core import pixelops
+from converter_core.bench import PIXEL_PIPELINES, _pillow_chain
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageChops = pytest.importorskip("PIL.ImageChops")
+
+# The chain rounds to 8 bits after every step and the fused pipeline only between stages, which differs by a
+# level; a levels stretch after it can double that.
+TOLERANCE = 2
+
+
+def _noise(mode, size=(67, 45)):
+    rng = random.Random(7)
+    img = Image.frombytes("RGB", size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    if mode == "RGBA":
+        img = img.convert("RGBA")
+        img.putalpha(Image.linear_gradient("L").resize(size))
+        return img
+    return img.convert(mode)
+
+def _max_difference(fused, pillow):
+    assert fused.size == pillow.size
+    extrema = ImageChops.difference(fused.convert(pillow.mode), pillow).getextrema()
+    return max(high for _, high in extrema) if isinstance(extrema[0], tuple) else extrema[1]
+
+
+@pytest.mark.parametrize("spec", sorted(PIXEL_PIPELINES.values()))
+@pytest.mark.parametrize("mode", ["RGBA", "RGB", "L"])
+def test_bench_pipelines_match_the_pillow_chain(spec, mode):
+    if mode == "L" and "swap" in spec:
+        pytest.skip("a channel swap needs colour channels")
+    img = _noise(mode)
+    ops = pixelops.parse_ops(spec)
+    assert _max_difference(pixelops.apply(img, ops), _pillow_chain(img, ops)) <= TOLERANCE
+
+@pytest.mark.parametrize("spec", ["gamma=2.2", "levels=16:235", "invert", "gamma=0.5,levels=10:200,invert",
+                                  "swap=bgr,gamma=1.8", "gamma=2.2,swap=brg", "swap=gbr,swap=gbr", "gray=rec709"])
+def test_tone_curves_and_mixes_match_the_pillow_chain(spec):
+    img = _noise("RGB")
+    ops = pixelops.parse_ops(spec)
+    fused = pixelops.apply(img, ops)
+    pillow = _pillow_chain(img, ops)
+    assert fused.mode == pillow.mode
+    assert _max_difference(fused, pillow) <= TOLERANCE
+
+def test_tables_leave_alpha_alone():
+    img = _noise("RGBA")
+    out = pixelops.apply(img, pixelops.parse_ops("gamma=2.2,invert"))
+    assert out.mode == "RGBA"
+    assert out.getchannel("A").tobytes() == img.getchannel("A").tobytes()
+
+def test_threads_and_bands_give_the_same_pixels(monkeypatch):
+    img = _noise("RGBA", size=(301, 97))
+    ops = pixelops.parse_ops(PIXEL_PIPELINES['flatten_gamma_swap_invert'])
+    expected = pixelops.apply(img, ops).tobytes()
+    monkeypatch.setattr(pixelops, "BAND_PIXELS", 500)  # many bands, the last one partial
+    assert pixelops.apply(img, ops, workers=4).tobytes() == expected
+
+@pytest.mark.parametrize("text", ["blur=2", "gray=1:2", "levels=16"])
+def test_bad_pipelines_are_rejected(text):
+    with pytest.raises(ValueError):
+        pixelops.parse_ops(text)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from converter_core import engine, scheduler
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def _recorder(order, gate=None):
+    """A batch function that logs its name when it runs and, given `gate`, waits for it."""
+    def batch(name, progress=None, control=None):
+        order.append(name)
+        if gate:
+            gate.wait(5)
+        return engine.BatchResult()
+    return batch
+
+
+@pytest.fixture
+def jobs():
+    jobs = scheduler.JobScheduler(limits={'image': 1})
+    yield jobs
+    jobs.shutdown()
+
+
+def test_paused_job_does_not_hold_the_slot_and_runs_once_resumed(jobs):
+    order, gate = [], threading.Event()
+    batch = _recorder(order, gate)
+    jobs.submit("image", batch, {'name': "first"})
+    _wait_for(lambda: order == ["first"])
+    paused = jobs.submit("image", batch, {'name': "paused"})
+    paused.pause()
+    later = jobs.submit("image", batch, {'name': "later"})
+    gate.set()
+
+    _wait_for(lambda: later.finished)
+    _wait_for(lambda: paused.id in jobs._parked)
+    assert order == ["first", "later"]
+    assert paused.status == scheduler.PAUSED
+    assert jobs.queue_depth() == 0
+
+    paused.resume()
+    _wait_for(lambda: paused.finished)
+    assert order == ["first", "later", "paused"]
+    assert paused.status == scheduler.DONE
+
+def test_cancelled_jobs_never_run(jobs):
+    order, gate = [], threading.Event()
+    batch = _recorder(order, gate)
+    jobs.submit("image", batch, {'name': "first"})
+    _wait_for(lambda: order == ["first"])
+    queued = jobs.submit("image", batch, {'name': "queued"})
+    parked = jobs.submit("image", batch, {'name': "parked"})
+    parked.pause()
+    queued.cancel()
+    gate.set()
+    _wait_for(lambda: parked.id in jobs._parked)
+    parked.cancel()
+
+    last = jobs.submit("image", batch, {'name': "last"})
+    _wait_for(lambda: last.finished)
+    assert order == ["first", "last"]
+    assert queued.status == parked.status == scheduler.CANCELLED
+    assert not jobs._parked
+    parked.resume()  # no effect once cancelled
+    assert parked.status == scheduler.CANCELLED
+
+def test_lower_priority_number_runs_first(jobs):
+    order, gate = [], threading.Event()
+    batch = _recorder(order, gate)
+    jobs.submit("image", batch, {'name': "first"})
+    _wait_for(lambda: order == ["first"])
+    low = jobs.submit("image", batch, {'name': "low"}, priority=5)
+    high = jobs.submit("image", batch, {'name': "high"}, priority=1)
+    gate.set()
+    _wait_for(lambda: low.finished and high.finished)
+    assert order == ["first", "high", "low"]
+
+def test_pause_and_resume_racing_the_consumer_never_strand_a_job(jobs):
+    order = []
+    batch = _recorder(order)
+    submitted = []
+    for i in range(50):
+        job = jobs.submit("image", batch, {'name': i})
+        job.pause()
+        job.resume()
+        submitted.append(job)
+    _wait_for(lambda: all(job.finished for job in submitted))
+    assert sorted(order) == list(range(50))
+    assert not jobs._parked
@@ -0,0 +1,102 @@
+import http.client
+import io
+import os
+import threading
+
+import pytest
+
+from converter_core import server
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(size=(24, 16)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 40, 90)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _start(service):
+    httpd = server.make_server(service, port=0, quiet=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+def _post(httpd, path, body, headers=None):
+    connection = http.client.HTTPConnection(*httpd.server_address[:2], timeout=30)
+    try:
+        connection.request("POST", path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def service():
+    service = server.ConversionService(workers=1)
+    yield service
+    service.close()
+
+@pytest.fixture
+def httpd(service):
+    httpd = _start(service)
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_converted_image_comes_back_with_its_content_type(httpd):
+    status, content_type, body = _post(httpd, "/convert/image?target=webp", _png())
+    assert status == 200
+    assert content_type == "image/webp"
+    with Image.open(io.BytesIO(body)) as img:
+        assert (img.format, img.size) == ("WEBP", (24, 16))
+
+@pytest.mark.parametrize("path", ["/convert/image?target=bogus", "/convert/image?target=png&quality=high"])
+def test_bad_parameters_get_400(httpd, path):
+    status, _, body = _post(httpd, path, _png())
+    assert status == 400
+    assert "error" in body.decode()
+
+def test_negative_content_length_gets_400(httpd):
+    connection = http.client.HTTPConnection(*httpd.server_address[:2], timeout=30)
+    try:
+        connection.putrequest("POST", "/convert/image")
+        connection.putheader("Content-Length", "-5")
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert response.getheader("Connection") == "close"
+    finally:
+        connection.close()
+
+def test_undecodable_image_gets_422(httpd, service):
+    status, _, _ = _post(httpd, "/convert/image?target=png", b"not an image")
+    assert status == 422
+    assert service.metrics.pending == 0
+
+def test_saturated_service_answers_429_with_retry_after():
+    service = server.ConversionService(workers=1, max_pending=0)
+    httpd = _start(service)
+    try:
+        connection = http.client.HTTPConnection(*httpd.server_address[:2], timeout=30)
+        connection.request("POST", "/convert/image?target=png", _png())
+        response = connection.getresponse()
+        assert response.status == 429
+        assert response.getheader("Retry-After") == "1"
+        response.read()
+        # The body was drained, so the same connection still works.
+        connection.request("GET", "/health")
+        assert connection.getresponse().status == 200
+        connection.close()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        service.close()
+
+def test_crashed_worker_fails_its_task_and_the_pool_is_replaced(service):
+    with pytest.raises(Exception):
+        service._submit(os._exit, 1).result(timeout=30)
+    output, content_type = service.convert_image(_png(), "png")
+    assert content_type == "image/png"
+    assert output.startswith(b"\x89PNG")
+    assert service.metrics.pool_restarts == 1
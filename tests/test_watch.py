@@ -0,0 +1,107 @@
+import os
+import time
+import zipfile
+
+import pytest
+
+from converter_core import engine, office, watch
+
+Image = pytest.importorskip("PIL.Image")
+
+SETTLE = 0.05
+
+
+def _watcher(tmp_path, pattern="*.png", target="jpg", after="move"):
+    inputs = tmp_path / "in"
+    inputs.mkdir(exist_ok=True)
+    folder = watch.WatchFolder(str(inputs), str(tmp_path / "out"), [watch.WatchRule(pattern, target)])
+    log = []
+    watcher = watch.FolderWatcher([folder], settle=SETTLE, force_polling=True, after=after, log=log.append)
+    return watcher, inputs, log
+
+def _settle(watcher, timeout=5):
+    """Scans the folder and waits until the pending files settle; returns them."""
+    watcher.source.initial_scan()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        ready = watcher._settled()
+        if ready:
+            return ready
+        time.sleep(SETTLE / 2)
+    return []
+
+def _docx(path):
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("[Content_Types].xml", "<Types/>")
+        z.writestr("word/document.xml", "<w:document/>")
+
+
+def test_growing_file_waits_until_it_settles(tmp_path):
+    watcher, inputs, _ = _watcher(tmp_path)
+    path = inputs / "photo.png"
+    path.write_bytes(b"\x89PNG")
+    watcher.source.initial_scan()
+    assert watcher._settled() == []
+    for _ in range(3):
+        time.sleep(SETTLE)
+        with open(path, "ab") as f:
+            f.write(b"more")  # still being copied in: its signature keeps changing
+        assert watcher._settled() == []
+    assert watcher.pending_count() == 1
+    Image.new("RGB", (20, 10)).save(path)
+    assert [p for p, _ in _settle(watcher)] == [str(path)]
+
+def test_outputs_are_published_and_inputs_moved(tmp_path):
+    watcher, inputs, _ = _watcher(tmp_path)
+    for i in range(3):
+        Image.new("RGB", (20 + i, 10), (i * 80, 0, 0)).save(inputs / f"img{i}.png")
+    watcher.process(_settle(watcher))
+    watcher.close()
+
+    out = tmp_path / "out"
+    assert sorted(os.listdir(out)) == [watch.STAGING_NAME, "img0.jpg", "img1.jpg", "img2.jpg"]
+    assert os.listdir(out / watch.STAGING_NAME) == []
+    assert sorted(os.listdir(inputs / watch.PROCESSED_NAME)) == ["img0.png", "img1.png", "img2.png"]
+    assert (watcher.stats.converted, watcher.stats.failed, watcher.stats.batches) == (3, 0, 1)
+
+def test_kept_input_is_converted_again_only_when_it_changes(tmp_path):
+    watcher, inputs, _ = _watcher(tmp_path, after="keep")
+    path = inputs / "img.png"
+    Image.new("RGB", (20, 10)).save(path)
+    watcher.process(_settle(watcher))
+    assert watcher.stats.converted == 1
+    assert _settle(watcher, timeout=SETTLE * 4) == []
+
+    Image.new("RGB", (30, 10)).save(path)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    watcher.process(_settle(watcher))
+    assert watcher.stats.converted == 2
+    with Image.open(tmp_path / "out" / "img.jpg") as img:
+        assert img.size == (30, 10)
+
+def test_empty_and_undecodable_files_fail_instead_of_staying_pending(tmp_path):
+    watcher, inputs, _ = _watcher(tmp_path)
+    (inputs / "empty.png").write_bytes(b"")
+    (inputs / "junk.png").write_bytes(b"not an image")
+    watcher.process(_settle(watcher))
+    assert watcher.pending_count() == 0
+    assert sorted(os.listdir(inputs / watch.FAILED_NAME)) == ["empty.png", "junk.png"]
+    assert watcher.stats.failed == 2
+
+def test_missing_engine_is_reported_once_and_its_inputs_fail(tmp_path, monkeypatch):
+    opened = []
+
+    def missing(*args):
+        opened.append(args)
+        raise engine.MissingDependencyError("LibreOffice is not installed.")
+    monkeypatch.setattr(office, "open_backend", missing)
+    watcher, inputs, log = _watcher(tmp_path, pattern="*.docx", target="pdf")
+    _docx(inputs / "a.docx")
+    watcher.process(_settle(watcher))
+    _docx(inputs / "b.docx")
+    watcher.process(_settle(watcher))
+
+    assert len(opened) == 1
+    assert sum("LibreOffice is not installed" in line and "FAILED" not in line for line in log) == 1
+    assert sorted(os.listdir(inputs / watch.FAILED_NAME)) == ["a.docx", "b.docx"]
+    assert watcher.pending_count() == 0